@@ -0,0 +1,111 @@
+'''ScheduleStore と単純なリストでのスケジュール操作の処理時間を比較
+
+ch6 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_schedule_store --sizes 100000 1000000
+
+スケジュールを sizes 件投入した上で、以下の操作の 1 回あたりの時間を計測する。
+- get: ID による取得
+- delete: ID による削除 (削除したものはすぐに追加し直す)
+- progress: ステータスが progress のスケジュールの絞り込み
+- since: 直近 100 件分の scheduled 以降のスケジュールの絞り込み
+'''
+
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from kitchen.repository.store import ScheduleStore
+
+
+def make_schedules(size: int):
+    '''調理中 (progress) が 1% で、残りは調理済みのスケジュールを作成'''
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            'id': str(uuid.uuid4()),
+            'scheduled': start + timedelta(seconds=index),
+            'status': 'progress' if index % 100 == 0 else 'finished',
+            'order': [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}],
+        }
+        for index in range(size)
+    ]
+
+
+def timeit(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_list(schedules, targets, since, repeat):
+    def get():
+        schedule_id = random.choice(targets)
+        for schedule in schedules:
+            if schedule['id'] == schedule_id:
+                return schedule
+
+    def delete():
+        schedule_id = random.choice(targets)
+        for index, schedule in enumerate(schedules):
+            if schedule['id'] == schedule_id:
+                schedules.append(schedules.pop(index))
+                return
+
+    return {
+        'get': timeit(get, repeat),
+        'delete': timeit(delete, repeat),
+        'progress': timeit(
+            lambda: [s for s in schedules if s['status'] == 'progress'], repeat
+        ),
+        'since': timeit(
+            lambda: [s for s in schedules if s['scheduled'] >= since], repeat
+        ),
+    }
+
+
+def bench_store(store, targets, since, repeat):
+    def delete():
+        schedule = store.get(random.choice(targets))
+        store.delete(schedule['id'])
+        store.add(schedule)
+
+    return {
+        'get': timeit(lambda: store.get(random.choice(targets)), repeat),
+        'delete': timeit(delete, repeat),
+        'progress': timeit(lambda: store.query(statuses=['progress']), repeat),
+        'since': timeit(lambda: store.query(since=since), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        schedules = make_schedules(size)
+        targets = [schedule['id'] for schedule in random.sample(schedules, 100)]
+        since = schedules[-100]['scheduled']
+        store = ScheduleStore()
+        for schedule in schedules:
+            store.add(dict(schedule))
+
+        results = {
+            'list': bench_list(schedules, targets, since, args.repeat),
+            'store': bench_store(store, targets, since, args.repeat),
+        }
+        for name, timings in results.items():
+            print(
+                f'size={size:>8} {name:>5}: ' + ', '.join(
+                    f'{operation} {ms:9.4f} ms' for operation, ms in timings.items()
+                )
+            )
+
+
+if __name__ == '__main__':
+    main()
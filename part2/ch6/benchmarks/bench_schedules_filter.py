@@ -0,0 +1,120 @@
+'''スケジュールの絞り込み (query) の処理時間を計測
+
+ch6 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_schedules_filter --sizes 20000 200000
+
+スケジュールを sizes 件投入した上で、いくつかの条件の組み合わせについて
+- list: 全件をリストにしてから条件ごとに絞り込み、最後に limit 件を切り出す (変更前の方式)
+- store: ScheduleStore.query でインデックスを1回走査し、limit 件で打ち切る
+- sql: SqlScheduleStore.query で、インデックスを張った sqlite のテーブルから取得する
+の 1 回あたりの時間を比較する。
+
+store と sql の結果が全件を素朴に絞り込んだ結果と一致することは、
+tests/test_schedule_query.py で確認している。
+'''
+
+import argparse
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from kitchen.api.type import SCHEDULE_STATUSES
+from kitchen.repository.engine import get_session_maker
+from kitchen.repository.sql_store import SqlScheduleStore
+from kitchen.repository.store import ScheduleStore
+
+START = datetime(2024, 1, 1)
+
+
+def make_schedules(size: int):
+    '''調理中 (progress) が 1% で、残りは他のステータスのスケジュールを作成'''
+    others = [status for status in SCHEDULE_STATUSES if status != 'progress']
+    return [
+        {
+            'id': str(uuid.uuid4()),
+            'scheduled': START + timedelta(seconds=index),
+            'status': 'progress' if index % 100 == 0 else others[index % len(others)],
+            'order': [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}],
+        }
+        for index in range(size)
+    ]
+
+
+def list_query(
+    schedules,
+    statuses=None,
+    since=None,
+    until=None,
+    limit=None,
+    descending=False
+):
+    '''全件をリストにしてから絞り込む'''
+    query_set = list(schedules)
+    if statuses is not None:
+        query_set = [s for s in query_set if s['status'] in statuses]
+    if since is not None:
+        query_set = [s for s in query_set if s['scheduled'] >= since]
+    if until is not None:
+        query_set = [s for s in query_set if s['scheduled'] <= until]
+    query_set.sort(key=lambda s: (s['scheduled'], s['id']), reverse=descending)
+    return query_set[:limit]
+
+
+def timeit(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 200000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        schedules = make_schedules(size)
+        store = ScheduleStore()
+        for schedule in schedules:
+            store.add(dict(schedule), validated=True)
+
+        db_path = Path(tempfile.mkdtemp()) / 'kitchen.db'
+        session = get_session_maker(f'sqlite:///{db_path}')()
+        sql_store = SqlScheduleStore(session)
+        for schedule in schedules:
+            sql_store.add(dict(schedule), validated=True)
+        session.commit()
+
+        recent = START + timedelta(seconds=size - 1000)
+        cases = {
+            'progress limit=50': dict(statuses={'progress'}, limit=50),
+            'not progress since limit=50': dict(
+                statuses=set(SCHEDULE_STATUSES) - {'progress'},
+                since=recent,
+                limit=50
+            ),
+            'since until desc': dict(
+                since=recent, until=recent + timedelta(seconds=500), descending=True
+            ),
+            'limit=50 desc': dict(limit=50, descending=True),
+        }
+        for case, conditions in cases.items():
+            timings = {
+                'list': timeit(lambda: list_query(store, **conditions), args.repeat),
+                'store': timeit(lambda: store.query(**conditions), args.repeat),
+                'sql': timeit(lambda: sql_store.query(**conditions), args.repeat),
+            }
+            print(
+                f'size={size:>8} {case:>28}: ' + ', '.join(
+                    f'{name} {ms:9.3f} ms' for name, ms in timings.items()
+                )
+            )
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
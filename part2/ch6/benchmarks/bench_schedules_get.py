@@ -0,0 +1,77 @@
+'''GET /kitchen/schedules のレイテンシをストアの件数ごとに計測
+
+ch6 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_schedules_get --sizes 1000 10000 50000
+
+- read_all: 読み込みのたびに全スケジュールを deepcopy して検証する (変更前の挙動)
+- write_time: 書き込み時に検証を済ませ、読み込み時には検証しない
+- paranoid: 書き込み時の検証に加え、読み込み時に一部を抜き出して検証する
+の3通りで、1 リクエストあたりの時間を比較する。
+'''
+
+import argparse
+import copy
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from kitchen.api import api
+from kitchen.api.schemas import GetScheduledOrderSchema
+from kitchen.app import app
+from kitchen.repository.store import ScheduleStore
+
+
+def legacy_validate_on_read(store, query_set):
+    '''変更前と同じく、スケジュールを全件 deepcopy して検証する'''
+    for schedule in store:
+        _schedule = copy.deepcopy(schedule)
+        _schedule['scheduled'] = schedule['scheduled'].isoformat()
+        GetScheduledOrderSchema().validate(_schedule)
+
+
+def fill(size: int) -> ScheduleStore:
+    store = ScheduleStore()
+    start = datetime(2024, 1, 1)
+    for index in range(size):
+        store.add(
+            {
+                'id': str(uuid.uuid4()),
+                'scheduled': start + timedelta(seconds=index),
+                'status': 'pending',
+                'order': [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}],
+            },
+            validated=True
+        )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    validate_on_read = api.validate_on_read
+    variants = {
+        'read_all': (legacy_validate_on_read, False),
+        'write_time': (validate_on_read, False),
+        'paranoid': (validate_on_read, True),
+    }
+    for size in args.sizes:
+        api.schedules = fill(size)
+        for name, (validator, paranoid) in variants.items():
+            api.validate_on_read = validator
+            app.config['SCHEDULE_PARANOID_VALIDATION'] = paranoid
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                response = client.get('/kitchen/schedules?limit=50')
+                assert response.status_code == 200
+            elapsed = (time.perf_counter() - start) / args.repeat * 1000
+            print(f'size={size:>7} {name:>10}: {elapsed:9.2f} ms/request')
+    api.validate_on_read = validate_on_read
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+'''厨房 API の起動時間と、API 仕様書の読み込み・配信の時間を計測するマイクロベンチマーク
+
+ch6 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_startup --repeat 5
+
+- load: 仕様書の読み込み 1 回あたりの時間を、yaml.safe_load (変更前の方法)、
+  C 実装のローダー、キャッシュからの読み込みで比較する
+- import: 別プロセスで kitchen.app を import するまでの時間の中央値を、
+  キャッシュがない場合 (cold) とある場合 (warm) で比較する
+- serve: GET /openapi/kitchen.json 1 回あたりの時間を、リクエストのたびに辞書を JSON に
+  変換する場合 (変更前の方法) とエンコード済みのバイト列を返す場合で比較する
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+from kitchen.openapi import SafeLoader, _cache_path, load_spec
+
+SPEC_PATH = Path(__file__).parent / '../kitchen/oas.yaml'
+IMPORT_SNIPPET = (
+    'import time; start = time.perf_counter(); import kitchen.app; '
+    'print(time.perf_counter() - start)'
+)
+
+
+def timeit(func, repeat: int) -> float:
+    '''1 回あたりのミリ秒'''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def clear_cache():
+    _cache_path(SPEC_PATH).unlink(missing_ok=True)
+
+
+def import_time(cold: bool) -> float:
+    if cold:
+        clear_cache()
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        env=os.environ,
+        cwd=Path(__file__).parent.parent,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return float(output) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    text = SPEC_PATH.read_text()
+    load_spec(SPEC_PATH)
+    for name, func in {
+        'safe_load': lambda: yaml.safe_load(text),
+        'c_loader': lambda: yaml.load(text, Loader=SafeLoader),
+        'cached': lambda: load_spec(SPEC_PATH),
+    }.items():
+        print(f'load   {name:>10}: {timeit(func, args.repeat * 4):8.2f} ms')
+
+    for name, cold in {'cold': True, 'warm': False}.items():
+        times = [import_time(cold) for _ in range(args.repeat)]
+        print(f'import {name:>10}: {statistics.median(times):8.2f} ms')
+
+    import json
+
+    from kitchen.app import app, kitchen_api
+
+    # flask-smorest の変更前の配信方法と同じく、リクエストのたびに辞書を JSON に変換する
+    @app.route('/legacy/openapi.json')
+    def legacy_openapi():
+        return app.response_class(
+            json.dumps(kitchen_api.spec.to_dict(), indent=2), mimetype='application/json'
+        )
+
+    client = app.test_client()
+    for name, path in {
+        'legacy': '/legacy/openapi.json',
+        'bytes': '/openapi/kitchen.json',
+    }.items():
+        elapsed = timeit(lambda: client.get(path), args.repeat * 100)
+        print(f'serve  {name:>10}: {elapsed:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+'''厨房 API のすべてのエンドポイントを計測するベンチマークスイート
+
+ch6 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.suite --schedules 100000 --requests 500 --output results/kitchen.json
+    python -m benchmarks.suite --storage sql --schedules 10000
+
+既定では、アプリケーションを Flask のテストクライアントから WSGI で直接呼び出す (ネットワークを介さない)。
+スケジュールの保存先は --storage で切り替え、sql の場合は一時ファイルの sqlite を利用する。
+--url を指定した場合は、起動済みの厨房 API に requests で HTTP のリクエストを送り、
+--concurrency の数のスレッドから同時に負荷をかける。
+
+計測するシナリオは以下の通り。
+
+- list_schedules: GET /kitchen/schedules?limit=50
+- filter_schedules: GET /kitchen/schedules (status, since, limit を組み合わせた絞り込み)
+- create_schedule: POST /kitchen/schedules
+- get_schedule: GET /kitchen/schedules/{schedule_id}
+- update_schedule: PUT /kitchen/schedules/{schedule_id}
+- get_status: GET /kitchen/schedules/{schedule_id}/status
+- cancel_schedule: POST /kitchen/schedules/{schedule_id}/cancel
+- delete_schedule: DELETE /kitchen/schedules/{schedule_id}
+
+計測の前に、--schedules 件のスケジュールを投入する。WSGI で呼び出す場合はストアに直接、
+HTTP の場合は POST /kitchen/schedules で投入する。
+cancel_schedule と delete_schedule は、シナリオごとに新しく作成したスケジュールに対して実行する。
+結果は表として表示し、--output を指定した場合はコミットなどの情報と合わせて JSON で書き出す。
+'''
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from benchmarks.results import summarize, write_results
+
+ORDER = [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}]
+UPDATED_ORDER = [{'product': 'latte', 'size': 'big', 'quantity': 2}]
+SEED_STATUSES = ('pending', 'progress', 'finished')
+SCENARIOS = (
+    'list_schedules',
+    'filter_schedules',
+    'create_schedule',
+    'get_schedule',
+    'update_schedule',
+    'get_status',
+    'cancel_schedule',
+    'delete_schedule',
+)
+
+# (メソッド, パス, ペイロード, 期待するステータスコード)
+Request = Tuple[str, str, Optional[dict], int]
+
+
+class HTTPTarget:
+    '''起動済みの厨房 API に HTTP でリクエストを送るクライアント
+
+    requests.Session はスレッドセーフではないため、スレッドごとに作成する
+    '''
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, json: Optional[dict] = None):
+        import requests
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session.request(method, self.base_url + path, json=json)
+
+    def seed(self, count: int, start: datetime) -> List[str]:
+        '''scheduled はサーバー側で設定されるため、start は使われない'''
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = executor.map(
+                lambda _: self.request('POST', '/kitchen/schedules', json={'order': ORDER}),
+                range(count)
+            )
+            return [response.json()['id'] for response in responses]
+
+
+class WSGITarget:
+    '''Flask のテストクライアントでアプリケーションを直接呼び出すクライアント
+
+    アプリケーションは import 時に設定を読み込むため、環境変数はその前に設定する
+    '''
+
+    def __init__(self, storage: str):
+        os.environ['SCHEDULE_STORAGE'] = storage
+        if storage == 'sql':
+            db_path = Path(tempfile.mkdtemp()) / 'kitchen.db'
+            os.environ['SCHEDULE_DATABASE_URL'] = f'sqlite:///{db_path}'
+
+        from kitchen.app import app
+
+        self.app = app
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, json: Optional[dict] = None):
+        return self.client.open(path, method=method, json=json)
+
+    def seed(self, count: int, start: datetime) -> List[str]:
+        '''count 件のスケジュールをストアに直接投入し、その ID を返す
+
+        scheduled は start から 1 秒ずつずらし、ステータスは SEED_STATUSES を順に割り当てる
+        '''
+        from kitchen.api import api
+
+        ids = []
+        with self.app.app_context():
+            with api.unit_of_work() as uow:
+                for index in range(count):
+                    schedule = {
+                        'id': str(uuid.uuid4()),
+                        'scheduled': start + timedelta(seconds=index),
+                        'status': SEED_STATUSES[index % len(SEED_STATUSES)],
+                        'order': ORDER,
+                    }
+                    uow.schedules.add(schedule, validated=True)
+                    ids.append(schedule['id'])
+                uow.commit()
+        return ids
+
+
+def build_requests(
+    scenario: str,
+    target,
+    seeded: List[str],
+    since: datetime,
+    count: int,
+    rng: random.Random
+) -> List[Request]:
+    def pick() -> str:
+        return rng.choice(seeded)
+
+    if scenario == 'list_schedules':
+        return [('GET', '/kitchen/schedules?limit=50', None, 200)] * count
+    if scenario == 'filter_schedules':
+        query = f'status=pending&status=progress&since={since.isoformat()}&limit=50'
+        return [('GET', f'/kitchen/schedules?{query}', None, 200)] * count
+    if scenario == 'create_schedule':
+        return [('POST', '/kitchen/schedules', {'order': ORDER}, 201)] * count
+    if scenario == 'get_schedule':
+        return [('GET', f'/kitchen/schedules/{pick()}', None, 200) for _ in range(count)]
+    if scenario == 'update_schedule':
+        return [
+            ('PUT', f'/kitchen/schedules/{pick()}', {'order': UPDATED_ORDER}, 200)
+            for _ in range(count)
+        ]
+    if scenario == 'get_status':
+        return [
+            ('GET', f'/kitchen/schedules/{pick()}/status', None, 200)
+            for _ in range(count)
+        ]
+    fresh = target.seed(count, since)
+    if scenario == 'cancel_schedule':
+        return [('POST', f'/kitchen/schedules/{id_}/cancel', None, 200) for id_ in fresh]
+    if scenario == 'delete_schedule':
+        return [('DELETE', f'/kitchen/schedules/{id_}', None, 204) for id_ in fresh]
+    raise ValueError(f'Unknown scenario: {scenario}')
+
+
+def run_scenario(target, requests: List[Request], concurrency: int) -> dict:
+    '''requests を concurrency 並列で送信し、レイテンシを集計する'''
+
+    def send(request: Request) -> Tuple[float, bool]:
+        method, path, payload, expected = request
+        start = time.perf_counter()
+        response = target.request(method, path, json=payload)
+        return (time.perf_counter() - start) * 1000, response.status_code == expected
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        outcomes = [send(request) for request in requests]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, requests))
+    elapsed = time.perf_counter() - start
+    return summarize(
+        [latency for latency, _ in outcomes],
+        elapsed,
+        errors=sum(not ok for _, ok in outcomes)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--schedules', type=int, default=100000, help='事前に投入するスケジュール数')
+    parser.add_argument('--requests', type=int, default=500, help='シナリオごとのリクエスト数')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--storage', choices=('memory', 'sql'), default='memory')
+    parser.add_argument('--url', help='起動済みの厨房 API の URL。指定しない場合は WSGI で直接呼び出す')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='結果を書き出す JSON ファイルのパス')
+    args = parser.parse_args()
+    args.warmup = min(args.warmup, args.requests - 1)
+
+    target = HTTPTarget(args.url) if args.url else WSGITarget(args.storage)
+    rng = random.Random(args.seed)
+    # 投入するスケジュールの scheduled は現在時刻より前にし、絞り込みでは後半の半分を対象にする
+    start = datetime.utcnow() - timedelta(seconds=args.schedules)
+    since = start + timedelta(seconds=args.schedules // 2)
+    seeded = target.seed(args.schedules, start)
+
+    results = {}
+    for scenario in args.scenarios:
+        requests = build_requests(scenario, target, seeded, since, args.requests, rng)
+        # 接続の確立などの影響を除くため、一部を先に送っておく
+        run_scenario(target, requests[:args.warmup], 1)
+        results[scenario] = run_scenario(target, requests[args.warmup:], args.concurrency)
+
+    parameters = {
+        'target': args.url or 'wsgi',
+        'storage': None if args.url else args.storage,
+        'schedules': args.schedules,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+    }
+    write_results(args.output, 'kitchen', parameters, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-import copy
+import random
 import uuid
 from datetime import datetime
 from typing import Dict, Any, List
@@ -6,7 +6,7 @@ from typing import Dict, Any, List
 from flask.views import MethodView
 from flask_smorest import Blueprint
 from marshmallow import ValidationError
-from flask import abort
+from flask import abort, current_app
 
 # marshmallow モデルをインポート
 from .schemas import (
@@ -19,24 +19,60 @@ from .schemas import (
 
 # 型ヒントをインポート
 from .type import (
+    SCHEDULE_STATUSES,
     EachOrder,
     Schedule,
     ScheduleOrder
 )
+from ..repository.engine import get_session_maker
+from ..repository.interface import ScheduleStoreInterface
+from ..repository.store import ScheduleStore
+from ..repository.unit_of_work import InMemoryUnitOfWork, UnitOfWork
 
 blueprint = Blueprint('kitchen', __name__, description='Kitchen API')
 
 # インメモリでスケジュールを定義
-schedules: List[Schedule] = []
+# ID やステータス、scheduled で引けるよう、インデックス付きのストアで保持する
+# SCHEDULE_STORAGE が sql の場合は使われず、データベースに保存する
+schedules = ScheduleStore()
+
+# スキーマのインスタンスはリクエストごとに作らず、使い回す
+scheduled_order_schema = GetScheduledOrderSchema()
 
 # データ検証コードを関数として切り出し
 def validate_schedule(schedule: Schedule):
-    # schedule に変更を加えても、直ちに破壊的変更にならないことを保証
-    _schedule = copy.deepcopy(schedule)
-    _schedule['scheduled'] = schedule['scheduled'].isoformat()
-    errors = GetScheduledOrderSchema().validate(_schedule)
+    # validate は渡した辞書を変更しないため、deepcopy はせず
+    # scheduled だけを文字列に置き換えた浅いコピーを検証する
+    _schedule = {**schedule, 'scheduled': schedule['scheduled'].isoformat()}
+    errors = scheduled_order_schema.validate(_schedule)
     if errors:
-        ValidationError(errors)
+        raise ValidationError(errors)
+
+def unit_of_work():
+    '''SCHEDULE_STORAGE の設定に応じた UnitOfWork を返す'''
+    if current_app.config.get('SCHEDULE_STORAGE') == 'sql':
+        return UnitOfWork(
+            get_session_maker(current_app.config['SCHEDULE_DATABASE_URL'])
+        )
+    return InMemoryUnitOfWork(schedules)
+
+def validate_on_read(store: ScheduleStoreInterface, query_set: List[Schedule]):
+    '''読み込み時の検証
+    
+    スケジュールは書き込み時に検証済みのため、基本的には何もしない。
+    書き込み時に検証されていないスケジュールがあればここで検証し、
+    SCHEDULE_PARANOID_VALIDATION が有効な場合は、返却するスケジュールの一部を抜き出して検証する。
+    '''
+    for schedule in store.unvalidated():
+        validate_schedule(schedule)
+        store.mark_validated(schedule['id'])
+    if current_app.config.get('SCHEDULE_PARANOID_VALIDATION'):
+        sample_size = min(
+            current_app.config.get('SCHEDULE_PARANOID_SAMPLE_SIZE', 10),
+            len(query_set)
+        )
+        for schedule in random.sample(query_set, sample_size):
+            validate_schedule(schedule)
     
 
 # Blueprint の route() デコレータを使って、クラスまたは関数をURLパスとして登録
@@ -57,45 +93,31 @@ class KitchenSchedules(MethodView):
     )    
     def get(self, parameters: Dict[str, Any]):
         
-        # まず初めに、データベースから取得されることが想定される schedules について
-        # 正しいデータが含まれることを検証する
-        for schedule in schedules:
-            validate_schedule(schedule)
-        
-        # パラメータが特に指定されていない場合はスケジュールのリストを返す
-        if not parameters:
-            return {'schedules': schedules}
-        # ユーザーがURLクエリパラメータを設定した場合は、
-        # それらを使ってスケジュールのリストをフィルタリング
-        query_set = [schedule for schedule in schedules]
-        
-        # progress パラメータの処理
+        # URLクエリパラメータの条件をまとめ、ストアに一度に渡して絞り込む
+        statuses = parameters.get('status')
+        if statuses is not None:
+            statuses = set(statuses)
+        # progress パラメータは status の条件と組み合わせる
         in_progress = parameters.get('progress')
         if in_progress is not None:
+            if statuses is None:
+                statuses = set(SCHEDULE_STATUSES)
             if in_progress:
-                query_set = [
-                    schedule for schedule in schedules
-                    if schedule['status'] == 'progress'
-                ]
+                statuses &= {'progress'}
             else:
-                query_set = [
-                    schedule for schedule in schedules
-                    if schedule['status'] != 'progress'    
-                ]
-        
-        # since パラメータの処理
-        since = parameters.get('since')
-        if since is not None:
-            query_set = [
-                schedule for schedule in schedules
-                if schedule['scheduled'] >= since
-            ]
-        
-        # limit の処理
-        limit = parameters.get('limit')
-        if limit is not None and len(query_set) > limit:
-            query_set = query_set[:limit]
+                statuses -= {'progress'}
         
+        with unit_of_work() as uow:
+            query_set = uow.schedules.query(
+                statuses=statuses,
+                since=parameters.get('since'),
+                until=parameters.get('until'),
+                limit=parameters.get('limit'),
+                descending=parameters['ordering'] == 'desc'
+            )
+            # 返却するスケジュールに正しいデータが含まれることを検証する
+            validate_on_read(uow.schedules, query_set)
+            uow.commit()
         return {'schedules': query_set}
             
     # Blueprint の arguments() デコレータを使って、
@@ -112,8 +134,11 @@ class KitchenSchedules(MethodView):
         payload['id'] = str(uuid.uuid4())
         payload['scheduled'] = datetime.utcnow()
         payload['status'] = 'pending'
+        # 書き込み時に検証を済ませておくことで、読み込み時の検証を省略できる
         validate_schedule(payload)
-        schedules.append(payload)
+        with unit_of_work() as uow:
+            uow.schedules.add(payload, validated=True)
+            uow.commit()
         return payload
     
 # URL パラメータは <> で囲んで定義
@@ -125,9 +150,11 @@ class KitchenSchedule(MethodView):
         schema=GetScheduledOrderSchema
     )
     def get(self, schedule_id: str):
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                validate_schedule(schedule)
+        with unit_of_work() as uow:
+            schedule = uow.schedules.get(schedule_id)
+            if schedule is not None:
+                validate_on_read(uow.schedules, [schedule])
+                uow.commit()
                 return schedule
         abort(
             404,
@@ -140,10 +167,13 @@ class KitchenSchedule(MethodView):
         schema=GetScheduledOrderSchema
     )
     def put(self, payload: ScheduleOrder, schedule_id: str):
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                schedule.update(payload)
-                validate_schedule(schedule)
+        with unit_of_work() as uow:
+            schedule = uow.schedules.get(schedule_id)
+            if schedule is not None:
+                # 更新後の内容を検証してから書き込む
+                validate_schedule({**schedule, **payload})
+                schedule = uow.schedules.update(schedule_id, payload, validated=True)
+                uow.commit()
                 return schedule
         abort(
             404,
@@ -152,9 +182,9 @@ class KitchenSchedule(MethodView):
 
     @blueprint.response(status_code=204)
     def delete(self, schedule_id: str):
-        for index, schedule in enumerate(schedules):
-            if schedule['id'] == schedule_id:
-                schedules.pop(index)
+        with unit_of_work() as uow:
+            if uow.schedules.delete(schedule_id):
+                uow.commit()
                 return
         abort(
             404,
@@ -168,10 +198,14 @@ class KitchenSchedule(MethodView):
 )
 @blueprint.route('/kitchen/schedules/<schedule_id>/cancel', methods=['POST'])
 def cancel_schedule(schedule_id: str):
-    for schedule in schedules:
-        if schedule['id'] == schedule_id:
-            schedule['status'] = 'cancelled'
-            validate_schedule(schedule)
+    with unit_of_work() as uow:
+        schedule = uow.schedules.get(schedule_id)
+        if schedule is not None:
+            validate_schedule({**schedule, 'status': 'cancelled'})
+            schedule = uow.schedules.set_status(
+                schedule_id, 'cancelled', validated=True
+            )
+            uow.commit()
             return schedule
     abort(
         404,
@@ -184,9 +218,11 @@ def cancel_schedule(schedule_id: str):
 )
 @blueprint.route('/kitchen/schedules/<schedule_id>/status', methods=['GET'])
 def get_schedule_status(schedule_id: str):
-    for schedule in schedules:
-        if schedule['id'] == schedule_id:
-            validate_schedule(schedule)
+    with unit_of_work() as uow:
+        schedule = uow.schedules.get(schedule_id)
+        if schedule is not None:
+            validate_on_read(uow.schedules, [schedule])
+            uow.commit()
             return {'status': schedule['status']}
     abort(
         404,
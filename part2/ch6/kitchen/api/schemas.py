@@ -64,5 +64,19 @@ class GetKitchenScheduleParameters(Schema):
     
     # URL クエリパラメータのフィールドを定義
     progress = fields.Boolean()
-    limit = fields.Integer()
-    since = fields.DateTime()
\ No newline at end of file
+    limit = fields.Integer(validate=validate.Range(0, min_inclusive=True))
+    since = fields.DateTime()
+    until = fields.DateTime()
+    # ?status=pending&status=progress のように複数指定でき、いずれかに一致するものを返す
+    status = fields.List(
+        fields.String(
+            validate=validate.OneOf(
+                ["pending", "progress", "cancelled", "finished"]
+            )
+        )
+    )
+    # scheduled の並び順
+    ordering = fields.String(
+        load_default='asc',
+        validate=validate.OneOf(['asc', 'desc'])
+    )
\ No newline at end of file
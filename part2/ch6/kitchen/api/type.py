@@ -1,4 +1,4 @@
-from typing import TypedDict, Literal, List
+from typing import TypedDict, Literal, List, get_args
 from datetime import datetime
 
 # order の定義
@@ -7,11 +7,15 @@ class EachOrder(TypedDict):
     quantity: int # 本当は1以上の整数だが、型ヒントではそこまで制約をかけられない
     size: Literal['small', 'medium', 'big']
 
+# スケジュールのステータスの型と、その取りうる値の一覧
+ScheduleStatus = Literal["pending", "progress", "cancelled", "finished"]
+SCHEDULE_STATUSES = get_args(ScheduleStatus)
+
 # schedule の型を定義
 class Schedule(TypedDict):
     id: str
     scheduled: datetime
-    status: Literal["pending", "progress", "cancelled", "finished"]
+    status: ScheduleStatus
     order: List[EachOrder]
     
 class ScheduleOrder(TypedDict):
@@ -1,3 +1,6 @@
+import os
+
+
 class BaseConfig:
     API_TITLE = 'Kitchen API'
     API_VERSION = 'v1'
@@ -7,4 +10,22 @@ class BaseConfig:
     OPENAPI_REDOC_PATH = '/redoc'
     OPENAPI_REDOC_URL = 'https://cdn.jsdelivr.net/npm/redoc@next/bundles/redoc.standalone.js'  # noqa: E501
     OPENAPI_SWAGGER_UI_PATH = '/docs'
-    OPENAPI_SWAGGER_UI_URL = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist/'
\ No newline at end of file
+    OPENAPI_SWAGGER_UI_URL = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist/'
+
+    # 読み込み時にも、返却するスケジュールの一部を抜き出してスキーマの検証を行うかどうか
+    # スケジュールは書き込み時に検証されるため、通常は無効にしておく
+    SCHEDULE_PARANOID_VALIDATION = (
+        os.getenv('SCHEDULE_PARANOID_VALIDATION', 'false').lower() == 'true'
+    )
+    # 読み込み時の検証で抜き出すスケジュールの数
+    SCHEDULE_PARANOID_SAMPLE_SIZE = int(
+        os.getenv('SCHEDULE_PARANOID_SAMPLE_SIZE', '10')
+    )
+
+    # スケジュールの保存先 (memory: プロセス内のストア, sql: データベース)
+    # 複数のワーカープロセスで動かす場合は sql を指定する
+    SCHEDULE_STORAGE = os.getenv('SCHEDULE_STORAGE', 'memory')
+    # SCHEDULE_STORAGE が sql の場合の接続先
+    SCHEDULE_DATABASE_URL = os.getenv(
+        'SCHEDULE_DATABASE_URL', 'sqlite:///kitchen.db'
+    )
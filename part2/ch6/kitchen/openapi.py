@@ -0,0 +1,90 @@
+'''API 仕様書 (OAS) の読み込みと配信
+
+YAML の仕様書を import のたびに yaml.safe_load で解析すると、純粋な Python 実装の
+ローダーが使われるため、起動に時間がかかる。また flask-smorest は /openapi/kitchen.json への
+リクエストのたびに辞書を JSON に変換し直す。
+
+ここでは、解析結果を JSON に変換したバイト列を __pycache__ にキャッシュし、
+YAML ファイルの更新時刻とサイズが変わらない限りはそれを読み込む。
+キャッシュがない場合は、利用できれば libyaml による C 実装のローダーで解析する。
+/openapi/kitchen.json には、このバイト列をそのまま返す。
+'''
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Tuple
+
+import yaml
+from apispec import APISpec
+from flask import Flask
+from flask_smorest import Api
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+# キャッシュの形式を変えた場合に、古いキャッシュを使わないようにするための番号
+CACHE_VERSION = 1
+
+
+def _cache_path(path: Path) -> Path:
+    '''仕様書の更新時刻とサイズから、キャッシュファイルのパスを決める'''
+    stat = path.stat()
+    key = hashlib.sha1(
+        f'{CACHE_VERSION}:{path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}'.encode()
+    ).hexdigest()[:16]
+    return path.parent / '__pycache__' / f'{path.stem}.{key}.json'
+
+
+def load_spec(path: Path) -> Tuple[dict, bytes]:
+    '''仕様書を読み込み、辞書と JSON にエンコードしたバイト列を返す
+
+    キャッシュの読み書きに失敗した場合 (読み取り専用のファイルシステムなど) は、
+    キャッシュを使わずに YAML を解析する
+    '''
+    path = Path(path)
+    cache_path = _cache_path(path)
+    try:
+        content = cache_path.read_bytes()
+        return json.loads(content), content
+    except (OSError, ValueError):
+        pass
+
+    spec = yaml.load(path.read_text(), Loader=SafeLoader)
+    content = json.dumps(spec, separators=(',', ':'), default=str).encode()
+    try:
+        cache_path.parent.mkdir(exist_ok=True)
+        # 書き込み途中のファイルを他のプロセスが読まないよう、一時ファイルから置き換える
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, cache_path)
+        # 仕様書を更新する前のキャッシュは不要になるため削除する
+        for stale in cache_path.parent.glob(f'{path.stem}.*.json'):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        pass
+    return spec, content
+
+
+def install_openapi(app: Flask, api: Api, path: Path):
+    '''仕様書を api の OpenAPI として登録し、エンコード済みのバイト列を配信する
+
+    flask-smorest が登録した /openapi/kitchen.json のビュー関数を差し替える
+    '''
+    spec_dict, content = load_spec(path)
+    spec = APISpec(
+        title=spec_dict['info']['title'],
+        version=spec_dict['info']['version'],
+        openapi_version=spec_dict['openapi']
+    )
+    spec.to_dict = lambda: spec_dict
+    api.spec = spec
+
+    def openapi_json():
+        return app.response_class(content, mimetype='application/json')
+
+    app.view_functions['api-docs.openapi_json'] = openapi_json
@@ -0,0 +1,70 @@
+'''データベースエンジンと sessionmaker のレジストリを定義するモジュール。
+
+エンジンはコネクションプールを持つため、接続先 URL ごとにプロセス内で一度だけ生成し、
+以降のリクエストではそれを使い回す。
+初回の生成時には schedule テーブルを (存在しなければ) 作成する。
+'''
+
+import threading
+from typing import Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from .models import Base
+
+_engines: Dict[str, Engine] = {}
+_session_makers: Dict[str, sessionmaker] = {}
+_lock = threading.Lock()
+
+
+def _create_tables(engine: Engine):
+    try:
+        Base.metadata.create_all(engine)
+    except OperationalError:
+        # 複数のワーカープロセスが同時に起動すると、
+        # 存在の確認から作成までの間に別のプロセスが作成を済ませていることがある
+        Base.metadata.create_all(engine)
+
+
+def get_engine(url: str) -> Engine:
+    '''接続先 URL に対応するエンジンを取得'''
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _lock:
+        # ロックの取得待ちの間に、別スレッドで生成済みになっている可能性がある
+        engine = _engines.get(url)
+        if engine is None:
+            engine = create_engine(url)
+            _create_tables(engine)
+            _engines[url] = engine
+    return engine
+
+
+def get_session_maker(url: str) -> sessionmaker:
+    '''接続先 URL に対応する sessionmaker を取得'''
+    session_maker = _session_makers.get(url)
+    if session_maker is not None:
+        return session_maker
+    engine = get_engine(url)
+    with _lock:
+        session_maker = _session_makers.get(url)
+        if session_maker is None:
+            session_maker = sessionmaker(bind=engine)
+            _session_makers[url] = session_maker
+    return session_maker
+
+
+def dispose_engines() -> None:
+    '''生成済みのエンジンを破棄し、レジストリを空にする
+
+    gunicorn などでワーカープロセスを fork した後に呼び出す。
+    '''
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_makers.clear()
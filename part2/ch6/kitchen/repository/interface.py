@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from ..api.type import Schedule
+
+
+class ScheduleStoreInterface(ABC):
+    '''スケジュールの保存先のインターフェース
+
+    インメモリの ScheduleStore と、データベースに保存する SqlScheduleStore が実装する。
+    API のハンドラはこのインターフェースを通じてスケジュールを操作するため、
+    保存先を差し替えてもハンドラ側の変更は不要となる。
+    '''
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[Schedule]:
+        """
+        スケジュールを scheduled の昇順に返す。
+
+        Returns:
+            Iterator[Schedule]: スケジュールのイテレータ。
+        """
+        pass
+
+    @abstractmethod
+    def add(self, schedule: Schedule, validated: bool = False) -> Schedule:
+        """
+        スケジュールを追加する。
+
+        Args:
+            schedule (Schedule): 追加するスケジュール。
+            validated (bool): 追加する前にスキーマの検証を済ませたかどうか。
+
+        Returns:
+            Schedule: 追加したスケジュール。
+        """
+        pass
+
+    @abstractmethod
+    def get(self, schedule_id: str) -> Optional[Schedule]:
+        """
+        ID を指定してスケジュールを取得する。
+
+        Args:
+            schedule_id (str): スケジュールの ID。
+
+        Returns:
+            Optional[Schedule]: スケジュール。存在しない場合は None。
+        """
+        pass
+
+    @abstractmethod
+    def update(
+        self,
+        schedule_id: str,
+        payload: dict,
+        validated: bool = False
+    ) -> Optional[Schedule]:
+        """
+        スケジュールの内容を更新する。
+
+        Args:
+            schedule_id (str): スケジュールの ID。
+            payload (dict): 更新する内容。
+            validated (bool): 更新後の内容でスキーマの検証を済ませたかどうか。
+
+        Returns:
+            Optional[Schedule]: 更新後のスケジュール。存在しない場合は None。
+        """
+        pass
+
+    def set_status(
+        self,
+        schedule_id: str,
+        status: str,
+        validated: bool = False
+    ) -> Optional[Schedule]:
+        return self.update(schedule_id, {'status': status}, validated)
+
+    @abstractmethod
+    def delete(self, schedule_id: str) -> bool:
+        """
+        スケジュールを削除する。
+
+        Args:
+            schedule_id (str): スケジュールの ID。
+
+        Returns:
+            bool: 削除できたかどうか。
+        """
+        pass
+
+    @abstractmethod
+    def unvalidated(self) -> List[Schedule]:
+        '''書き込み時に検証されていないスケジュールを取得'''
+        pass
+
+    @abstractmethod
+    def mark_validated(self, schedule_id: str):
+        '''スケジュールを検証済みとして記録'''
+        pass
+
+    @abstractmethod
+    def query(
+        self,
+        statuses: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = False
+    ) -> List[Schedule]:
+        """
+        条件に合うスケジュールを scheduled の順に取得する。
+
+        すべての条件を同時に満たすスケジュールだけを返す。
+
+        Args:
+            statuses (Optional[Iterable[str]]): ステータスの候補。None の場合はステータスで絞り込まない。
+            since (Optional[datetime]): scheduled の下限 (この時刻を含む)。
+            until (Optional[datetime]): scheduled の上限 (この時刻を含む)。
+            limit (Optional[int]): 取得する最大件数。
+            descending (bool): scheduled の降順に並べるかどうか。
+
+        Returns:
+            List[Schedule]: スケジュールのリスト。
+        """
+        pass
+
@@ -0,0 +1,33 @@
+from sqlalchemy import Boolean, Column, DateTime, Index, JSON, String
+from sqlalchemy.orm import declarative_base
+
+# 宣言的なベースモデルを作成
+Base = declarative_base()
+
+
+class ScheduleModel(Base):
+    __tablename__ = 'schedule'
+
+    id = Column(String, primary_key=True)
+    scheduled = Column(DateTime, nullable=False)
+    status = Column(String, nullable=False)
+    # 注文の内容は常にスケジュールと一緒に読み書きするため、JSON として1列に保持する
+    order = Column(JSON, nullable=False)
+    # 書き込み時にスキーマの検証を済ませたかどうか
+    validated = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        # since による絞り込みと、scheduled の順での一覧に利用する
+        Index('ix_schedule_scheduled_id', 'scheduled', 'id'),
+        # progress による絞り込みに利用する
+        Index('ix_schedule_status_scheduled', 'status', 'scheduled'),
+        Index('ix_schedule_validated', 'validated'),
+    )
+
+    def dict(self):
+        return {
+            'id': self.id,
+            'scheduled': self.scheduled,
+            'status': self.status,
+            'order': self.order,
+        }
@@ -0,0 +1,98 @@
+'''データベースにスケジュールを保存するストア
+
+ScheduleStore と同じインターフェースで、スケジュールを schedule テーブルに読み書きする。
+保存先がプロセスの外にあるため、再起動してもスケジュールが失われず、
+複数のワーカープロセスから同じスケジュールを参照できる。
+ステータスと scheduled にはインデックスを張っているため、
+ステータスや scheduled の範囲による絞り込みはインデックスを使って行われる。
+'''
+
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..api.type import Schedule
+from .interface import ScheduleStoreInterface
+from .models import ScheduleModel
+
+
+class SqlScheduleStore(ScheduleStoreInterface):
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def __len__(self) -> int:
+        return self.session.scalar(select(func.count()).select_from(ScheduleModel))
+
+    def __iter__(self) -> Iterator[Schedule]:
+        query = select(ScheduleModel).order_by(ScheduleModel.scheduled, ScheduleModel.id)
+        for record in self.session.scalars(query):
+            yield record.dict()
+
+    def add(self, schedule: Schedule, validated: bool = False) -> Schedule:
+        self.session.add(ScheduleModel(**schedule, validated=validated))
+        return schedule
+
+    def _get(self, schedule_id: str) -> Optional[ScheduleModel]:
+        return self.session.get(ScheduleModel, schedule_id)
+
+    def get(self, schedule_id: str) -> Optional[Schedule]:
+        record = self._get(schedule_id)
+        if record is not None:
+            return record.dict()
+
+    def update(
+        self,
+        schedule_id: str,
+        payload: dict,
+        validated: bool = False
+    ) -> Optional[Schedule]:
+        record = self._get(schedule_id)
+        if record is None:
+            return None
+        for key, value in payload.items():
+            setattr(record, key, value)
+        record.validated = validated
+        return record.dict()
+
+    def delete(self, schedule_id: str) -> bool:
+        record = self._get(schedule_id)
+        if record is None:
+            return False
+        self.session.delete(record)
+        return True
+
+    def unvalidated(self) -> List[Schedule]:
+        query = select(ScheduleModel).where(ScheduleModel.validated.is_(False))
+        return [record.dict() for record in self.session.scalars(query)]
+
+    def mark_validated(self, schedule_id: str):
+        record = self._get(schedule_id)
+        if record is not None:
+            record.validated = True
+
+    def query(
+        self,
+        statuses: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = False
+    ) -> List[Schedule]:
+        '''すべての条件を1つの SELECT にまとめ、絞り込みと件数の制限をデータベース側で行う'''
+        query = select(ScheduleModel)
+        if statuses is not None:
+            query = query.where(ScheduleModel.status.in_(list(statuses)))
+        if since is not None:
+            query = query.where(ScheduleModel.scheduled >= since)
+        if until is not None:
+            query = query.where(ScheduleModel.scheduled <= until)
+        if descending:
+            query = query.order_by(ScheduleModel.scheduled.desc(), ScheduleModel.id.desc())
+        else:
+            query = query.order_by(ScheduleModel.scheduled, ScheduleModel.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [record.dict() for record in self.session.scalars(query)]
@@ -0,0 +1,164 @@
+'''インメモリでスケジュールを保持するストア
+
+スケジュールを単純なリストで持つと、ID による検索や削除のたびにリストを先頭から走査することになる。
+ScheduleStore では以下の3つのインデックスを持つことで、走査を避ける。
+
+- ID → スケジュールのハッシュインデックス (ID による取得・更新・削除を O(1) で行う)
+- scheduled の昇順に並べた (scheduled, ID) のリスト (since, until による絞り込みを二分探索で行う)
+- ステータスごとに、上記と同じ形式で並べたリスト (ステータスによる絞り込みに利用)
+
+絞り込みの条件は query でまとめて受け取り、インデックスを1回走査するだけで結果を返す。
+
+また、書き込み時にスキーマの検証を済ませたかどうかを記録しておき、
+読み込み時には検証が済んでいないスケジュールだけを検証すれば済むようにする。
+'''
+
+import bisect
+import heapq
+import itertools
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ..api.type import Schedule
+from .interface import ScheduleStoreInterface
+
+
+class ScheduleStore(ScheduleStoreInterface):
+
+    def __init__(self):
+        self._by_id: Dict[str, Schedule] = {}
+        # scheduled の昇順に並んだ (scheduled, ID) のリスト
+        self._by_scheduled: List[Tuple[datetime, str]] = []
+        # ステータスごとに、scheduled の昇順に並んだ (scheduled, ID) のリストを保持する
+        self._by_status: Dict[str, List[Tuple[datetime, str]]] = {}
+        # 書き込み時に検証されていないスケジュールの ID
+        self._unvalidated: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Schedule]:
+        '''スケジュールを scheduled の昇順に返す'''
+        for _, schedule_id in self._by_scheduled:
+            yield self._by_id[schedule_id]
+
+    def add(self, schedule: Schedule, validated: bool = False) -> Schedule:
+        '''スケジュールを追加し、各インデックスに登録
+
+        validated には、追加する前にスキーマの検証を済ませたかどうかを指定する
+        '''
+        self._by_id[schedule['id']] = schedule
+        self._set_validated(schedule['id'], validated)
+        key = (schedule['scheduled'], schedule['id'])
+        # 新しいスケジュールは scheduled が最も新しいことがほとんどのため、
+        # insort でも実際には末尾への追加になる
+        bisect.insort(self._by_scheduled, key)
+        bisect.insort(self._by_status.setdefault(schedule['status'], []), key)
+        return schedule
+
+    def get(self, schedule_id: str) -> Optional[Schedule]:
+        return self._by_id.get(schedule_id)
+
+    def update(
+        self,
+        schedule_id: str,
+        payload: dict,
+        validated: bool = False
+    ) -> Optional[Schedule]:
+        '''スケジュールの内容を更新
+
+        ステータスや scheduled が変わる場合は、インデックスも合わせて付け替える。
+        validated には、更新後の内容でスキーマの検証を済ませたかどうかを指定する。
+        存在しない ID の場合は None を返す。
+        '''
+        schedule = self._by_id.get(schedule_id)
+        if schedule is None:
+            return None
+        self._set_validated(schedule_id, validated)
+        status, scheduled = schedule['status'], schedule['scheduled']
+        schedule.update(payload)
+        if schedule['status'] != status or schedule['scheduled'] != scheduled:
+            key = (schedule['scheduled'], schedule_id)
+            self._remove(self._by_status[status], (scheduled, schedule_id))
+            bisect.insort(self._by_status.setdefault(schedule['status'], []), key)
+            if schedule['scheduled'] != scheduled:
+                self._remove(self._by_scheduled, (scheduled, schedule_id))
+                bisect.insort(self._by_scheduled, key)
+        return schedule
+
+    def delete(self, schedule_id: str) -> bool:
+        '''スケジュールを削除し、削除できたかどうかを返す'''
+        schedule = self._by_id.pop(schedule_id, None)
+        if schedule is None:
+            return False
+        key = (schedule['scheduled'], schedule_id)
+        self._remove(self._by_status[schedule['status']], key)
+        self._remove(self._by_scheduled, key)
+        self._unvalidated.discard(schedule_id)
+        return True
+
+    def _set_validated(self, schedule_id: str, validated: bool):
+        if validated:
+            self._unvalidated.discard(schedule_id)
+        else:
+            self._unvalidated.add(schedule_id)
+
+    def unvalidated(self) -> List[Schedule]:
+        '''書き込み時に検証されていないスケジュールを取得'''
+        return [self._by_id[schedule_id] for schedule_id in self._unvalidated]
+
+    def mark_validated(self, schedule_id: str):
+        '''スケジュールを検証済みとして記録'''
+        self._unvalidated.discard(schedule_id)
+
+    @staticmethod
+    def _remove(index: List[Tuple[datetime, str]], key: Tuple[datetime, str]):
+        # 二分探索で位置を特定してから取り除く
+        del index[bisect.bisect_left(index, key)]
+
+    def query(
+        self,
+        statuses: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = False
+    ) -> List[Schedule]:
+        '''条件に合うスケジュールを scheduled の順に取得
+
+        ステータスごとの scheduled の昇順のリストを二分探索し、since から until までの範囲だけを
+        順番を保ったままマージしながら取り出す。
+        全体を一度作ってから絞り込むのではなく1件ずつ取り出すため、limit 件に達した時点で打ち切られる。
+        '''
+        if statuses is None:
+            indexes = [self._by_scheduled]
+        else:
+            indexes = [self._by_status.get(status, []) for status in set(statuses)]
+        ranges = [self._range(index, since, until, descending) for index in indexes]
+        if len(ranges) == 1:
+            keys = ranges[0]
+        else:
+            keys = heapq.merge(*ranges, reverse=descending)
+        return [
+            self._by_id[schedule_id]
+            for _, schedule_id in itertools.islice(keys, limit)
+        ]
+
+    @staticmethod
+    def _range(
+        index: List[Tuple[datetime, str]],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        descending: bool
+    ) -> Iterator[Tuple[datetime, str]]:
+        '''インデックスのうち scheduled が since 以降 until 以前の範囲を、コピーせずに順に返す'''
+        start = 0 if since is None else bisect.bisect_left(index, since, key=itemgetter(0))
+        stop = (
+            len(index) if until is None
+            else bisect.bisect_right(index, until, key=itemgetter(0))
+        )
+        positions = range(start, stop)
+        if descending:
+            positions = reversed(positions)
+        return (index[position] for position in positions)
@@ -0,0 +1,79 @@
+'''UnitOfWork クラスの定義モジュール。
+
+API のハンドラが、保存先の違いを意識せずに
+
+- スケジュールのストアの取得
+- コミット
+- ロールバック
+
+を行えるようにするコンテキストマネージャーを定義する。
+データベースに保存する UnitOfWork と、プロセス内のストアをそのまま使う
+InMemoryUnitOfWork の2つを用意し、設定によって使い分ける。
+'''
+
+from types import TracebackType
+from typing import Optional, Type
+
+from sqlalchemy.orm import sessionmaker
+
+from .sql_store import SqlScheduleStore
+from .store import ScheduleStore
+
+
+class UnitOfWork:
+
+    def __init__(self, session_maker: sessionmaker):
+        self.session_maker = session_maker
+
+    def __enter__(self):
+        '''コンテキストマネージャー開始時の処理
+
+        この段階で初めて、データベースとの接続を開始する
+        '''
+        self.session = self.session_maker()
+        self.schedules = SqlScheduleStore(self.session)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        '''例外が発生した場合はロールバックした上で、いずれの場合もセッションを閉じる'''
+        if exc_type is not None:
+            self.rollback()
+        self.session.close()
+
+    def commit(self):
+        self.session.commit()
+
+    def rollback(self):
+        self.session.rollback()
+
+
+class InMemoryUnitOfWork:
+    '''プロセス内の ScheduleStore をそのまま使う UnitOfWork
+
+    書き込みは即座にストアへ反映されるため、commit と rollback では何もしない。
+    '''
+
+    def __init__(self, store: ScheduleStore):
+        self.schedules = store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
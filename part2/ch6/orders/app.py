@@ -10,9 +10,10 @@ app = FastAPI(
 )
 
 # PyYAML を使って API 仕様書をロード
-print(Path(__file__).parent)
-oas_doc = yaml.safe_load(
-    (Path(__file__).parent / 'oas.yaml').read_text()
+# libyaml が利用できる場合は、C 実装のローダーで解析する
+oas_doc = yaml.load(
+    (Path(__file__).parent / 'oas.yaml').read_text(),
+    Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 )
 
 # FastAPI の openapi プロパティを上書きし、API仕様書を返すようにする
@@ -0,0 +1,9 @@
+'''ch6 のテストの共通設定
+
+benchmarks と同様に ch6 のディレクトリを基準にインポートするため、sys.path の先頭に追加する。
+'''
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
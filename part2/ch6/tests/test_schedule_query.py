@@ -0,0 +1,121 @@
+'''スケジュールの絞り込み (ScheduleStore.query, SqlScheduleStore.query) のテスト
+
+ランダムな条件の組み合わせについて、インメモリと SQL の両方のストアの結果が、
+全件を素朴に絞り込んで並べ替えた結果と一致することを確認する。
+'''
+
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from kitchen.api import api
+from kitchen.api.type import SCHEDULE_STATUSES
+from kitchen.app import app
+from kitchen.repository.engine import get_session_maker
+from kitchen.repository.sql_store import SqlScheduleStore
+from kitchen.repository.store import ScheduleStore
+
+START = datetime(2024, 1, 1)
+SIZE = 500
+
+
+def make_schedules(size: int):
+    '''scheduled が重複するものを含むスケジュールを作成'''
+    rng = random.Random(0)
+    return [
+        {
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'scheduled': START + timedelta(seconds=index // 2),
+            'status': rng.choice(SCHEDULE_STATUSES),
+            'order': [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}],
+        }
+        for index in range(size)
+    ]
+
+
+def brute_force(schedules, statuses=None, since=None, until=None, limit=None, descending=False):
+    query_set = [
+        s for s in schedules
+        if (statuses is None or s['status'] in statuses)
+        and (since is None or s['scheduled'] >= since)
+        and (until is None or s['scheduled'] <= until)
+    ]
+    query_set.sort(key=lambda s: (s['scheduled'], s['id']), reverse=descending)
+    return [s['id'] for s in query_set[:limit]]
+
+
+def random_conditions(rng: random.Random):
+    conditions = {'descending': rng.random() < 0.5}
+    if rng.random() < 0.5:
+        conditions['statuses'] = set(rng.sample(SCHEDULE_STATUSES, rng.randint(0, 3)))
+    if rng.random() < 0.5:
+        conditions['since'] = START + timedelta(seconds=rng.randrange(SIZE // 2))
+    if rng.random() < 0.5:
+        conditions['until'] = START + timedelta(seconds=rng.randrange(SIZE // 2))
+    if rng.random() < 0.5:
+        conditions['limit'] = rng.randint(0, 20)
+    return conditions
+
+
+@pytest.fixture(scope='module')
+def schedules():
+    return make_schedules(SIZE)
+
+
+@pytest.fixture(scope='module', params=['memory', 'sql'])
+def store(request, schedules, tmp_path_factory):
+    if request.param == 'memory':
+        store = ScheduleStore()
+        for schedule in schedules:
+            store.add(dict(schedule), validated=True)
+        yield store
+        return
+    db_path = tmp_path_factory.mktemp('kitchen') / 'kitchen.db'
+    session = get_session_maker(f'sqlite:///{db_path}')()
+    store = SqlScheduleStore(session)
+    for schedule in schedules:
+        store.add(dict(schedule), validated=True)
+    session.commit()
+    yield store
+    session.close()
+
+
+def test_query_matches_brute_force_for_random_conditions(store, schedules):
+    rng = random.Random(1)
+    for _ in range(300):
+        conditions = random_conditions(rng)
+        actual = [s['id'] for s in store.query(**conditions)]
+        assert actual == brute_force(schedules, **conditions), conditions
+
+
+@pytest.mark.parametrize('conditions', [
+    # progress と since を組み合わせた場合に、両方の条件が効くこと
+    dict(statuses={'progress'}, since=START + timedelta(seconds=100)),
+    dict(statuses={'progress'}, since=START + timedelta(seconds=100), limit=3),
+    dict(statuses=set(SCHEDULE_STATUSES) - {'progress'}, until=START + timedelta(seconds=50)),
+    dict(since=START + timedelta(seconds=10), until=START + timedelta(seconds=20), descending=True),
+    dict(statuses=set(), limit=5),
+    dict(limit=0),
+])
+def test_query_combined_filters(store, schedules, conditions):
+    assert [s['id'] for s in store.query(**conditions)] == brute_force(schedules, **conditions)
+
+
+def test_get_schedules_combines_progress_and_since(monkeypatch, schedules):
+    '''GET /kitchen/schedules で progress と since を同時に指定した場合'''
+    store = ScheduleStore()
+    for schedule in schedules:
+        store.add(dict(schedule), validated=True)
+    monkeypatch.setattr(api, 'schedules', store)
+    since = START + timedelta(seconds=100)
+
+    response = app.test_client().get(
+        '/kitchen/schedules',
+        query_string={'progress': 'true', 'since': since.isoformat(), 'limit': 5}
+    )
+
+    assert response.status_code == 200
+    expected = brute_force(schedules, statuses={'progress'}, since=since, limit=5)
+    assert [s['id'] for s in response.json['schedules']] == expected
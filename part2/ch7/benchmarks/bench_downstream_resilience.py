@@ -0,0 +1,135 @@
+'''厨房サービスが遅い・失敗する場合の、サーキットブレーカーとバルクヘッドの効果を確かめるスクリプト
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_downstream_resilience --delay 0.5 --timeout 0.1
+
+遅延やエラーを注入できるスタブサーバーを起動し、以下のシナリオを順に実行して、
+各シナリオの呼び出しにかかった時間と DownstreamGuard のメトリクスを表示する。
+
+- slow: 厨房サービスがタイムアウトより遅い。failure_threshold 回失敗した後は、
+  タイムアウトを待たずに失敗する (fail fast)
+- recovery: 厨房サービスが回復した後、recovery_timeout 秒経つと半開になり、
+  試しの呼び出しが成功して閉じる
+- errors: 厨房サービスが 500 を返し続ける場合も同様にブレーカーが開く
+- bulkhead: 厨房サービスへの同時呼び出しが上限を超えた分は待たずに失敗し、
+  その間も支払いサービスの呼び出しは影響を受けない
+
+ブレーカーの状態遷移の確認は tests/test_resilience.py で行う。
+'''
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import StubBehavior, start_stub_server
+from orders.clients.http import HTTPClient
+from orders.clients.kitchen import KitchenClient
+from orders.clients.payments import PaymentsClient
+from orders.clients.resilience import (
+    AsyncBulkhead,
+    Bulkhead,
+    CircuitBreaker,
+    DownstreamGuard
+)
+from orders.orders_service.exceptions import (
+    APIIntegrationError,
+    DownstreamUnavailableError
+)
+
+ITEMS = [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}]
+
+
+def make_guard(name: str, args) -> DownstreamGuard:
+    return DownstreamGuard(
+        name,
+        CircuitBreaker(
+            name,
+            failure_threshold=args.failure_threshold,
+            recovery_timeout=args.recovery_timeout
+        ),
+        Bulkhead(name, args.max_concurrency, max_wait=0.01),
+        AsyncBulkhead(name, args.max_concurrency, max_wait=0.01)
+    )
+
+
+def call(func, *args):
+    '''呼び出しの結果と、かかった時間 (ミリ秒) を返す'''
+    start = time.perf_counter()
+    try:
+        func(*args)
+        outcome = 'ok'
+    except DownstreamUnavailableError:
+        outcome = 'rejected'
+    except APIIntegrationError:
+        outcome = 'failed'
+    return outcome, (time.perf_counter() - start) * 1000
+
+
+def report(name: str, results, guard: DownstreamGuard):
+    outcomes = [outcome for outcome, _ in results]
+    counts = {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+    elapsed = sum(ms for _, ms in results)
+    print(f'{name:>9}: {counts} total {elapsed:8.1f} ms')
+    print(f'{"":>9}  {guard.stats()}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=0.1)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--failure-threshold', type=int, default=5)
+    parser.add_argument('--recovery-timeout', type=float, default=0.5)
+    parser.add_argument('--max-concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    behavior = StubBehavior()
+    port = start_stub_server(behavior).server_address[1]
+    # 再試行はブレーカーの効果を見えにくくするため行わない
+    http_client = HTTPClient(
+        timeout=args.timeout, max_retries=0, backoff_factor=0, pool_maxsize=32
+    )
+    kitchen_guard = make_guard('kitchen', args)
+    payments_guard = make_guard('payments', args)
+    kitchen = KitchenClient(
+        http_client, f'http://127.0.0.1:{port}/kitchen', guard=kitchen_guard
+    )
+    payments = PaymentsClient(
+        http_client, f'http://127.0.0.1:{port}/payments', guard=payments_guard
+    )
+
+    # slow: タイムアウトするのは failure_threshold 回だけで、残りは即座に失敗する
+    behavior.delay['kitchen'] = args.delay
+    results = [call(kitchen.schedule, ITEMS) for _ in range(args.calls)]
+    report('slow', results, kitchen_guard)
+
+    # recovery: 回復してから recovery_timeout 秒経つと、試しの呼び出しを経て閉じる
+    behavior.delay['kitchen'] = 0.0
+    time.sleep(args.recovery_timeout)
+    results = [call(kitchen.schedule, ITEMS) for _ in range(args.calls)]
+    report('recovery', results, kitchen_guard)
+
+    # errors: 5xx のレスポンスも失敗として数える
+    behavior.status['kitchen'] = 500
+    results = [call(kitchen.schedule, ITEMS) for _ in range(args.calls)]
+    report('errors', results, kitchen_guard)
+    behavior.status['kitchen'] = None
+    time.sleep(args.recovery_timeout)
+    call(kitchen.schedule, ITEMS)
+
+    # bulkhead: 厨房サービスが遅い間も、支払いサービスの呼び出しは待たされない
+    behavior.delay['kitchen'] = args.timeout / 2
+    with ThreadPoolExecutor(max_workers=args.max_concurrency * 4) as executor:
+        futures = [
+            executor.submit(call, kitchen.schedule, ITEMS)
+            for _ in range(args.max_concurrency * 4)
+        ]
+        payments_results = [call(payments.pay, 'order-id') for _ in range(5)]
+        results = [future.result() for future in futures]
+    report('bulkhead', results, kitchen_guard)
+    report('payments', payments_results, payments_guard)
+
+
+if __name__ == '__main__':
+    main()
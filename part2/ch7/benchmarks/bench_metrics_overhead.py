@@ -0,0 +1,83 @@
+'''計測のミドルウェアによるオーバーヘッドを確認するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_metrics_overhead --requests 2000
+
+ミドルウェアの登録はアプリケーションの import 時に決まるため、
+- off: ORDERS_METRICS, SERVER_TIMING ともに無効
+- metrics: ORDERS_METRICS=true
+- metrics+timing: ORDERS_METRICS=true, SERVER_TIMING=true
+のそれぞれを別プロセスで起動し、GET /orders/{order_id} を TestClient から繰り返し呼び出して
+1 秒あたりのリクエスト数を比較する。キャッシュを使うと SQL が発行されないため、キャッシュは無効にする。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MODES = {
+    'off': {'ORDERS_METRICS': 'false', 'SERVER_TIMING': 'false'},
+    'metrics': {'ORDERS_METRICS': 'true', 'SERVER_TIMING': 'false'},
+    'metrics+timing': {'ORDERS_METRICS': 'true', 'SERVER_TIMING': 'true'},
+}
+
+
+def run(requests: int):
+    '''環境変数で指定された設定で計測し、1 秒あたりのリクエスト数を出力する'''
+    from fastapi.testclient import TestClient
+
+    from orders.repository.engine import get_engine
+    from orders.repository.models import Base
+    from orders.web.app import app
+
+    Base.metadata.create_all(get_engine())
+    client = TestClient(app)
+    order_id = client.post(
+        '/orders', json={'items': [{'product': 'cappuccino', 'size': 'small'}]}
+    ).json()['id']
+    for _ in range(100):
+        client.get(f'/orders/{order_id}')
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(f'/orders/{order_id}')
+        assert response.status_code == 200
+    print(requests / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.requests)
+        return
+
+    for name, env in MODES.items():
+        db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_metrics_overhead',
+             '--requests', str(args.requests), '--run'],
+            env={
+                **os.environ,
+                **env,
+                'DATABASE_URL': f'sqlite:///{db_path}',
+                'ORDERS_CACHE': 'none',
+                'OUTBOX_DISPATCHER': 'off',
+            },
+            check=True,
+            capture_output=True,
+            text=True
+        ).stdout
+        print(f'{name:>15}: {float(output):8.1f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''GET /orders/{order_id} のキャッシュによる効果を計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_order_cache --requests 2000
+
+GET /orders/{order_id} を FastAPI の TestClient から繰り返し呼び出し、
+- none: キャッシュを使わない (変更前の挙動)
+- memory: プロセス内の LRUOrderCache を使う
+- fake: FakeKeyValueStore に保存する KeyValueOrderCache を使う
+- not_modified: memory に加えて If-None-Match を送り、304 を受け取る
+の4通りで 1 秒あたりのリクエスト数と、実行された SQL の数を比較する。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    # アプリケーションを import する前に接続先を一時ファイルへ切り替える
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from fastapi.testclient import TestClient
+
+    from orders.repository.cache import (
+        FakeKeyValueStore,
+        KeyValueOrderCache,
+        LRUOrderCache,
+        get_order_cache
+    )
+    from orders.repository.engine import get_engine
+    from orders.repository.instrumentation import count_queries
+    from orders.repository.models import Base
+    from orders.web.api import api
+    from orders.web.app import app
+
+    Base.metadata.create_all(get_engine())
+    client = TestClient(app)
+    order_id = client.post(
+        '/orders',
+        json={'items': [{'product': 'cappuccino', 'size': 'small'}]}
+    ).json()['id']
+    etag = client.get(f'/orders/{order_id}').headers['ETag']
+
+    variants = {
+        'none': (None, {}),
+        'memory': (LRUOrderCache(), {}),
+        'fake': (KeyValueOrderCache(FakeKeyValueStore()), {}),
+        'not_modified': (LRUOrderCache(), {'If-None-Match': etag}),
+    }
+    for name, (cache, headers) in variants.items():
+        api.get_order_cache = lambda: cache
+        with count_queries(get_engine()) as counter:
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                response = client.get(f'/orders/{order_id}', headers=headers)
+                assert response.status_code in (200, 304)
+            elapsed = time.perf_counter() - start
+        stats = cache.stats.dict() if cache is not None else {}
+        print(
+            f'{name:>12}: {args.requests / elapsed:8.1f} req/s, '
+            f'{counter.count:>5} queries {stats}'
+        )
+    api.get_order_cache = get_order_cache
+
+
+if __name__ == '__main__':
+    main()
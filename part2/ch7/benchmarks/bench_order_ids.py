@@ -0,0 +1,102 @@
+'''ID の生成方法 (uuid4, uuid7) ごとの INSERT のスループットとインデックスのサイズを比較
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_order_ids --orders 300000 --batch 500
+
+インメモリの SQLite とファイルの SQLite それぞれについて、ORDER_ID_GENERATOR を切り替えながら、
+OrdersRepository.add_many で --batch 件ずつ注文 (アイテムは 2 件ずつ) を投入し、バッチごとにコミットする。
+
+- total: 全体の 1 秒あたりの注文数
+- last: 最後の 10% の 1 秒あたりの注文数 (テーブルが大きくなった後の性能)
+- index: 主キーのインデックスのサイズと、ページの使用率 (dbstat の payload / pgsize)
+
+uuid4 ではインデックスのランダムな位置に追加されるため、書き込むページが散らばり、
+テーブルがキャッシュに収まらなくなるほど INSERT が遅くなる。
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from orders.repository.ids import get_id_generator
+from orders.repository.models import Base
+from orders.repository.orders_repository import OrdersRepository
+
+ITEMS = [
+    {'product': 'cappuccino', 'size': 'small', 'quantity': 1},
+    {'product': 'latte', 'size': 'medium', 'quantity': 2},
+]
+PRIMARY_KEY_INDEXES = ('sqlite_autoindex_order_1', 'sqlite_autoindex_order_item_1')
+
+
+def create(storage: str):
+    if storage == 'memory':
+        # 全ての接続で同じインメモリのデータベースを使う
+        return create_engine(
+            'sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False}
+        )
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    return create_engine(f'sqlite:///{db_path}')
+
+
+def insert(engine, orders: int, batch: int):
+    '''(全体の秒数, 最後の 10% の秒数, 最後の 10% の注文数) を返す'''
+    session_maker = sessionmaker(bind=engine)
+    tail_from = orders - orders // 10
+    start = time.perf_counter()
+    tail_start = None
+    with session_maker() as session:
+        repo = OrdersRepository(session)
+        for offset in range(0, orders, batch):
+            if tail_start is None and offset >= tail_from:
+                tail_start, tail_from = time.perf_counter(), offset
+            repo.add_many([ITEMS] * min(batch, orders - offset))
+            session.commit()
+    end = time.perf_counter()
+    return end - start, end - tail_start, orders - tail_from
+
+
+def index_stats(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            'SELECT name, SUM(pgsize), SUM(payload) FROM dbstat GROUP BY name'
+        ))
+        return {
+            name: (size, payload)
+            for name, size, payload in rows
+            if name in PRIMARY_KEY_INDEXES
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=300000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--storage', nargs='+', choices=('memory', 'file'), default=['memory', 'file'])
+    args = parser.parse_args()
+
+    for storage in args.storage:
+        for generator in ('uuid4', 'uuid7'):
+            os.environ['ORDER_ID_GENERATOR'] = generator
+            get_id_generator.cache_clear()
+            engine = create(storage)
+            Base.metadata.create_all(engine)
+            total, tail, tail_orders = insert(engine, args.orders, args.batch)
+            print(
+                f'{storage:>6} {generator}: total {args.orders / total:8.0f} orders/s, '
+                f'last {tail_orders / tail:8.0f} orders/s'
+            )
+            for name, (size, payload) in index_stats(engine).items():
+                print(f'{"":>14}{name:>30}: {size / 2 ** 20:6.1f} MiB, {payload / size:4.0%} used')
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
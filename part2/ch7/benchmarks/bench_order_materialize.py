@@ -0,0 +1,131 @@
+'''注文データを Order オブジェクトにするまでの時間とメモリ使用量を計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_order_materialize --orders 100000 --memory
+
+--orders 件の注文 (アイテムは 2 件ずつ) を投入し、全件を Order オブジェクトのリストにする。
+
+- legacy: ORM で読み込み、record.dict() の辞書から __dict__ を持つクラスを作る (変更前の方法)
+- from_record: ORM で読み込み、Order.from_record で辞書を経由せずに作る (OrdersRepository.list)
+- rows: ORM オブジェクトを作らず、行から直接作る (OrdersRepository.stream)
+
+time は読み込みを含む処理時間。--memory を指定した場合は tracemalloc を有効にして
+もう一度実行し、処理中のメモリ使用量の最大値 (peak) と、セッションを閉じた後も残る
+Order のリストが使うメモリ量 (retained) を表示する。tracemalloc は処理を大きく遅くするため、
+時間とは別に計測する。
+'''
+
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from orders.repository.models import Base, OrderModel
+from orders.repository.orders_repository import OrdersRepository
+
+ITEMS = [
+    {'product': 'cappuccino', 'size': 'small', 'quantity': 1},
+    {'product': 'latte', 'size': 'medium', 'quantity': 2},
+]
+
+
+class LegacyOrderItem:
+    '''変更前の OrderItem と同じく、インスタンスごとに __dict__ を持つ'''
+    def __init__(self, id, product, quantity, size):
+        self.id = id
+        self.product = product
+        self.quantity = quantity
+        self.size = size
+
+
+class LegacyOrder:
+    '''変更前の Order と同じく、インスタンスごとに __dict__ を持つ'''
+    def __init__(self, id, created, items, status, schedule_id=None, delivery_id=None):
+        self._order = None
+        self._id = id
+        self._created = created
+        self.items = [LegacyOrderItem(**item) for item in items]
+        self._status = status
+        self.schedule_id = schedule_id
+        self.delivery_id = delivery_id
+        self._kitchen_client = None
+        self._payments_client = None
+
+
+def legacy(session):
+    records = session.query(OrderModel).options(selectinload(OrderModel.items)).all()
+    return [LegacyOrder(**record.dict()) for record in records]
+
+
+def from_record(session):
+    return OrdersRepository(session).list(limit=None)
+
+
+def rows(session):
+    return list(OrdersRepository(session).stream())
+
+
+def measure_time(session_maker, func):
+    gc.collect()
+    start = time.perf_counter()
+    with session_maker() as session:
+        orders = func(session)
+    return orders, time.perf_counter() - start
+
+
+def measure_memory(session_maker, func):
+    gc.collect()
+    tracemalloc.start()
+    with session_maker() as session:
+        orders = func(session)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del orders
+    return peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--memory', action='store_true', help='メモリ使用量も計測する')
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(bind=engine)
+    with session_maker() as session:
+        OrdersRepository(session).add_many([ITEMS] * args.orders)
+        session.commit()
+
+    print(f'orders: {args.orders}')
+    expected = None
+    for name, func in {'legacy': legacy, 'from_record': from_record, 'rows': rows}.items():
+        orders, elapsed = measure_time(session_maker, func)
+        line = f'{name:>11}: time {elapsed * 1000:8.1f} ms'
+        # 作成した Order の内容が方法によらず一致することを確認する
+        summary = sorted(
+            (order._id, order._status, tuple(
+                sorted((item.id, item.product, item.size, item.quantity) for item in order.items)
+            ))
+            for order in orders
+        )
+        assert expected is None or summary == expected
+        expected = summary
+        del orders, summary
+        if args.memory:
+            peak, retained = measure_memory(session_maker, func)
+            line += f', peak {peak / 2 ** 20:7.1f} MiB, retained {retained / 2 ** 20:7.1f} MiB'
+        print(line)
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
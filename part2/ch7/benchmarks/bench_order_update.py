@@ -0,0 +1,104 @@
+'''OrdersRepository.update でアイテムを更新する際の SQL 発行回数と処理時間を計測
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_order_update --items 10 100 1000
+
+--items 件のアイテムを持つ注文に対して、以下の変更を加える。
+
+- unchanged: 同じ内容で更新する
+- change_one: 1 件だけ数量を変える
+- append_one: 末尾に 1 件追加する
+- shrink_half: 後半の半分を取り除く
+
+それぞれ、全てのアイテムを削除してから追加し直す方法 (変更前の方法) と差分を反映する方法で、
+発行された SELECT 以外の SQL 文の数 (statements) と、書き込まれた行数 (rows) を比較する。
+更新後のアイテムが指定した内容と一致することの確認は tests/test_order_update.py で行う。
+'''
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from orders.repository.models import Base, OrderItemModel
+from orders.repository.orders_repository import OrdersRepository
+
+ITEM = {'product': 'cappuccino', 'size': 'small', 'quantity': 1}
+
+
+def changes(count: int):
+    items = [dict(ITEM) for _ in range(count)]
+    change_one = [dict(item) for item in items]
+    change_one[count // 2]['quantity'] = 2
+    return {
+        'unchanged': items,
+        'change_one': change_one,
+        'append_one': items + [{'product': 'latte', 'size': 'big', 'quantity': 1}],
+        'shrink_half': items[:count // 2],
+    }
+
+
+def replace_all(repo: OrdersRepository, order_id, items):
+    '''変更前の方法: 全てのアイテムを削除してから追加し直す'''
+    record = repo.get_record(order_id)
+    for item in record.items:
+        repo.session.delete(item)
+    record.items = [OrderItemModel(**item) for item in items]
+
+
+def diff(repo: OrdersRepository, order_id, items):
+    repo.update(order_id, items=items)
+
+
+class ExecutionCounter:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            return
+        self.statements += 1
+        # executemany や複数行の INSERT では、rowcount は処理した行数の合計になる
+        self.rows += max(cursor.rowcount, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(bind=engine)
+
+    for count in args.items:
+        for change, items in changes(count).items():
+            for name, update in {'replace_all': replace_all, 'diff': diff}.items():
+                with session_maker() as session:
+                    order = OrdersRepository(session).add([ITEM] * count)
+                    session.commit()
+                    order_id = order.id
+                counter = ExecutionCounter()
+                event.listen(engine, 'after_cursor_execute', counter)
+                start = time.perf_counter()
+                with session_maker() as session:
+                    update(OrdersRepository(session), order_id, items)
+                    session.commit()
+                elapsed = time.perf_counter() - start
+                event.remove(engine, 'after_cursor_execute', counter)
+                print(
+                    f'items={count:>5} {change:>11} {name:>11}: '
+                    f'{counter.statements:>3} statements, {counter.rows:>5} rows, '
+                    f'{elapsed * 1000:8.1f} ms'
+                )
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
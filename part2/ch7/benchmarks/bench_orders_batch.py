@@ -0,0 +1,72 @@
+'''注文の一括作成 (POST /orders/batch) のスループットを計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_orders_batch --orders 5000 --batch-size 500
+
+orders 件の注文 (1件あたり3アイテム) を FastAPI の TestClient から作成し、
+- single: POST /orders で1件ずつ作成する (変更前の方法)
+- batch: POST /orders/batch で batch_size 件ずつまとめて作成する
+の2通りで 1 秒あたりに作成できた注文数と、実行された SQL の数を比較する。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+ORDER = {
+    'items': [
+        {'product': 'cappuccino', 'size': 'small', 'quantity': 1},
+        {'product': 'latte', 'size': 'medium', 'quantity': 2},
+        {'product': 'mocha', 'size': 'big', 'quantity': 1},
+    ]
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    # アプリケーションを import する前に接続先を一時ファイルへ切り替える
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from fastapi.testclient import TestClient
+
+    from orders.repository.engine import get_engine
+    from orders.repository.instrumentation import count_queries
+    from orders.repository.models import Base
+    from orders.web.app import app
+
+    Base.metadata.create_all(get_engine())
+    client = TestClient(app)
+
+    def single():
+        for _ in range(args.orders):
+            response = client.post('/orders', json=ORDER)
+            assert response.status_code == 201
+
+    def batch():
+        for start in range(0, args.orders, args.batch_size):
+            size = min(args.batch_size, args.orders - start)
+            response = client.post('/orders/batch', json={'orders': [ORDER] * size})
+            assert response.status_code == 201
+
+    for name, run in {'single': single, 'batch': batch}.items():
+        with count_queries(get_engine()) as counter:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        print(
+            f'{name:>8}: {args.orders / elapsed:9.1f} orders/s, '
+            f'{counter.count:>6} queries'
+        )
+
+
+if __name__ == '__main__':
+    main()
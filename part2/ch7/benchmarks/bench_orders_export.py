@@ -0,0 +1,121 @@
+'''GET /orders/export のメモリ使用量を計測
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_orders_export --rows 1000000
+
+指定した件数の注文を一時ファイルの sqlite に投入し、uvicorn で起動した注文 API から
+NDJSON をストリーミングで受け取りながら、一定行数ごとにプロセスの RSS を表示する。
+サーバーとクライアントは同じプロセスで動かしているため、RSS は両者の合計になる。
+エクスポートした件数によらず RSS がほぼ一定であれば、メモリ使用量が抑えられている。
+'''
+
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+def rss_mb() -> float:
+    '''現在のプロセスの RSS (MB) を /proc から取得'''
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def seed(engine, rows: int, batch_size: int = 50000):
+    from sqlalchemy import insert
+
+    from orders.repository.models import OrderItemModel, OrderModel
+
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        for offset in range(0, rows, batch_size):
+            size = min(batch_size, rows - offset)
+            ids = [str(uuid.uuid4()) for _ in range(size)]
+            connection.execute(
+                insert(OrderModel),
+                [
+                    {
+                        'id': id_,
+                        'status': 'created',
+                        'created': start + timedelta(seconds=offset + index),
+                    }
+                    for index, id_ in enumerate(ids)
+                ]
+            )
+            connection.execute(
+                insert(OrderItemModel),
+                [
+                    {
+                        'id': str(uuid.uuid4()),
+                        'order_id': id_,
+                        'product': 'cappuccino',
+                        'size': 'small',
+                        'quantity': 1,
+                    }
+                    for id_ in ids
+                ]
+            )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--report-every', type=int, default=100000)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    import requests
+    import uvicorn
+
+    from orders.repository.engine import get_engine
+    from orders.repository.models import Base
+    from orders.web.app import app
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    seed(engine, args.rows)
+
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, port=port, log_level='warning')
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f'rows={0:>8}: rss {rss_mb():8.1f} MB')
+    start = time.perf_counter()
+    exported = 0
+    with requests.get(
+        f'http://127.0.0.1:{port}/orders/export', stream=True
+    ) as response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            exported += 1
+            if exported % args.report_every == 0:
+                print(f'rows={exported:>8}: rss {rss_mb():8.1f} MB')
+    elapsed = time.perf_counter() - start
+    print(f'exported {exported} orders in {elapsed:.1f} s')
+    server.should_exit = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''OrdersRepository.list のアイテム読み込み方法ごとの SQL 発行回数と処理時間を計測
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_orders_list --orders 10 100 1000
+
+lazy では注文の数に比例して SQL が増える (N+1) のに対し、
+selectin と joined ではほぼ一定になることを確認できる。
+(selectin は IN 句に含める ID を 500 件ずつに分けるため、500 件ごとに 1 回増える)
+'''
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from orders.repository.instrumentation import count_queries
+from orders.repository.models import Base, OrderItemModel, OrderModel
+from orders.repository.orders_repository import OrdersRepository
+
+
+def seed(session_maker, orders: int, items_per_order: int = 3):
+    with session_maker() as session:
+        session.add_all(
+            OrderModel(
+                items=[
+                    OrderItemModel(product='cappuccino', size='small', quantity=1)
+                    for _ in range(items_per_order)
+                ]
+            )
+            for _ in range(orders)
+        )
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    for orders in args.orders:
+        db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+        engine = create_engine(f'sqlite:///{db_path}')
+        Base.metadata.create_all(engine)
+        session_maker = sessionmaker(bind=engine)
+        seed(session_maker, orders)
+        for load_items in ('lazy', 'selectin', 'joined'):
+            with session_maker() as session:
+                repo = OrdersRepository(session)
+                with count_queries(engine) as counter:
+                    start = time.perf_counter()
+                    repo.list(limit=None, load_items=load_items)
+                    elapsed = time.perf_counter() - start
+            print(
+                f'orders={orders:>6} load_items={load_items:>8}: '
+                f'{counter.count:>6} statements, {elapsed * 1000:8.1f} ms'
+            )
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
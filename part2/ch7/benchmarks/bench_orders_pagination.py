@@ -0,0 +1,91 @@
+'''注文一覧のページングにかかる時間を、ページの深さごとに計測
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_orders_pagination --rows 1000000
+
+指定した件数の注文を一時ファイルの sqlite に投入した上で、
+- offset: OFFSET で読み飛ばす方法
+- keyset: 直前のページの (created, id) を起点に ix_order_created_id で絞り込む方法 (GET /orders の方式)
+の2通りで、先頭から深い位置までの各ページの取得時間を比較する。
+keyset では何ページ目であってもほぼ一定の時間で取得できる。
+'''
+
+import argparse
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from orders.repository.models import Base, OrderModel
+from orders.repository.orders_repository import OrdersRepository
+
+
+def seed(engine, rows: int, batch_size: int = 50000):
+    '''アイテムを持たない注文を rows 件まとめて投入'''
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        for offset in range(0, rows, batch_size):
+            connection.execute(
+                insert(OrderModel),
+                [
+                    {
+                        'id': str(uuid.uuid4()),
+                        'status': 'created',
+                        'created': start + timedelta(seconds=index),
+                    }
+                    for index in range(offset, min(offset + batch_size, rows))
+                ]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    seed(engine, args.rows)
+    session_maker = sessionmaker(bind=engine)
+
+    depths = [
+        depth for depth in (0, 1000, 10000, 100000, 500000, args.rows - args.page_size)
+        if 0 <= depth < args.rows
+    ]
+    with session_maker() as session:
+        repo = OrdersRepository(session)
+        query = session.query(OrderModel).order_by(OrderModel.created, OrderModel.id)
+        for depth in depths:
+            # keyset の起点として、depth 件目の直前の注文の (created, id) を求めておく
+            after = None
+            if depth > 0:
+                previous = query.offset(depth - 1).first()
+                after = (previous.created, previous.id)
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                query.offset(depth).limit(args.page_size).all()
+            offset_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                repo.list(limit=args.page_size, after=after)
+            keyset_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            print(
+                f'depth={depth:>8}: offset {offset_ms:8.2f} ms/page, '
+                f'keyset {keyset_ms:8.2f} ms/page'
+            )
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+'''注文のレスポンスの JSON 変換を計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_orders_serialization --orders 10000 --repeat 5
+
+--orders 件の注文を投入し、以下の 2 つを ORDERS_FAST_JSON の無効・有効で比較する。
+
+- encode: GET /orders のハンドラが返す辞書を JSON のバイト列にするまでの時間。
+  無効な場合は FastAPI と同様に response_model で検証し、jsonable_encoder と json.dumps で変換する
+- request: 全件を返す GET /orders 1 回あたりの時間 (データベースからの読み込みを含む)
+
+両者のレスポンスを JSON として読み込んだ結果が一致することも確認する。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.suite import in_process_target, seed
+
+
+def timeit(func, repeat: int) -> float:
+    '''1 回あたりのミリ秒'''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def set_fast_json(enabled: bool):
+    from orders.web.api.fast_json import fast_json_enabled
+
+    os.environ['ORDERS_FAST_JSON'] = 'true' if enabled else 'false'
+    fast_json_enabled.cache_clear()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OUTBOX_DISPATCHER', 'off')
+    with in_process_target(0.0) as client:
+        seed(client, args.orders)
+
+        from fastapi.encoders import jsonable_encoder
+
+        from orders.web.api.fast_json import dumps, orjson
+        from orders.web.api.schemas import GetOrdersSchema
+
+        set_fast_json(False)
+        content = client.get('/orders').json()
+        assert len(content['orders']) == args.orders
+
+        def validated():
+            model = GetOrdersSchema.model_validate(content)
+            return json.dumps(jsonable_encoder(model), separators=(',', ':')).encode()
+
+        encoder = 'orjson' if orjson is not None else 'json'
+        print(f'orders: {args.orders}, encoder: {encoder}')
+        for name, func in {'validated': validated, 'fast': lambda: dumps(content)}.items():
+            print(f'encode  {name:>9}: {timeit(func, args.repeat):8.2f} ms')
+
+        bodies = {}
+        for name, enabled in {'validated': False, 'fast': True}.items():
+            set_fast_json(enabled)
+            bodies[name] = client.get('/orders').json()
+            elapsed = timeit(lambda: client.get('/orders'), args.repeat)
+            print(f'request {name:>9}: {elapsed:8.2f} ms')
+        assert bodies['validated'] == bodies['fast']
+
+
+if __name__ == '__main__':
+    main()
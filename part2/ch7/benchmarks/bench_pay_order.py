@@ -0,0 +1,102 @@
+'''POST /orders/{order_id}/pay のレイテンシを計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_pay_order --orders 50 --delay 0.05
+
+支払いサービス・厨房サービスの代わりに、delay 秒待ってから応答するスタブサーバーを起動し、
+- inline: リクエストの中で支払いとスケジューリングを行う (変更前の挙動)
+- outbox: アウトボックスに登録して 202 を返す
+の2通りで、支払いリクエストのレイテンシの中央値と最大値を比較する。
+outbox では、最後に OutboxDispatcher で全件を処理し終えるまでの時間も表示する。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stub_server import StubBehavior, start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    # アプリケーションを import する前に接続先を切り替える
+    port = start_stub_server(StubBehavior(args.delay)).server_address[1]
+    os.environ['KITCHEN_BASE_URL'] = f'http://127.0.0.1:{port}/kitchen'
+    os.environ['PAYMENTS_BASE_URL'] = f'http://127.0.0.1:{port}/payments'
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from fastapi.testclient import TestClient
+
+    from orders.outbox.dispatcher import get_outbox_dispatcher
+    from orders.repository.engine import get_engine
+    from orders.repository.models import Base
+    from orders.repository.orders_repository import OrdersRepository
+    from orders.repository.unit_of_work import UnitOfWork
+    from orders.types import OrderId
+    from orders.web.app import app
+
+    @app.post('/legacy/orders/{order_id}/pay')
+    def legacy_pay_order(order_id: OrderId):
+        '''変更前と同じく、セッションを開いたまま支払いとスケジューリングを行う'''
+        with UnitOfWork() as unit_of_work:
+            repo = OrdersRepository(unit_of_work.session)
+            order = repo.get(order_id)
+            order.pay()
+            schedule_id = order.schedule()
+            order = repo.update(order_id, status='progress', schedule_id=schedule_id)
+            unit_of_work.commit()
+        return order.dict()
+
+    Base.metadata.create_all(get_engine())
+    client = TestClient(app)
+
+    def create_orders():
+        return [
+            client.post(
+                '/orders',
+                json={'items': [{'product': 'cappuccino', 'size': 'small'}]}
+            ).json()['id']
+            for _ in range(args.orders)
+        ]
+
+    for name, path in {
+        'inline': '/legacy/orders/{}/pay',
+        'outbox': '/orders/{}/pay',
+    }.items():
+        latencies = []
+        for order_id in create_orders():
+            start = time.perf_counter()
+            response = client.post(path.format(order_id))
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code in (200, 202)
+        print(
+            f'{name:>7}: median {statistics.median(latencies):7.2f} ms, '
+            f'max {max(latencies):7.2f} ms'
+        )
+
+    start = time.perf_counter()
+    dispatched = 0
+    dispatcher = get_outbox_dispatcher()
+    while True:
+        processed = dispatcher.dispatch_pending()
+        if not processed:
+            break
+        dispatched += processed
+    print(
+        f'dispatcher: {dispatched} messages in '
+        f'{time.perf_counter() - start:.2f} s'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+'''注文の取得・一覧の SQL の実行計画と処理時間を、インデックスの有無で比較する
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_query_plans --orders 20000
+
+一時ファイルのデータベースを Alembic で head まで作成し、--orders 件の注文 (1 割をキャンセル済み) を投入する。
+マイグレーション c4a7d2e9f1b3 で追加したインデックスを削除した状態と、作り直した状態で、
+以下の処理について発行された SQL を EXPLAIN QUERY PLAN で表示し、処理時間を計測する。
+
+- get: OrdersRepository.get (注文とアイテムの取得)
+- list: OrdersRepository.list(limit=50)
+- list_cancelled: OrdersRepository.list(limit=50, cancelled=True)
+
+インデックスがある状態では、アイテムの読み込みが ix_order_item_order_id を、
+キャンセル済みの一覧が ix_order_status_created_id を使う。
+(list の SCAN order USING INDEX ix_order_created_id は、インデックスの順に読んで
+LIMIT の件数で止まるため問題ない)
+想定したインデックスが使われていることの確認は tests/test_query_plans.py で行う。
+'''
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+
+from orders.repository.models import Base, OrderModel
+from orders.repository.orders_repository import OrdersRepository
+
+ALEMBIC_INI = Path(__file__).parent.parent / 'alembic.ini'
+# マイグレーション c4a7d2e9f1b3 で追加したインデックス
+INDEXES = ('ix_order_item_order_id', 'ix_order_status_created_id')
+ITEMS = [
+    {'product': 'cappuccino', 'size': 'small', 'quantity': 1},
+    {'product': 'latte', 'size': 'medium', 'quantity': 2},
+]
+# インデックスがある状態で、処理ごとに使われているべきインデックス
+EXPECTED_INDEXES = {
+    'get': {'ix_order_item_order_id'},
+    'list': {'ix_order_created_id', 'ix_order_item_order_id'},
+    'list_cancelled': {'ix_order_status_created_id', 'ix_order_item_order_id'},
+}
+
+
+def paths(order_ids):
+    rng = random.Random(0)
+    return {
+        'get': lambda repo: repo.get(rng.choice(order_ids)),
+        'list': lambda repo: repo.list(limit=50),
+        'list_cancelled': lambda repo: repo.list(limit=50, cancelled=True),
+    }
+
+
+def capture(engine, session_maker, func):
+    '''func の中で発行された SELECT 文とパラメータを返す'''
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        with session_maker() as session:
+            func(OrdersRepository(session))
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return statements
+
+
+def explain(engine, statements):
+    '''各 SQL 文の実行計画の行 (detail) をまとめて返す'''
+    details = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            details.extend(row[3] for row in rows)
+    return details
+
+
+def timeit(session_maker, func, repeat: int) -> float:
+    '''1 回あたりのミリ秒'''
+    with session_maker() as session:
+        repo = OrdersRepository(session)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(repo)
+            session.expunge_all()
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+def report(label, engine, session_maker, order_ids, repeat):
+    print(f'== {label}')
+    for name, func in paths(order_ids).items():
+        details = explain(engine, capture(engine, session_maker, func))
+        elapsed = timeit(session_maker, func, repeat)
+        print(f'{name:>15}: {elapsed:8.2f} ms')
+        for detail in details:
+            print(f'{"":>17}{detail}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    url = f'sqlite:///{Path(tempfile.mkdtemp()) / "orders.db"}'
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option('script_location', str(ALEMBIC_INI.parent / 'migrations'))
+    config.set_main_option('sqlalchemy.url', url)
+    command.upgrade(config, 'head')
+
+    engine = create_engine(url)
+    session_maker = sessionmaker(bind=engine)
+    with session_maker() as session:
+        order_ids = [
+            order.id
+            for order in OrdersRepository(session).add_many([ITEMS] * args.orders)
+        ]
+        cancelled = order_ids[::10]
+        session.execute(
+            update(OrderModel)
+                .where(OrderModel.id.in_(cancelled))
+                .values(status='cancelled')
+        )
+        session.commit()
+
+    indexes = [
+        index
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if index.name in INDEXES
+    ]
+    for index in indexes:
+        index.drop(engine)
+    report('without indexes', engine, session_maker, order_ids, args.repeat)
+    for index in indexes:
+        index.create(engine)
+    report('with indexes', engine, session_maker, order_ids, args.repeat)
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
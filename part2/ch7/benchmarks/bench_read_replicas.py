@@ -0,0 +1,141 @@
+'''読み込みをレプリカに振り分けた場合と、全てプライマリで処理した場合の比較
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_read_replicas --duration 10 --readers 8 --writers 4 --replicas 2 --lag 0.5
+
+ローカルで試せるよう、SQLite のファイルをプライマリとレプリカとして使う。
+レプリケーションの代わりに、--lag 秒ごとに sqlite3 のバックアップ API でプライマリの内容を
+各レプリカのファイルに書き写すスレッドを動かす。
+
+- primary: DATABASE_REPLICA_URLS を指定せず、全てプライマリで処理する
+- replicas: --replicas 個のレプリカを指定し、読み込みをラウンドロビンで振り分ける
+
+いずれも bench_sqlite_profile と同様に、reader と writer のスレッドから --duration 秒間リクエストを送る。
+read-your-writes や振り分けの動作の確認は tests/test_read_replicas.py で行う。
+'''
+
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from sqlalchemy import create_engine
+
+from benchmarks.bench_sqlite_profile import ORDER, free_port, load, seed
+from benchmarks.results import print_table
+from orders.repository.models import Base
+
+
+class Replicator:
+    '''interval 秒ごとにプライマリの内容をレプリカのファイルに書き写すスレッド'''
+
+    def __init__(self, primary: Path, replicas, interval: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def copy(self):
+        source = sqlite3.connect(self.primary)
+        try:
+            for replica in self.replicas:
+                target = sqlite3.connect(replica, timeout=5)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.copy()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+def start_server(primary: Path, replicas, workers: int):
+    env = {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{primary}',
+        'ORDERS_CACHE': 'none',
+        'OUTBOX_DISPATCHER': 'off',
+    }
+    env.pop('DATABASE_REPLICA_URLS', None)
+    if replicas:
+        env['DATABASE_REPLICA_URLS'] = ','.join(f'sqlite:///{path}' for path in replicas)
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'orders.web.app:app',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        env=env,
+        cwd=Path(__file__).parent.parent,
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{url}/openapi/orders.json', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Orders API did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--lag', type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = {}
+    for scenario, count in (('primary', 0), ('replicas', args.replicas)):
+        directory = Path(tempfile.mkdtemp())
+        primary = directory / 'primary.db'
+        engine = create_engine(f'sqlite:///{primary}')
+        Base.metadata.create_all(engine)
+        engine.dispose()
+        replicas = [directory / f'replica{index}.db' for index in range(count)]
+        for replica in replicas:
+            shutil.copy(primary, replica)
+        replicator = Replicator(primary, replicas, args.lag)
+        process, url = start_server(primary, replicas, args.workers)
+        try:
+            order_ids = seed(url, args.orders)
+            replicator.copy()
+            replicator.start()
+            for kind, result in load(
+                url, order_ids, args.readers, args.writers, args.duration
+            ).items():
+                results[f'{scenario}:{kind}'] = result
+        finally:
+            replicator.stop()
+            process.terminate()
+            process.wait()
+            shutil.rmtree(directory)
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
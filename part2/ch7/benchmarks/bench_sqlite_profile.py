@@ -0,0 +1,160 @@
+'''SQLite の PRAGMA のプロファイルごとに、読み込みと書き込みを同時に行った場合のスループットを比較
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_sqlite_profile --duration 10 --readers 8 --writers 4 --workers 2
+
+SQLITE_PROFILE (default, performance) ごとに、一時ファイルのデータベースを作成して
+注文 API を uvicorn で --workers 個のプロセスとして起動する。
+--orders 件の注文を投入した後、以下のスレッドから --duration 秒間リクエストを送り続ける。
+
+- reader: GET /orders/{order_id} と GET /orders?limit=50 を交互に送る
+- writer: POST /orders を送る
+
+読み込みと書き込みそれぞれについて、1 秒あたりのリクエスト数、レイテンシ、エラー数を表示する。
+キャッシュを使うと SQL が発行されないため、キャッシュは無効にする。
+fsync のコストはストレージによって大きく異なるため、--db-dir で本番と同じ種類のディスクを指定するとよい。
+API のプロセスとクライアントが CPU を使い切る環境では、データベース以外がボトルネックになり差が出にくい。
+'''
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from sqlalchemy import create_engine
+
+from benchmarks.results import print_table, summarize
+from orders.repository.models import Base
+
+ORDER = {'items': [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}]}
+PROFILES = ('default', 'performance')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(profile: str, workers: int, db_dir=None):
+    '''一時ファイルのデータベースで注文 API を起動し、(プロセス, URL) を返す'''
+    db_path = Path(tempfile.mkdtemp(dir=db_dir)) / 'orders.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'orders.web.app:app',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        env={
+            **os.environ,
+            'DATABASE_URL': f'sqlite:///{db_path}',
+            'SQLITE_PROFILE': profile,
+            'ORDERS_CACHE': 'none',
+            'OUTBOX_DISPATCHER': 'off',
+        },
+        cwd=Path(__file__).parent.parent,
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{url}/openapi/orders.json', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Orders API did not start')
+
+
+def seed(url: str, count: int):
+    response = requests.post(f'{url}/orders/batch', json={'orders': [ORDER] * count})
+    response.raise_for_status()
+    return [created['order']['id'] for created in response.json()['orders']]
+
+
+def load(url: str, order_ids, readers: int, writers: int, duration: float):
+    '''reader, writer のスレッドから duration 秒間リクエストを送り、種類ごとの結果を返す'''
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(kind: str, seed_: int):
+        rng = random.Random(seed_)
+        session = requests.Session()
+        local, failed = [], 0
+        index = 0
+        while time.perf_counter() < deadline:
+            if kind == 'write':
+                method, path, payload, expected = 'POST', '/orders', ORDER, 201
+            elif index % 2 == 0:
+                method, path, payload, expected = (
+                    'GET', f'/orders/{rng.choice(order_ids)}', None, 200
+                )
+            else:
+                method, path, payload, expected = 'GET', '/orders?limit=50', None, 200
+            index += 1
+            start = time.perf_counter()
+            try:
+                ok = session.request(method, url + path, json=payload).status_code == expected
+            except requests.RequestException:
+                ok = False
+            local.append((time.perf_counter() - start) * 1000)
+            failed += not ok
+        with lock:
+            latencies[kind].extend(local)
+            errors[kind] += failed
+
+    threads = [
+        threading.Thread(target=worker, args=('read', index)) for index in range(readers)
+    ] + [
+        threading.Thread(target=worker, args=('write', index)) for index in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        kind: summarize(latencies[kind], elapsed, errors=errors[kind])
+        for kind in latencies
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--db-dir', default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for profile in PROFILES:
+        process, url = start_server(profile, args.workers, args.db_dir)
+        try:
+            order_ids = seed(url, args.orders)
+            for kind, result in load(
+                url, order_ids, args.readers, args.writers, args.duration
+            ).items():
+                results[f'{profile}:{kind}'] = result
+        finally:
+            process.terminate()
+            process.wait()
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
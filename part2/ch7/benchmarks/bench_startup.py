@@ -0,0 +1,98 @@
+'''注文 API の起動時間と、API 仕様書の読み込み・配信の時間を計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_startup --repeat 5
+
+- load: 仕様書の読み込み 1 回あたりの時間を、yaml.safe_load (変更前の方法)、
+  C 実装のローダー、キャッシュからの読み込みで比較する
+- import: 別プロセスで orders.web.app を import するまでの時間の中央値を、
+  キャッシュがない場合 (cold) とある場合 (warm) で比較する
+- serve: GET /openapi/orders.json 1 回あたりの時間を、リクエストのたびに辞書を JSON に
+  変換する場合 (変更前の方法) とエンコード済みのバイト列を返す場合で比較する
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+from orders.web.openapi import SafeLoader, _cache_path, load_spec
+
+SPEC_PATH = Path(__file__).parent / '../api_docs/orders.yaml'
+IMPORT_SNIPPET = (
+    'import time; start = time.perf_counter(); import orders.web.app; '
+    'print(time.perf_counter() - start)'
+)
+
+
+def timeit(func, repeat: int) -> float:
+    '''1 回あたりのミリ秒'''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def clear_cache():
+    _cache_path(SPEC_PATH).unlink(missing_ok=True)
+
+
+def import_time(cold: bool) -> float:
+    if cold:
+        clear_cache()
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        env={**os.environ, 'OUTBOX_DISPATCHER': 'off'},
+        cwd=Path(__file__).parent.parent,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return float(output) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    text = SPEC_PATH.read_text()
+    load_spec(SPEC_PATH)
+    for name, func in {
+        'safe_load': lambda: yaml.safe_load(text),
+        'c_loader': lambda: yaml.load(text, Loader=SafeLoader),
+        'cached': lambda: load_spec(SPEC_PATH),
+    }.items():
+        print(f'load   {name:>10}: {timeit(func, args.repeat * 4):8.2f} ms')
+
+    for name, cold in {'cold': True, 'warm': False}.items():
+        times = [import_time(cold) for _ in range(args.repeat)]
+        print(f'import {name:>10}: {statistics.median(times):8.2f} ms')
+
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+
+    from orders.web.app import app
+
+    @app.get('/legacy/openapi.json', include_in_schema=False)
+    def legacy_openapi():
+        return JSONResponse(app.openapi())
+
+    client = TestClient(app)
+    for name, path in {
+        'legacy': '/legacy/openapi.json',
+        'bytes': '/openapi/orders.json',
+    }.items():
+        elapsed = timeit(lambda: client.get(path), args.repeat * 100)
+        print(f'serve  {name:>10}: {elapsed:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''UnitOfWork のエンジン共有による効果を計測するマイクロベンチマーク
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_unit_of_work --requests 2000
+
+GET /orders/{order_id} を FastAPI の TestClient から繰り返し呼び出し、
+- per_request: リクエストごとに create_engine を呼ぶ (変更前の挙動)
+- pooled: プロセス内で共有されるエンジンを使う (変更後の挙動)
+の2通りで 1 秒あたりのリクエスト数を比較する。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    # アプリケーションを import する前に接続先を一時ファイルへ切り替える
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    database_url = f'sqlite:///{db_path}'
+    os.environ['DATABASE_URL'] = database_url
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from orders.repository.engine import get_engine
+    from orders.repository.models import Base
+    from orders.repository.unit_of_work import UnitOfWork
+    from orders.web.api import api
+    from orders.web.app import app
+
+    Base.metadata.create_all(get_engine())
+    client = TestClient(app)
+    order_id = client.post(
+        '/orders',
+        json={'items': [{'product': 'cappuccino', 'size': 'small'}]}
+    ).json()['id']
+
+    def per_request_unit_of_work():
+        return UnitOfWork(sessionmaker(bind=create_engine(database_url)))
+
+    variants = {
+        'per_request': per_request_unit_of_work,
+        'pooled': UnitOfWork,
+    }
+    for name, unit_of_work_class in variants.items():
+        api.UnitOfWork = unit_of_work_class
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            response = client.get(f'/orders/{order_id}')
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - start
+        print(f'{name:>12}: {args.requests / elapsed:8.1f} req/s')
+    api.UnitOfWork = UnitOfWork
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+'''ID を文字列で保存する場合と 16 バイトのバイナリ (BinaryUUID) で保存する場合の比較
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.bench_uuid_storage --orders 1000000 --lookups 20000
+
+order と order_item (1 注文あたり 1 件) を同じ構成・同じインデックスで 2 通りの型で作成し、
+--orders 件ずつ投入して以下を比較する。
+
+- insert: 投入にかかった時間
+- size: テーブル・インデックスごとのサイズ (SQLite の dbstat 仮想テーブルを利用) とファイルサイズ
+- lookup: ランダムに選んだ注文を ID で取得し、そのアイテムを order_id で取得する 1 回あたりの時間
+
+両者で取得した内容が一致することも確認する。
+'''
+
+import argparse
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    insert,
+    select,
+    text,
+)
+
+from orders.repository.column_types import BinaryUUID
+
+BATCH_SIZE = 10000
+
+
+def build_tables(id_type):
+    '''orders.repository.models と同じ構成のテーブルを、ID の型だけ変えて定義する'''
+    metadata = MetaData()
+    order = Table(
+        'order', metadata,
+        Column('id', id_type, primary_key=True),
+        Column('status', String, nullable=False),
+        Column('created', DateTime),
+        Column('schedule_id', String),
+        Column('delivery_id', String),
+        Index('ix_order_created_id', 'created', 'id'),
+        Index('ix_order_status_created_id', 'status', 'created', 'id'),
+    )
+    order_item = Table(
+        'order_item', metadata,
+        Column('id', id_type, primary_key=True),
+        Column('order_id', id_type, ForeignKey('order.id'), index=True),
+        Column('product', String, nullable=False),
+        Column('size', String, nullable=False),
+        Column('quantity', Integer, nullable=False),
+    )
+    return metadata, order, order_item
+
+
+def populate(engine, order, order_item, order_ids):
+    created = datetime.utcnow()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, len(order_ids), BATCH_SIZE):
+            batch = order_ids[offset:offset + BATCH_SIZE]
+            conn.execute(insert(order), [
+                {'id': id_, 'status': 'created', 'created': created} for id_ in batch
+            ])
+            conn.execute(insert(order_item), [
+                {
+                    'id': str(uuid.uuid4()),
+                    'order_id': id_,
+                    'product': 'cappuccino',
+                    'size': 'small',
+                    'quantity': 1,
+                }
+                for id_ in batch
+            ])
+    return time.perf_counter() - start
+
+
+def sizes(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            'SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY name'
+        ))
+        return {name: size for name, size in rows if not name.startswith('sqlite_schema')}
+
+
+def lookup(engine, order, order_item, ids):
+    results = []
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        for id_ in ids:
+            row = conn.execute(select(order).where(order.c.id == id_)).one()
+            items = conn.execute(
+                select(order_item.c.product, order_item.c.quantity)
+                    .where(order_item.c.order_id == id_)
+            ).all()
+            results.append((row.id, row.status, tuple(items)))
+    return (time.perf_counter() - start) / len(ids) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    order_ids = [str(uuid.uuid4()) for _ in range(args.orders)]
+    ids = random.Random(0).sample(order_ids, min(args.lookups, args.orders))
+    directory = Path(tempfile.mkdtemp())
+    print(f'orders: {args.orders} (order_item: {args.orders}), lookups: {len(ids)}')
+
+    summary = {}
+    for name, id_type in {'string': String, 'binary': BinaryUUID}.items():
+        db_path = directory / f'{name}.db'
+        engine = create_engine(f'sqlite:///{db_path}')
+        metadata, order, order_item = build_tables(id_type)
+        metadata.create_all(engine)
+        elapsed = populate(engine, order, order_item, order_ids)
+        with engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+        per_lookup, results = lookup(engine, order, order_item, ids)
+        summary[name] = results
+        print(f'== {name}')
+        print(f'  insert: {elapsed:8.1f} s')
+        print(f'  lookup: {per_lookup:8.3f} ms')
+        print(f'  file:   {db_path.stat().st_size / 2 ** 20:8.1f} MiB')
+        for table, size in sizes(engine).items():
+            print(f'  {table:>32}: {size / 2 ** 20:8.1f} MiB')
+        engine.dispose()
+    assert summary['string'] == summary['binary']
+
+
+if __name__ == '__main__':
+    main()
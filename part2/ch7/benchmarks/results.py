@@ -0,0 +1,86 @@
+'''ベンチマークの結果の集計と JSON への書き出し
+
+コミット間で結果を比較できるよう、計測値に加えて実行時のコミットや Python のバージョン、
+パラメーターを同じ JSON に記録する。
+'''
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], ratio: float) -> float:
+    '''昇順に並んだ値の ratio (0 - 1) の位置の値 (最近傍法)'''
+    index = min(len(sorted_values) - 1, max(0, round(ratio * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    '''1つのシナリオの計測結果をまとめる
+
+    latencies_ms は各リクエストのレイテンシ (ミリ秒)、elapsed はシナリオ全体の秒数
+    '''
+    values = sorted(latencies_ms)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(values), 3),
+        'p50_ms': round(percentile(values, 0.50), 3),
+        'p90_ms': round(percentile(values, 0.90), 3),
+        'p99_ms': round(percentile(values, 0.99), 3),
+        'max_ms': round(values[-1], 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+    }
+
+
+def print_table(results: Dict[str, dict]):
+    print(
+        f'{"scenario":>16} {"requests":>8} {"errors":>6} {"rps":>9} '
+        f'{"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8}'
+    )
+    for name, result in results.items():
+        print(
+            f'{name:>16} {result["requests"]:>8} {result["errors"]:>6} '
+            f'{result["throughput_rps"]:>9.1f} {result["p50_ms"]:>8.2f} '
+            f'{result["p90_ms"]:>8.2f} {result["p99_ms"]:>8.2f}'
+        )
+
+
+def write_results(path: Optional[str], suite: str, parameters: dict, results: Dict[str, dict]):
+    '''結果を表示し、path が指定されていれば JSON として書き出す'''
+    print_table(results)
+    if path is None:
+        return
+    document = {
+        'suite': suite,
+        'environment': environment(),
+        'parameters': parameters,
+        'results': results,
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(document, indent=2) + '\n')
+    print(f'Results written to {path}')
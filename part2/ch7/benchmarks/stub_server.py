@@ -0,0 +1,92 @@
+'''厨房サービス・支払いサービスの代わりに応答するスタブサーバー
+
+ベンチマークの中から start_stub_server で起動するほか、
+HTTP 経由で負荷をかける際に、注文 API の接続先として単独でも起動できる。
+
+    python -m benchmarks.stub_server --port 3001 --delay 0.05
+
+この場合、注文 API は以下の設定で起動する。
+
+    KITCHEN_BASE_URL=http://localhost:3001/kitchen
+    PAYMENTS_BASE_URL=http://localhost:3001/payments
+
+パスの先頭 (kitchen, payments) ごとに、応答までの遅延とステータスコードを切り替えられる。
+'''
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+SERVICES = ('kitchen', 'payments')
+
+
+class StubBehavior:
+    '''スタブサーバーの応答の内容
+
+    status が None の場合は、キャンセルには 200、それ以外には 201 を返す
+    '''
+
+    def __init__(self, delay: float = 0.0):
+        self.delay: Dict[str, float] = {service: delay for service in SERVICES}
+        self.status: Dict[str, Optional[int]] = {service: None for service in SERVICES}
+
+
+def _handler(behavior: StubBehavior):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            service = self.path.strip('/').split('/')[0]
+            time.sleep(behavior.delay.get(service, 0.0))
+            status = behavior.status.get(service)
+            if status is None:
+                status = 200 if self.path.endswith('/cancel') else 201
+            body = json.dumps({'id': '11111111-1111-1111-1111-111111111111'}).encode()
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # クライアントがタイムアウトして切断した場合
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(
+    behavior: Optional[StubBehavior] = None,
+    port: int = 0
+) -> ThreadingHTTPServer:
+    '''スタブサーバーをバックグラウンドのスレッドで起動する
+
+    port に 0 を指定した場合は空いているポートが使われる。server.server_address[1] で確認できる
+    '''
+    server = ThreadingHTTPServer(('127.0.0.1', port), _handler(behavior or StubBehavior()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=3001)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', args.port), _handler(StubBehavior(args.delay))
+    )
+    server.daemon_threads = True
+    print(f'Stub server listening on http://127.0.0.1:{args.port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
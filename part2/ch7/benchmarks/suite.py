@@ -0,0 +1,204 @@
+'''注文 API の主要なエンドポイントを計測するベンチマークスイート
+
+ch7 のディレクトリで以下のように実行する。
+
+    python -m benchmarks.suite --orders 10000 --requests 500 --output results/orders.json
+
+既定では、一時ファイルのデータベースとスタブの厨房・支払いサービスを用意し、
+アプリケーションを TestClient から ASGI で直接呼び出す (ネットワークを介さない)。
+--url を指定した場合は、起動済みの注文 API に requests で HTTP のリクエストを送り、
+--concurrency の数のスレッドから同時に負荷をかける。この場合、注文 API の接続先には
+python -m benchmarks.stub_server で起動したスタブを指定しておく。
+
+計測するシナリオは以下の通り。
+
+- create_order: POST /orders
+- get_order: GET /orders/{order_id} (投入済みの注文からランダムに選ぶ)
+- list_orders: GET /orders?limit=50
+- pay_order: POST /orders/{order_id}/pay
+- cancel_order: POST /orders/{order_id} (注文のキャンセル)
+
+計測の前に、--orders 件の注文を POST /orders/batch で投入する。
+pay_order と cancel_order は、シナリオごとに新しく作成した注文に対して実行する。
+結果は表として表示し、--output を指定した場合はコミットなどの情報と合わせて JSON で書き出す。
+TestClient を利用するため、別途 httpx をインストールしておく必要がある。
+'''
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from benchmarks.results import summarize, write_results
+
+ORDER = {
+    'items': [
+        {'product': 'cappuccino', 'size': 'small', 'quantity': 1},
+        {'product': 'latte', 'size': 'medium', 'quantity': 2},
+    ]
+}
+# POST /orders/batch で一度に送る注文数の上限 (schemas.MAX_BATCH_SIZE)
+SEED_BATCH_SIZE = 1000
+SCENARIOS = ('create_order', 'get_order', 'list_orders', 'pay_order', 'cancel_order')
+
+# (メソッド, パス, ペイロード, 期待するステータスコード)
+Request = Tuple[str, str, Optional[dict], int]
+
+
+class HTTPTarget:
+    '''起動済みの注文 API に HTTP でリクエストを送るクライアント
+
+    requests.Session はスレッドセーフではないため、スレッドごとに作成する
+    '''
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, json: Optional[dict] = None):
+        import requests
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session.request(method, self.base_url + path, json=json)
+
+
+@contextmanager
+def in_process_target(stub_delay: float) -> Iterator[object]:
+    '''一時ファイルのデータベースとスタブサーバーを用意し、TestClient を返す
+
+    アプリケーションは import 時に設定を読み込むため、環境変数はその前に設定する
+    '''
+    from benchmarks.stub_server import StubBehavior, start_stub_server
+
+    server = start_stub_server(StubBehavior(stub_delay))
+    port = server.server_address[1]
+    os.environ['KITCHEN_BASE_URL'] = f'http://127.0.0.1:{port}/kitchen'
+    os.environ['PAYMENTS_BASE_URL'] = f'http://127.0.0.1:{port}/payments'
+    db_path = Path(tempfile.mkdtemp()) / 'orders.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from fastapi.testclient import TestClient
+
+    from orders.repository.engine import get_engine
+    from orders.repository.models import Base
+    from orders.web.app import app
+
+    Base.metadata.create_all(get_engine())
+    # with ブロックの中では lifespan が実行され、アウトボックスのディスパッチャーも動く
+    with TestClient(app) as client:
+        yield client
+    server.shutdown()
+
+
+def seed(client, count: int) -> List[str]:
+    '''count 件の注文を作成し、その ID を返す'''
+    ids = []
+    for start in range(0, count, SEED_BATCH_SIZE):
+        size = min(SEED_BATCH_SIZE, count - start)
+        response = client.request('POST', '/orders/batch', json={'orders': [ORDER] * size})
+        assert response.status_code == 201, response.text
+        ids.extend(created['order']['id'] for created in response.json()['orders'])
+    return ids
+
+
+def build_requests(
+    scenario: str,
+    client,
+    seeded: List[str],
+    count: int,
+    rng: random.Random
+) -> List[Request]:
+    if scenario == 'create_order':
+        return [('POST', '/orders', ORDER, 201)] * count
+    if scenario == 'get_order':
+        return [('GET', f'/orders/{rng.choice(seeded)}', None, 200) for _ in range(count)]
+    if scenario == 'list_orders':
+        return [('GET', '/orders?limit=50', None, 200)] * count
+    if scenario == 'pay_order':
+        return [('POST', f'/orders/{id_}/pay', None, 202) for id_ in seed(client, count)]
+    if scenario == 'cancel_order':
+        return [('POST', f'/orders/{id_}', None, 200) for id_ in seed(client, count)]
+    raise ValueError(f'Unknown scenario: {scenario}')
+
+
+def run_scenario(client, requests: List[Request], concurrency: int) -> dict:
+    '''requests を concurrency 並列で送信し、レイテンシを集計する'''
+
+    def send(request: Request) -> Tuple[float, bool]:
+        method, path, payload, expected = request
+        start = time.perf_counter()
+        response = client.request(method, path, json=payload)
+        return (time.perf_counter() - start) * 1000, response.status_code == expected
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        outcomes = [send(request) for request in requests]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, requests))
+    elapsed = time.perf_counter() - start
+    return summarize(
+        [latency for latency, _ in outcomes],
+        elapsed,
+        errors=sum(not ok for _, ok in outcomes)
+    )
+
+
+def run(client, args) -> dict:
+    rng = random.Random(args.seed)
+    seeded = seed(client, args.orders)
+    results = {}
+    for scenario in args.scenarios:
+        requests = build_requests(scenario, client, seeded, args.requests, rng)
+        # 接続の確立やキャッシュの初期化などの影響を除くため、一部を先に送っておく
+        run_scenario(client, requests[:args.warmup], 1)
+        results[scenario] = run_scenario(client, requests[args.warmup:], args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10000, help='事前に投入する注文数')
+    parser.add_argument('--requests', type=int, default=500, help='シナリオごとのリクエスト数')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--url', help='起動済みの注文 API の URL。指定しない場合は ASGI で直接呼び出す')
+    parser.add_argument('--stub-delay', type=float, default=0.0,
+                        help='スタブの厨房・支払いサービスの応答までの秒数 (--url なしの場合)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='結果を書き出す JSON ファイルのパス')
+    args = parser.parse_args()
+    args.warmup = min(args.warmup, args.requests - 1)
+
+    parameters = {
+        'target': args.url or 'asgi',
+        'orders': args.orders,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'concurrency': args.concurrency,
+        'stub_delay': args.stub_delay,
+        'seed': args.seed,
+        'env': {
+            name: os.getenv(name)
+            for name in ('ORDERS_ASYNC', 'ORDERS_CACHE', 'OUTBOX_DISPATCHER', 'ORDERS_METRICS')
+        },
+    }
+    if args.url:
+        results = run(HTTPTarget(args.url), args)
+    else:
+        with in_process_target(args.stub_delay) as client:
+            results = run(client, args)
+    write_results(args.output, 'orders', parameters, results)
+
+
+if __name__ == '__main__':
+    main()
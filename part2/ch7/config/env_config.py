@@ -1,20 +1,50 @@
 from dotenv import load_dotenv
 import os
 
-from typing import Literal
+from typing import Dict, List, Literal
+
+# SQLite の接続時に設定する PRAGMA のプロファイル
+# default では何も設定せず、SQLite の既定値 (rollback journal, synchronous=FULL など) を使う
+# performance は SQLITE_PROFILE=performance を指定した場合にだけ使い、以下の点で挙動が変わる
+# - 電源断や OS のクラッシュの際に、直前にコミットした書き込みが失われる可能性がある
+# - 外部キー制約が有効になり、存在しない注文を参照するアイテムの書き込みはエラーになる
+# - データベースファイルの横に -wal, -shm ファイルが作られ、ネットワークファイルシステムでは使えない
+SQLITE_PROFILES: Dict[str, Dict[str, str]] = {
+    'default': {},
+    'performance': {
+        # 読み込みと書き込みが互いをブロックしないよう、WAL を使う
+        'journal_mode': 'WAL',
+        # WAL ではコミットごとの fsync を省略しても破損はしない
+        # (電源断の場合は直前のコミットが失われる可能性がある)
+        'synchronous': 'NORMAL',
+        'mmap_size': str(256 * 1024 * 1024),
+        # 負の値は KiB 単位 (64 MiB)
+        'cache_size': str(-64 * 1024),
+        # 書き込みのロックを待つミリ秒数
+        'busy_timeout': '5000',
+        'foreign_keys': 'ON',
+    },
+}
 
 class EnvConfig:
     '''環境変数の設定を責務とするクラス'''
+    # .env ファイルの読み込みはプロセス内で一度だけ行えば十分なため、クラス変数で管理する
+    _dotenv_loaded: bool = False
+
     def __init__(self):
         '''.env ファイルから環境変数に値を注入
         
         環境変数 ENV の値を参照し、適切な .env.xxx から環境変数の注入を実施
         環境変数 ENV には development, production が設定されていることを想定
         もし何も指定されていない場合、production 扱いで実行される
+        インスタンスを生成するたびにファイルを読み直さないよう、読み込みは初回のみ行う
         '''
+        if EnvConfig._dotenv_loaded:
+            return
         env: Literal['development', 'production'] = os.getenv("ENV", 'production')
         dotenv_path = f"../.env.{env}"
         load_dotenv(dotenv_path)
+        EnvConfig._dotenv_loaded = True
     
     @property
     def kitchen_base_url(self):
@@ -22,4 +52,234 @@ class EnvConfig:
     
     @property
     def payments_base_url(self):
-        return os.getenv('PAYMENTS_BASE_URL')
\ No newline at end of file
+        return os.getenv('PAYMENTS_BASE_URL')
+
+    @property
+    def http_timeout(self) -> float:
+        '''厨房サービス・支払いサービスへのリクエストのタイムアウト秒数'''
+        return float(os.getenv('HTTP_TIMEOUT', '5'))
+
+    @property
+    def http_max_retries(self) -> int:
+        '''接続エラーなどが起きた場合に、リクエストを再試行する最大回数'''
+        return int(os.getenv('HTTP_MAX_RETRIES', '2'))
+
+    @property
+    def http_backoff_factor(self) -> float:
+        '''再試行までの待ち時間の基準となる秒数'''
+        return float(os.getenv('HTTP_BACKOFF_FACTOR', '0.1'))
+
+    @property
+    def http_pool_maxsize(self) -> int:
+        '''接続先ごとに保持する keep-alive 接続の最大数'''
+        return int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+
+    @property
+    def circuit_failure_threshold(self) -> int:
+        '''サーキットブレーカーを開くまでに許容する、連続した失敗の回数'''
+        return int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+
+    @property
+    def circuit_recovery_timeout(self) -> float:
+        '''サーキットブレーカーを開いてから、試しに呼び出すまでの秒数'''
+        return float(os.getenv('CIRCUIT_RECOVERY_TIMEOUT', '30'))
+
+    @property
+    def circuit_half_open_max_calls(self) -> int:
+        '''半開の状態で、試しに呼び出すリクエストの数'''
+        return int(os.getenv('CIRCUIT_HALF_OPEN_MAX_CALLS', '1'))
+
+    def downstream_max_concurrency(self, name: str) -> int:
+        '''接続先 (kitchen, payments) ごとの同時呼び出し数の上限
+
+        KITCHEN_MAX_CONCURRENCY のように接続先ごとに指定でき、
+        指定がない場合は DOWNSTREAM_MAX_CONCURRENCY を利用する
+        '''
+        default = os.getenv('DOWNSTREAM_MAX_CONCURRENCY', '10')
+        return int(os.getenv(f'{name.upper()}_MAX_CONCURRENCY', default))
+
+    @property
+    def bulkhead_max_wait(self) -> float:
+        '''同時呼び出し数が上限に達している場合に、空きを待つ秒数'''
+        return float(os.getenv('BULKHEAD_MAX_WAIT', '0.5'))
+
+    @property
+    def database_url(self) -> str:
+        '''注文データベースの接続先 URL。未指定の場合はローカルの sqlite を参照'''
+        return os.getenv('DATABASE_URL', 'sqlite:///orders.db')
+
+    def sqlite_pragmas(self) -> Dict[str, str]:
+        '''SQLite の接続時に設定する PRAGMA
+
+        SQLITE_PROFILE (default, performance) でプロファイルを選び、
+        各値は SQLITE_JOURNAL_MODE のように SQLITE_ + PRAGMA の名前で個別に上書きできる。
+        耐久性と外部キーの挙動が変わるため、未指定の場合は default とし、performance は明示的に選ぶ
+        '''
+        profile = os.getenv('SQLITE_PROFILE', 'default').lower()
+        try:
+            pragmas = dict(SQLITE_PROFILES[profile])
+        except KeyError:
+            raise ValueError(f'Unknown SQLITE_PROFILE: {profile}')
+        for name in SQLITE_PROFILES['performance']:
+            value = os.getenv(f'SQLITE_{name.upper()}')
+            if value is not None:
+                pragmas[name] = value
+        return pragmas
+
+    @property
+    def async_database_url(self) -> str:
+        '''非同期ドライバで接続する場合の URL
+
+        指定がない場合、sqlite であれば database_url のドライバを aiosqlite に差し替えて利用する
+        '''
+        url = os.getenv('ASYNC_DATABASE_URL')
+        if url:
+            return url
+        return self.database_url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+
+    @property
+    def database_replica_urls(self) -> List[str]:
+        '''読み込み専用のレプリカの接続先 URL
+
+        DATABASE_REPLICA_URLS にカンマ区切りで指定する。指定がない場合は全てプライマリから読み込む
+        '''
+        urls = os.getenv('DATABASE_REPLICA_URLS', '')
+        return [url.strip() for url in urls.split(',') if url.strip()]
+
+    @property
+    def async_database_replica_urls(self) -> List[str]:
+        '''非同期ドライバで接続する場合のレプリカの URL
+
+        ASYNC_DATABASE_REPLICA_URLS の指定がない場合、database_replica_urls の sqlite の
+        ドライバを aiosqlite に差し替えて利用する
+        '''
+        urls = os.getenv('ASYNC_DATABASE_REPLICA_URLS')
+        if urls:
+            return [url.strip() for url in urls.split(',') if url.strip()]
+        return [
+            url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+            for url in self.database_replica_urls
+        ]
+
+    @property
+    def read_your_writes_window(self) -> float:
+        '''書き込みを行ったクライアントの読み込みを、レプリカではなくプライマリに向ける秒数
+
+        レプリカの遅延として想定する最大値よりも長くする
+        '''
+        return float(os.getenv('READ_YOUR_WRITES_WINDOW', '5'))
+
+    @property
+    def orders_async(self) -> bool:
+        '''注文 API を async def のハンドラで提供するかどうか'''
+        return os.getenv('ORDERS_ASYNC', 'false').lower() == 'true'
+
+    @property
+    def order_id_generator(self) -> Literal['uuid4', 'uuid7']:
+        '''注文などのレコードの ID の生成方法
+
+        uuid7 は先頭が生成時刻になるため、INSERT が主キーのインデックスの末尾への追加になる。
+        ID から作成時刻がおおよそ分かるようになる点に注意する
+        '''
+        return os.getenv('ORDER_ID_GENERATOR', 'uuid4').lower()
+
+    @property
+    def db_pool_size(self) -> int:
+        '''コネクションプールで常時保持する接続数'''
+        return int(os.getenv('DB_POOL_SIZE', '5'))
+
+    @property
+    def db_max_overflow(self) -> int:
+        '''pool_size を超えて一時的に作成できる接続数'''
+        return int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+    @property
+    def db_pool_recycle(self) -> int:
+        '''接続を作り直すまでの秒数。-1 の場合は作り直さない'''
+        return int(os.getenv('DB_POOL_RECYCLE', '-1'))
+
+    @property
+    def db_pool_pre_ping(self) -> bool:
+        '''プールから接続を取り出す際に疎通確認を行うかどうか'''
+        return os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true'
+
+    @property
+    def orders_cache(self) -> Literal['none', 'memory', 'fake', 'redis']:
+        '''ID を指定した注文の取得に使うキャッシュの種類
+
+        memory はワーカープロセスごとのキャッシュのため、他のワーカーで更新された注文は
+        有効期限が切れるまで古いまま返る可能性がある。複数のワーカーで動かす場合は redis を指定する。
+        古い内容を返してよいかはデプロイの構成によるため、未指定の場合は none とし、キャッシュは明示的に有効にする
+        '''
+        return os.getenv('ORDERS_CACHE', 'none').lower()
+
+    @property
+    def orders_cache_maxsize(self) -> int:
+        '''memory のキャッシュで保持する注文の最大数'''
+        return int(os.getenv('ORDERS_CACHE_MAXSIZE', '1024'))
+
+    @property
+    def orders_cache_ttl(self) -> float:
+        '''キャッシュした注文の有効期限の秒数'''
+        return float(os.getenv('ORDERS_CACHE_TTL', '30'))
+
+    @property
+    def orders_cache_tombstone_ttl(self) -> float:
+        '''注文をキャッシュから取り除いた後、キャッシュへの格納を拒否する秒数
+
+        取り除く前にデータベースから読み込まれた古い内容で、キャッシュが埋め直されないようにする
+        '''
+        return float(os.getenv('ORDERS_CACHE_TOMBSTONE_TTL', '5'))
+
+    @property
+    def redis_url(self) -> str:
+        return os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+    @property
+    def orders_fast_json(self) -> bool:
+        '''注文のレスポンスを response_model で検証せず、直接 JSON に変換するかどうか'''
+        return os.getenv('ORDERS_FAST_JSON', 'false').lower() == 'true'
+
+    @property
+    def orders_metrics(self) -> bool:
+        '''ルートごとの処理時間などを集計し、/metrics で公開するかどうか'''
+        return os.getenv('ORDERS_METRICS', 'false').lower() == 'true'
+
+    @property
+    def server_timing(self) -> bool:
+        '''レスポンスに処理時間の内訳を表す Server-Timing ヘッダーを付与するかどうか
+
+        SQL や外部サービスの呼び出しにかかった時間がクライアントに見えるため、
+        開発環境などでの利用を想定している
+        '''
+        return os.getenv('SERVER_TIMING', 'false').lower() == 'true'
+
+    @property
+    def outbox_dispatcher(self) -> Literal['inline', 'off']:
+        '''アウトボックスのディスパッチャーの動かし方
+
+        inline の場合は API のプロセスの中でバックグラウンドタスクとして動かす。
+        off の場合は API のプロセスでは動かさず、python -m orders.outbox.dispatcher で
+        別のワーカープロセスとして起動する
+        '''
+        return os.getenv('OUTBOX_DISPATCHER', 'inline').lower()
+
+    @property
+    def outbox_poll_interval(self) -> float:
+        '''処理待ちのメッセージがない場合に、次に確認するまでの秒数'''
+        return float(os.getenv('OUTBOX_POLL_INTERVAL', '1'))
+
+    @property
+    def outbox_batch_size(self) -> int:
+        '''ディスパッチャーが一度に取り出すメッセージの最大数'''
+        return int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+
+    @property
+    def outbox_max_attempts(self) -> int:
+        '''メッセージの処理を試行する最大回数'''
+        return int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+
+    @property
+    def outbox_backoff_factor(self) -> float:
+        '''メッセージの処理を再試行するまでの待ち時間の基準となる秒数'''
+        return float(os.getenv('OUTBOX_BACKOFF_FACTOR', '1'))
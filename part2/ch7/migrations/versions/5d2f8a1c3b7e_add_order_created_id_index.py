@@ -0,0 +1,27 @@
+"""Add composite index on order (created, id)
+
+Revision ID: 5d2f8a1c3b7e
+Revises: 046cad1a6e28
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8a1c3b7e'
+down_revision: Union[str, None] = '046cad1a6e28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 注文一覧のキーセットページネーション (created, id の順) で利用する
+    op.create_index('ix_order_created_id', 'order', ['created', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_created_id', table_name='order')
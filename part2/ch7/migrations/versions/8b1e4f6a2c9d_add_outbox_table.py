@@ -0,0 +1,49 @@
+"""Add outbox table for deferred order payments
+
+Revision ID: 8b1e4f6a2c9d
+Revises: 5d2f8a1c3b7e
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e4f6a2c9d'
+down_revision: Union[str, None] = '5d2f8a1c3b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('order_id', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('idempotency_key', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index('ix_outbox_order_id', 'outbox', ['order_id'], unique=False)
+    # 処理待ちのメッセージを、次の実行時刻の順に取り出す際に利用する
+    op.create_index(
+        'ix_outbox_status_next_attempt_at',
+        'outbox',
+        ['status', 'next_attempt_at'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_status_next_attempt_at', table_name='outbox')
+    op.drop_index('ix_outbox_order_id', table_name='outbox')
+    op.drop_table('outbox')
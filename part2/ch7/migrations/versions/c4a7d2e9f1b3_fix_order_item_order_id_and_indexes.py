@@ -0,0 +1,52 @@
+"""Fix order_item.order_id type and add indexes for item and status lookups
+
+Revision ID: c4a7d2e9f1b3
+Revises: 8b1e4f6a2c9d
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7d2e9f1b3'
+down_revision: Union[str, None] = '8b1e4f6a2c9d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # order.id (UUID の文字列) を参照するため、order_id も文字列にする
+    # SQLite は列の型を変更できないため、batch モードでテーブルを作り直す
+    with op.batch_alter_table('order_item') as batch_op:
+        batch_op.alter_column(
+            'order_id',
+            existing_type=sa.Integer(),
+            type_=sa.String(),
+            existing_nullable=True
+        )
+        # 注文のアイテムの読み込み (selectin, joined) とアイテムの更新・削除で利用する
+        batch_op.create_index('ix_order_item_order_id', ['order_id'], unique=False)
+    # cancelled で絞り込んだ注文一覧を (created, id) の順に取得する際に利用する
+    # created だけの条件や並べ替えには、既存の ix_order_created_id を利用する
+    op.create_index(
+        'ix_order_status_created_id',
+        'order',
+        ['status', 'created', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_status_created_id', table_name='order')
+    with op.batch_alter_table('order_item') as batch_op:
+        batch_op.drop_index('ix_order_item_order_id')
+        batch_op.alter_column(
+            'order_id',
+            existing_type=sa.String(),
+            type_=sa.Integer(),
+            existing_nullable=True
+        )
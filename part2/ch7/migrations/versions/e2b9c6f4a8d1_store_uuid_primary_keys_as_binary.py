@@ -0,0 +1,130 @@
+"""Store order and order_item UUIDs as 16-byte binary
+
+Revision ID: e2b9c6f4a8d1
+Revises: c4a7d2e9f1b3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9c6f4a8d1'
+down_revision: Union[str, None] = 'c4a7d2e9f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 変換する (テーブル, 列)
+UUID_COLUMNS = (
+    ('order', 'id'),
+    ('order_item', 'id'),
+    ('order_item', 'order_id'),
+)
+# 初期マイグレーションで名前を付けずに作成した外部キーの、PostgreSQL での名前
+ORDER_ITEM_FK = 'order_item_order_id_fkey'
+
+
+class BinaryUUID(TypeDecorator):
+    '''このリビジョン時点の orders.repository.column_types.BinaryUUID の列定義
+
+    アプリケーションの型を変更してもこのマイグレーションの結果が変わらないよう、
+    インポートせずに DDL に必要な部分だけを固定して持つ。
+    値の変換は _convert_sqlite で行うため、バインドや読み込みの処理は持たない。
+    '''
+    impl = sa.LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(sa.LargeBinary(16))
+
+
+def _unsupported(dialect: str) -> RuntimeError:
+    return RuntimeError(
+        f'Migration {revision} only supports sqlite and postgresql, not {dialect}. '
+        'Convert the order and order_item UUID columns manually before stamping this revision.'
+    )
+
+
+def _to_bytes(value):
+    if value is None or isinstance(value, bytes):
+        return value
+    return uuid.UUID(value).bytes
+
+
+def _to_str(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(uuid.UUID(bytes=value))
+
+
+def _convert_sqlite(convert) -> None:
+    '''既存の行の ID を convert で変換する
+
+    SQLite には UUID を変換する関数がないため、Python の関数を接続に登録し、
+    テーブルごとに 1 つの UPDATE 文で変換する。
+    SQLite は列の型によらず値をそのまま保存するため、型を変更する前に変換しておく。
+    外部キーの制約は既定で無効なため、order.id と order_item.order_id は順に変換できる。
+    '''
+    connection = op.get_bind().connection.driver_connection
+    connection.create_function('convert_uuid', 1, convert, deterministic=True)
+    for table, column in UUID_COLUMNS:
+        op.execute(f'UPDATE "{table}" SET {column} = convert_uuid({column})')
+
+
+def _alter_sqlite(type_, existing_type) -> None:
+    # SQLite は列の型を変更できないため、batch モードでテーブルを作り直す
+    with op.batch_alter_table('order') as batch_op:
+        batch_op.alter_column(
+            'id', type_=type_, existing_type=existing_type, existing_nullable=False
+        )
+    with op.batch_alter_table('order_item') as batch_op:
+        batch_op.alter_column(
+            'id', type_=type_, existing_type=existing_type, existing_nullable=False
+        )
+        batch_op.alter_column(
+            'order_id', type_=type_, existing_type=existing_type, existing_nullable=True
+        )
+
+
+def _alter_postgresql(type_, existing_type, cast: str) -> None:
+    # 参照されている列の型を変更するため、外部キーをいったん削除する
+    op.drop_constraint(ORDER_ITEM_FK, 'order_item', type_='foreignkey')
+    for table, column in UUID_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=type_,
+            existing_type=existing_type,
+            postgresql_using=f'{column}::{cast}'
+        )
+    op.create_foreign_key(ORDER_ITEM_FK, 'order_item', 'order', ['order_id'], ['id'])
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _convert_sqlite(_to_bytes)
+        _alter_sqlite(BinaryUUID(), sa.String())
+    elif dialect == 'postgresql':
+        _alter_postgresql(postgresql.UUID(as_uuid=True), sa.String(), 'uuid')
+    else:
+        raise _unsupported(dialect)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _convert_sqlite(_to_str)
+        _alter_sqlite(sa.String(), BinaryUUID())
+    elif dialect == 'postgresql':
+        _alter_postgresql(sa.String(), postgresql.UUID(as_uuid=True), 'text')
+    else:
+        raise _unsupported(dialect)
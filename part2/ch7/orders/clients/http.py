@@ -0,0 +1,194 @@
+'''厨房サービス・支払いサービスとの通信に使う HTTP クライアント
+
+requests.post のようなモジュールレベルの関数を呼び出すと、毎回新しい TCP 接続が作られる。
+ここでは keep-alive の接続プールを持つセッションをプロセス内で共有し、
+タイムアウトとジッター付きのバックオフによる再試行を一箇所で扱う。
+
+POST は冪等ではないため、既定では接続の確立に失敗した場合 (リクエストが相手に届いていない場合)
+にだけ再試行する。読み込みのタイムアウトや 502, 503, 504 のレスポンスでは、相手がすでに処理を
+行っている可能性があるため、Idempotency-Key ヘッダーを付けたリクエストの場合にだけ再試行する。
+
+非同期版 (AsyncHTTPClient) は httpx を利用するため、
+利用する場合は別途 httpx をインストールしておく必要がある。
+'''
+
+import asyncio
+import random
+import time
+from functools import lru_cache
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+from config.env_config import EnvConfig
+from orders.orders_service.exceptions import APIIntegrationError
+
+# 一時的な障害とみなし、再試行の対象とするステータスコード (冪等キーがある場合のみ)
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+
+
+def backoff_delay(attempt: int, backoff_factor: float, max_delay: float = 2.0) -> float:
+    '''attempt 回目の再試行までの待ち時間を計算
+
+    指数的に増える上限値の範囲からランダムに選ぶ (full jitter) ことで、
+    複数のワーカーの再試行が同じタイミングに集中しないようにする。
+    '''
+    return random.uniform(0, min(max_delay, backoff_factor * 2 ** attempt))
+
+
+def idempotency_headers(idempotency_key: Optional[str]) -> Optional[dict]:
+    '''冪等キーを送信するためのヘッダー。キーがない場合は None'''
+    if idempotency_key is None:
+        return None
+    return {IDEMPOTENCY_KEY_HEADER: idempotency_key}
+
+
+def has_idempotency_key(headers: Optional[dict]) -> bool:
+    '''リクエストのヘッダーに冪等キーが含まれているかどうか'''
+    if not headers:
+        return False
+    name = IDEMPOTENCY_KEY_HEADER.lower()
+    return any(key.lower() == name for key in headers)
+
+
+def is_connect_error(error: requests.RequestException) -> bool:
+    '''接続の確立中に起きた、リクエストが相手に届いていないことが確かなエラーかどうか
+
+    接続が途中で切れた場合 (ProtocolError) は、リクエストを送信した後の可能性があるため含めない
+    '''
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class HTTPClient:
+    '''keep-alive の接続プールを持つ同期 HTTP クライアント'''
+
+    def __init__(
+        self,
+        timeout: float,
+        max_retries: int,
+        backoff_factor: float,
+        pool_maxsize: int
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_maxsize, pool_maxsize=pool_maxsize
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        '''POST リクエストを送信
+
+        接続の確立に失敗した場合は max_retries 回まで再試行する。
+        Idempotency-Key ヘッダーがある場合は、読み込みのタイムアウトや接続の切断、
+        RETRY_STATUS_CODES のレスポンスの場合も再試行する。
+        再試行しても接続できなかった場合や、再試行できないエラーの場合は APIIntegrationError を送出する。
+        '''
+        idempotent = has_idempotency_key(kwargs.get('headers'))
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    url, timeout=timeout or self.timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                retryable = idempotent or is_connect_error(error)
+                if not retryable or attempt == self.max_retries:
+                    raise APIIntegrationError(f'Could not reach {url}') from error
+            else:
+                retryable = idempotent and response.status_code in RETRY_STATUS_CODES
+                if not retryable or attempt == self.max_retries:
+                    return response
+            time.sleep(backoff_delay(attempt, self.backoff_factor))
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHTTPClient:
+    '''HTTPClient の非同期版'''
+
+    def __init__(
+        self,
+        timeout: float,
+        max_retries: int,
+        backoff_factor: float,
+        pool_maxsize: int
+    ):
+        if httpx is None:
+            raise RuntimeError('AsyncHTTPClient requires httpx to be installed')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize
+            )
+        )
+
+    async def post(self, url: str, timeout: Optional[float] = None, **kwargs):
+        '''POST リクエストを送信
+
+        再試行の扱いは HTTPClient.post と同じ。
+        接続プールの空き待ちのタイムアウトも、リクエストを送信していないため再試行する
+        '''
+        idempotent = has_idempotency_key(kwargs.get('headers'))
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(
+                    url, timeout=timeout or self.timeout, **kwargs
+                )
+            except httpx.TransportError as error:
+                retryable = idempotent or isinstance(
+                    error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise APIIntegrationError(f'Could not reach {url}') from error
+            else:
+                retryable = idempotent and response.status_code in RETRY_STATUS_CODES
+                if not retryable or attempt == self.max_retries:
+                    return response
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_factor))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> HTTPClient:
+    '''プロセス内で共有する HTTPClient を取得'''
+    config = EnvConfig()
+    return HTTPClient(
+        timeout=config.http_timeout,
+        max_retries=config.http_max_retries,
+        backoff_factor=config.http_backoff_factor,
+        pool_maxsize=config.http_pool_maxsize
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> AsyncHTTPClient:
+    '''プロセス内で共有する AsyncHTTPClient を取得'''
+    config = EnvConfig()
+    return AsyncHTTPClient(
+        timeout=config.http_timeout,
+        max_retries=config.http_max_retries,
+        backoff_factor=config.http_backoff_factor,
+        pool_maxsize=config.http_pool_maxsize
+    )
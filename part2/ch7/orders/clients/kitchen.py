@@ -0,0 +1,103 @@
+'''厨房サービスのクライアント'''
+
+from functools import lru_cache
+from typing import List, Optional
+
+from config.env_config import EnvConfig
+from orders.clients.http import (
+    AsyncHTTPClient,
+    HTTPClient,
+    get_async_http_client,
+    get_http_client,
+    idempotency_headers
+)
+from orders.clients.resilience import DownstreamGuard, get_guard
+from orders.types import ScheduleId
+
+
+class KitchenClient:
+    '''厨房サービスへのリクエストを担うクライアント
+
+    ベース URL はインスタンスの生成時に一度だけ解決して保持する。
+    レスポンスの解釈はドメインオブジェクトである Order に任せ、ここではレスポンスをそのまま返す。
+    呼び出しは厨房サービス用の DownstreamGuard を通して行い、
+    厨房サービスが応答しない間は待たずに DownstreamUnavailableError で失敗させる。
+    '''
+
+    def __init__(
+        self,
+        http_client: HTTPClient,
+        base_url: Optional[str] = None,
+        guard: Optional[DownstreamGuard] = None
+    ):
+        self.http_client = http_client
+        self.guard = guard or get_guard('kitchen')
+        self.base_url = base_url or EnvConfig().kitchen_base_url
+
+    def schedule(self, items: List[dict], idempotency_key: Optional[str] = None):
+        '''注文内容のスケジューリングを依頼
+
+        idempotency_key を指定すると Idempotency-Key ヘッダーとして送信し、
+        再試行によって同じ注文が二重にスケジュールされないようにする
+        '''
+        return self.guard.call(
+            self.http_client.post,
+            f'{self.base_url}/schedules',
+            json={'order': items},
+            headers=idempotency_headers(idempotency_key)
+        )
+
+    def cancel(self, schedule_id: ScheduleId, items: List[dict]):
+        '''スケジュールのキャンセルを依頼'''
+        return self.guard.call(
+            self.http_client.post,
+            f'{self.base_url}/schedules/{schedule_id}/cancel',
+            json={'order': items}
+        )
+
+
+class AsyncKitchenClient:
+    '''KitchenClient の非同期版'''
+
+    def __init__(
+        self,
+        http_client: AsyncHTTPClient,
+        base_url: Optional[str] = None,
+        guard: Optional[DownstreamGuard] = None
+    ):
+        self.http_client = http_client
+        self.guard = guard or get_guard('kitchen')
+        self.base_url = base_url or EnvConfig().kitchen_base_url
+
+    async def schedule(self, items: List[dict], idempotency_key: Optional[str] = None):
+        '''注文内容のスケジューリングを依頼
+
+        idempotency_key を指定すると Idempotency-Key ヘッダーとして送信し、
+        再試行によって同じ注文が二重にスケジュールされないようにする
+        '''
+        return await self.guard.call_async(
+            self.http_client.post,
+            f'{self.base_url}/schedules',
+            json={'order': items},
+            headers=idempotency_headers(idempotency_key)
+        )
+
+    async def cancel(self, schedule_id: ScheduleId, items: List[dict]):
+        '''スケジュールのキャンセルを依頼'''
+        return await self.guard.call_async(
+            self.http_client.post,
+            f'{self.base_url}/schedules/{schedule_id}/cancel',
+            json={'order': items}
+        )
+
+
+@lru_cache(maxsize=None)
+def get_kitchen_client() -> KitchenClient:
+    '''プロセス内で共有する KitchenClient を取得'''
+    return KitchenClient(get_http_client())
+
+
+@lru_cache(maxsize=None)
+def get_async_kitchen_client() -> AsyncKitchenClient:
+    '''プロセス内で共有する AsyncKitchenClient を取得'''
+    return AsyncKitchenClient(get_async_http_client())
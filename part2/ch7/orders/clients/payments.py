@@ -0,0 +1,84 @@
+'''支払いサービスのクライアント'''
+
+from functools import lru_cache
+from typing import Optional
+
+from config.env_config import EnvConfig
+from orders.clients.http import (
+    AsyncHTTPClient,
+    HTTPClient,
+    get_async_http_client,
+    get_http_client,
+    idempotency_headers
+)
+from orders.clients.resilience import DownstreamGuard, get_guard
+from orders.types import OrderId
+
+
+class PaymentsClient:
+    '''支払いサービスへのリクエストを担うクライアント
+
+    呼び出しは支払いサービス用の DownstreamGuard を通して行う
+    '''
+
+    def __init__(
+        self,
+        http_client: HTTPClient,
+        base_url: Optional[str] = None,
+        guard: Optional[DownstreamGuard] = None
+    ):
+        self.http_client = http_client
+        self.guard = guard or get_guard('payments')
+        self.base_url = base_url or EnvConfig().payments_base_url
+
+    def pay(self, order_id: OrderId, idempotency_key: Optional[str] = None):
+        '''注文の支払いを依頼
+
+        idempotency_key を指定すると Idempotency-Key ヘッダーとして送信し、
+        再試行によって同じ注文が二重に支払われないようにする
+        '''
+        return self.guard.call(
+            self.http_client.post,
+            self.base_url,
+            json={'order_id': str(order_id)},
+            headers=idempotency_headers(idempotency_key)
+        )
+
+
+class AsyncPaymentsClient:
+    '''PaymentsClient の非同期版'''
+
+    def __init__(
+        self,
+        http_client: AsyncHTTPClient,
+        base_url: Optional[str] = None,
+        guard: Optional[DownstreamGuard] = None
+    ):
+        self.http_client = http_client
+        self.guard = guard or get_guard('payments')
+        self.base_url = base_url or EnvConfig().payments_base_url
+
+    async def pay(self, order_id: OrderId, idempotency_key: Optional[str] = None):
+        '''注文の支払いを依頼
+
+        idempotency_key を指定すると Idempotency-Key ヘッダーとして送信し、
+        再試行によって同じ注文が二重に支払われないようにする
+        '''
+        return await self.guard.call_async(
+            self.http_client.post,
+            self.base_url,
+            json={'order_id': str(order_id)},
+            headers=idempotency_headers(idempotency_key)
+        )
+
+
+@lru_cache(maxsize=None)
+def get_payments_client() -> PaymentsClient:
+    '''プロセス内で共有する PaymentsClient を取得'''
+    return PaymentsClient(get_http_client())
+
+
+@lru_cache(maxsize=None)
+def get_async_payments_client() -> AsyncPaymentsClient:
+    '''プロセス内で共有する AsyncPaymentsClient を取得'''
+    return AsyncPaymentsClient(get_async_http_client())
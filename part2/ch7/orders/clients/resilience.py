@@ -0,0 +1,322 @@
+'''外部サービスの呼び出しを保護するサーキットブレーカーとバルクヘッド
+
+厨房サービスが遅くなると、呼び出し元のワーカーがタイムアウトまで待たされ続け、
+やがて注文 API のワーカーがすべて埋まってしまう。これを防ぐため、接続先ごとに以下を組み合わせる。
+
+- サーキットブレーカー: 失敗が failure_threshold 回続いたら開き (open)、
+  recovery_timeout 秒の間は呼び出さずに DownstreamUnavailableError で即座に失敗させる。
+  その後は半開 (half_open) になり、half_open_max_calls 回だけ試しに呼び出して、
+  成功すれば閉じ (closed)、失敗すればもう一度開く。
+- バルクヘッド: 接続先ごとの同時呼び出し数を max_concurrent に制限する。
+  上限に達している場合は max_wait 秒だけ空きを待ち、空かなければ即座に失敗させる。
+  これにより、一方の接続先が遅くなっても、もう一方の呼び出しに使うワーカーは残る。
+
+接続エラーやタイムアウト (APIIntegrationError) などの例外と 5xx のレスポンスを失敗として数える。
+4xx のレスポンスはリクエストの内容の問題であり、接続先は正常に動いているため失敗として数えない。
+キャンセルのように結果が分からないまま中断された呼び出しは、成功・失敗のどちらにも数えず、
+半開の状態で使った試行の枠を返す。枠を返さないと、半開のまま全ての呼び出しを拒否し続けてしまう。
+'''
+
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Literal
+
+from config.env_config import EnvConfig
+from orders import metrics
+from orders.orders_service.exceptions import DownstreamUnavailableError
+
+logger = logging.getLogger(__name__)
+
+CircuitState = Literal['closed', 'open', 'half_open']
+
+
+class CircuitBreaker:
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state: CircuitState = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        # 開いてから recovery_timeout 秒が経過していれば、半開として扱う
+        if (
+            self._state == 'open'
+            and self._clock() - self._opened_at >= self.recovery_timeout
+        ):
+            self._set_state('half_open')
+            self._half_open_calls = 0
+        return self._state
+
+    def _set_state(self, state: CircuitState):
+        if state != self._state:
+            logger.warning(
+                'Circuit breaker %s changed from %s to %s',
+                self.name, self._state, state
+            )
+            self._state = state
+
+    def before_call(self) -> bool:
+        '''呼び出しの可否を判定し、呼び出せない場合は DownstreamUnavailableError を送出
+
+        半開の状態で試行の枠を使った場合は True を返す
+        '''
+        with self._lock:
+            state = self._current_state()
+            if state == 'closed':
+                return False
+            if state == 'half_open' and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected += 1
+            retry_after = max(
+                self.recovery_timeout - (self._clock() - self._opened_at), 1.0
+            )
+        raise DownstreamUnavailableError(
+            f'Circuit breaker for {self.name} is open', retry_after=retry_after
+        )
+
+    def release_call(self, trial: bool):
+        '''before_call で許可した呼び出しが、成功・失敗を記録せずに終わった場合に呼び出す
+
+        trial は before_call の戻り値。半開の試行の枠を使っていた場合は、その枠を返す
+        '''
+        if not trial:
+            return
+        with self._lock:
+            if self._state == 'half_open' and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._set_state('closed')
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == 'half_open' or self._failures >= self.failure_threshold:
+                if state != 'open':
+                    self.opened += 1
+                self._set_state('open')
+                self._opened_at = self._clock()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'rejected': self.rejected,
+                'opened': self.opened,
+            }
+
+
+class Bulkhead:
+    '''スレッドから呼び出す場合の同時呼び出し数の制限'''
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @contextlib.contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            with self._lock:
+                self.rejected += 1
+            raise DownstreamUnavailableError(
+                f'Too many concurrent requests to {self.name}',
+                retry_after=max(self.max_wait, 1.0)
+            )
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+class AsyncBulkhead:
+    '''Bulkhead のイベントループ版'''
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = asyncio.BoundedSemaphore(max_concurrent)
+        self.rejected = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise DownstreamUnavailableError(
+                f'Too many concurrent requests to {self.name}',
+                retry_after=max(self.max_wait, 1.0)
+            ) from None
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+class DownstreamGuard:
+    '''1つの接続先に対するサーキットブレーカーとバルクヘッドをまとめたもの
+
+    同期・非同期のクライアントで同じサーキットブレーカーを共有し、
+    同時呼び出し数はそれぞれの実行モデルごとに制限する。
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        breaker: CircuitBreaker,
+        bulkhead: Bulkhead,
+        async_bulkhead: AsyncBulkhead
+    ):
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.async_bulkhead = async_bulkhead
+        # 呼び出しの回数などは、複数のスレッドとイベントループから更新されるため、ロックの中で更新する
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+
+    def _start(self) -> float:
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _record(self, response, started: float):
+        if response.status_code >= 500:
+            self._record_error(started)
+            return
+        self.breaker.record_success()
+        metrics.record_downstream(self.name, 'ok', time.perf_counter() - started)
+
+    def _record_error(self, started: float):
+        with self._lock:
+            self.failures += 1
+        self.breaker.record_failure()
+        metrics.record_downstream(self.name, 'error', time.perf_counter() - started)
+
+    def call(self, func: Callable, *args, **kwargs):
+        '''func を呼び出し、そのレスポンスを返す
+
+        バルクヘッドの空きを待ってからサーキットブレーカーに問い合わせる。
+        先に問い合わせると、バルクヘッドで拒否された場合に半開の試行の枠だけが使われてしまう
+        '''
+        with self.bulkhead.slot():
+            trial = self.breaker.before_call()
+            started = self._start()
+            try:
+                response = func(*args, **kwargs)
+            except Exception:
+                self._record_error(started)
+                raise
+            except BaseException:
+                self.breaker.release_call(trial)
+                raise
+            else:
+                self._record(response, started)
+            finally:
+                self._finish()
+        return response
+
+    async def call_async(self, func: Callable, *args, **kwargs):
+        '''call の非同期版。func はコルーチン関数
+
+        キャンセル (asyncio.CancelledError) は失敗として数えない
+        '''
+        async with self.async_bulkhead.slot():
+            trial = self.breaker.before_call()
+            started = self._start()
+            try:
+                response = await func(*args, **kwargs)
+            except Exception:
+                self._record_error(started)
+                raise
+            except BaseException:
+                self.breaker.release_call(trial)
+                raise
+            else:
+                self._record(response, started)
+            finally:
+                self._finish()
+        return response
+
+    def stats(self) -> Dict[str, object]:
+        '''接続先の状態を表すメトリクス'''
+        with self._lock:
+            calls, failures, in_flight = self.calls, self.failures, self.in_flight
+        return {
+            **self.breaker.stats(),
+            'calls': calls,
+            'failures': failures,
+            'in_flight': in_flight,
+            'max_concurrent': self.bulkhead.max_concurrent,
+            'bulkhead_rejected': self.bulkhead.rejected + self.async_bulkhead.rejected,
+        }
+
+
+_guards: Dict[str, DownstreamGuard] = {}
+
+
+@lru_cache(maxsize=None)
+def get_guard(name: Literal['kitchen', 'payments']) -> DownstreamGuard:
+    '''プロセス内で共有する、接続先ごとの DownstreamGuard を取得'''
+    config = EnvConfig()
+    max_concurrent = config.downstream_max_concurrency(name)
+    guard = DownstreamGuard(
+        name,
+        CircuitBreaker(
+            name,
+            failure_threshold=config.circuit_failure_threshold,
+            recovery_timeout=config.circuit_recovery_timeout,
+            half_open_max_calls=config.circuit_half_open_max_calls
+        ),
+        Bulkhead(name, max_concurrent, config.bulkhead_max_wait),
+        AsyncBulkhead(name, max_concurrent, config.bulkhead_max_wait)
+    )
+    _guards[name] = guard
+    return guard
+
+
+def downstream_stats() -> Dict[str, Dict[str, object]]:
+    '''これまでに利用された接続先ごとのメトリクス'''
+    return {name: guard.stats() for name, guard in _guards.items()}
@@ -3,22 +3,37 @@
 現時点ではまだ仮実装
 '''
 
-import requests
+from orders.clients.kitchen import (
+    get_async_kitchen_client,
+    get_kitchen_client
+)
+from orders.clients.payments import (
+    get_async_payments_client,
+    get_payments_client
+)
 from orders.orders_service.exceptions import (
     APIIntegrationError,
     InvalidActionError
 )
 from orders.types import ScheduleId
 
-from config.env_config import EnvConfig
-
 class OrderItem:
-    '''注文の各アイテムを表すビジネスオブジェクト'''
+    '''注文の各アイテムを表すビジネスオブジェクト
+
+    注文の一覧や出力では大量に作られるため、__slots__ でインスタンスごとの __dict__ を持たせない
+    '''
+    __slots__ = ('id', 'product', 'quantity', 'size')
+
     def __init__(self, id, product, quantity, size):
         self.id = id
         self.product = product
         self.quantity = quantity
         self.size = size
+
+    @classmethod
+    def from_record(cls, record):
+        '''OrderItemModel や、同じ名前の列を持つ Row から辞書を経由せずに作成'''
+        return cls(record.id, record.product, record.quantity, record.size)
         
     def dict(self):
         return {
@@ -28,6 +43,18 @@ class OrderItem:
         }
         
 class Order:
+    __slots__ = (
+        '_order',
+        '_id',
+        '_created',
+        'items',
+        '_status',
+        'schedule_id',
+        'delivery_id',
+        '_kitchen_client',
+        '_payments_client',
+    )
+
     def __init__(
         self,
         id,
@@ -36,7 +63,9 @@ class Order:
         status,
         schedule_id=None,
         delivery_id=None,
-        order_=None
+        order_=None,
+        kitchen_client=None,
+        payments_client=None
     ):
         '''イニシャライザ
         
@@ -53,6 +82,13 @@ class Order:
         既にデータベースに保存されている注文の詳細を取得する場合、_id, _created, _status には対応する値が割り当てられる。
         しかし、それ以外の場合では None が当てられており、その場合はポインタから取得することになる。
         この実装を property デコレータを通じて行っている。
+        
+        **kitchen_client, payments_client についての補足**
+        厨房サービス・支払いサービスとの通信は、外から渡されたクライアントを通じて行う。
+        同期のメソッド (pay, schedule, cancel) には KitchenClient / PaymentsClient を、
+        非同期のメソッド (pay_async, schedule_async, cancel_async) には
+        AsyncKitchenClient / AsyncPaymentsClient を渡すことを想定している。
+        指定しない場合は、プロセス内で共有されるクライアントが使われる。
         '''
         self._order = order_
         self._id = id
@@ -61,6 +97,30 @@ class Order:
         self._status = status
         self.schedule_id = schedule_id
         self.delivery_id = delivery_id
+        self._kitchen_client = kitchen_client
+        self._payments_client = payments_client
+
+    @classmethod
+    def from_record(cls, record, items=None, order_=None):
+        '''OrderModel や、同じ名前の列を持つ Row から辞書を経由せずに作成
+
+        items を省略した場合は record.items を使う。
+        Row にはアイテムが含まれないため、別に読み込んだアイテムの行を items に渡す。
+        '''
+        order = cls.__new__(cls)
+        order._order = order_
+        order._id = record.id
+        order._created = record.created
+        order.items = [
+            OrderItem.from_record(item)
+            for item in (record.items if items is None else items)
+        ]
+        order._status = record.status
+        order.schedule_id = record.schedule_id
+        order.delivery_id = record.delivery_id
+        order._kitchen_client = None
+        order._payments_client = None
+        return order
 
     @property
     def id(self):
@@ -80,47 +140,77 @@ class Order:
         status が progress ならキャンセルを実施、
         delivery であればキャンセルせず、エラーを出力
         '''
-        kitchen_base_url = EnvConfig().kitchen_base_url
         if self.status == 'progress':
-            response = requests.post(
-                f"{kitchen_base_url}/schedules/{self.schedule_id}/cancel",
-                json={"order": [item.dict() for item in self.items]}
+            kitchen_client = self._kitchen_client or get_kitchen_client()
+            response = kitchen_client.cancel(
+                self.schedule_id, [item.dict() for item in self.items]
             )
-            
-            if response.status_code == 200:
-                return
-            
-            raise APIIntegrationError(
-                f'Could not cancel order with id {self.id}'
+            self._check_cancel_response(response)
+        self._check_cancellable()
+        
+    async def cancel_async(self):
+        '''cancel の非同期版'''
+        if self.status == 'progress':
+            kitchen_client = self._kitchen_client or get_async_kitchen_client()
+            response = await kitchen_client.cancel(
+                self.schedule_id, [item.dict() for item in self.items]
             )
+            self._check_cancel_response(response)
+        self._check_cancellable()
+        
+    def _check_cancel_response(self, response):
+        if response.status_code == 200:
+            return
+        raise APIIntegrationError(
+            f'Could not cancel order with id {self.id}'
+        )
         
+    def _check_cancellable(self):
         # 配達中の注文のキャンセルは許可しない
         if self.status == 'delivery':
             raise InvalidActionError(
                 f'Could not process payment for order with id {self.id}'
             )
         
-    def pay(self):
-        '''支払いサービスを利用して支払いを実行'''
-        payments_base_url = EnvConfig().payments_base_url
-        response = requests.post(
-            payments_base_url,
-            json={'order_id': self.id}
+    def pay(self, idempotency_key=None):
+        '''支払いサービスを利用して支払いを実行
+        
+        idempotency_key を指定すると、同じキーでの再試行は支払いサービス側で一度だけ処理される
+        '''
+        payments_client = self._payments_client or get_payments_client()
+        self._check_pay_response(payments_client.pay(self.id, idempotency_key))
+        
+    async def pay_async(self, idempotency_key=None):
+        '''pay の非同期版'''
+        payments_client = self._payments_client or get_async_payments_client()
+        self._check_pay_response(
+            await payments_client.pay(self.id, idempotency_key)
         )
+        
+    def _check_pay_response(self, response):
         if response.status_code == 201:
             return
         raise APIIntegrationError(
             f'Could not process payment for order with id {self.id}'
         )
         
-    def schedule(self) -> ScheduleId:
+    def schedule(self, idempotency_key=None) -> ScheduleId:
         '''厨房サービスに注文内容をスケジューリング'''
-        kitchen_base_url = EnvConfig().kitchen_base_url
-        items = [item.dict() for item in self.items]
-        response = requests.post(
-            f'{kitchen_base_url}/schedules',
-            json = {'order': items}
+        kitchen_client = self._kitchen_client or get_kitchen_client()
+        response = kitchen_client.schedule(
+            [item.dict() for item in self.items], idempotency_key
         )
+        return self._schedule_id_from(response)
+        
+    async def schedule_async(self, idempotency_key=None) -> ScheduleId:
+        '''schedule の非同期版'''
+        kitchen_client = self._kitchen_client or get_async_kitchen_client()
+        response = await kitchen_client.schedule(
+            [item.dict() for item in self.items], idempotency_key
+        )
+        return self._schedule_id_from(response)
+        
+    def _schedule_id_from(self, response) -> ScheduleId:
         # 厨房サービスから成功のレスポンスを受け取った場合は、schedule_id を返却
         if response.status_code == 201:
             return response.json()['id']
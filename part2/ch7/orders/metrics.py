@@ -0,0 +1,252 @@
+'''注文 API のリクエストごとの処理時間を集計するモジュール
+
+リクエスト全体の処理時間のうち、データベース (SQL) と外部サービス (厨房・支払い) に
+費やした時間がどれだけかを、以下の2つの形で確認できるようにする。
+
+- ルートごとのヒストグラムなどを Prometheus のテキスト形式で出力する (/metrics)
+- 1つのリクエストの内訳を Server-Timing ヘッダーとして返す
+
+リクエストの処理中は、contextvars を使ってそのリクエストの RequestTimings を参照できるようにし、
+SQLAlchemy のイベントと DownstreamGuard から時間を書き込む。
+enable を呼び出すまではイベントを登録しないため、無効な場合は record_downstream の
+先頭での真偽値の確認以外に処理が増えることはない。
+'''
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ヒストグラムのバケットの上限の秒数
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# SQL の実行開始時刻を、実行コンテキストに保持する際の属性名
+_QUERY_START_ATTR = '_orders_metrics_start'
+
+
+class Histogram:
+    '''観測値をバケットごとに数えるヒストグラム'''
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        '''Prometheus の le ラベルと、その値以下の観測数の組'''
+        total = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.buckets):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+
+class RequestTimings:
+    '''1つのリクエストの処理中に、SQL と外部サービスに費やした時間'''
+
+    __slots__ = ('sql_count', 'sql_seconds', 'downstream')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.downstream: Dict[str, float] = {}
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    'orders_request_timings', default=None
+)
+
+
+class MetricsRegistry:
+    '''プロセス内で集計したメトリクスを保持する'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], Histogram] = {}
+        self.sql_statements: Dict[Tuple[str, str], int] = {}
+        self.sql_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.downstream: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        seconds: float,
+        timings: RequestTimings
+    ):
+        with self._lock:
+            _histogram(self.requests, (method, route, status_code)).observe(seconds)
+            key = (method, route)
+            self.sql_statements[key] = self.sql_statements.get(key, 0) + timings.sql_count
+            _histogram(self.sql_seconds, key).observe(timings.sql_seconds)
+
+    def observe_downstream(self, service: str, outcome: str, seconds: float):
+        with self._lock:
+            _histogram(self.downstream, (service, outcome)).observe(seconds)
+
+    def render(self) -> str:
+        '''Prometheus のテキスト形式で出力'''
+        lines: List[str] = []
+        with self._lock:
+            _render_histogram(
+                lines,
+                'orders_http_request_duration_seconds',
+                'Time spent handling HTTP requests.',
+                ('method', 'route', 'status'),
+                self.requests
+            )
+            lines.append('# HELP orders_sql_statements_total SQL statements executed per route.')
+            lines.append('# TYPE orders_sql_statements_total counter')
+            for (method, route), count in sorted(self.sql_statements.items()):
+                lines.append(
+                    f'orders_sql_statements_total{_labels(method=method, route=route)} {count}'
+                )
+            _render_histogram(
+                lines,
+                'orders_sql_duration_seconds',
+                'Time spent executing SQL statements per request.',
+                ('method', 'route'),
+                self.sql_seconds
+            )
+            _render_histogram(
+                lines,
+                'orders_downstream_duration_seconds',
+                'Time spent calling downstream services.',
+                ('service', 'outcome'),
+                self.downstream
+            )
+        _render_downstream_state(lines)
+        _render_cache_stats(lines)
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram(histograms: Dict[tuple, Histogram], key: tuple) -> Histogram:
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram()
+    return histogram
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    values = ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return '{' + values + '}'
+
+
+def _render_histogram(
+    lines: List[str],
+    name: str,
+    help_: str,
+    label_names: Tuple[str, ...],
+    histograms: Dict[tuple, Histogram]
+):
+    lines.append(f'# HELP {name} {help_}')
+    lines.append(f'# TYPE {name} histogram')
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key))
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+        lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def _render_downstream_state(lines: List[str]):
+    '''サーキットブレーカーとバルクヘッドの状態'''
+    from orders.clients.resilience import downstream_stats
+
+    stats = downstream_stats()
+    lines.append('# HELP orders_circuit_breaker_open Whether the circuit breaker is open (1) or half-open (0.5).')
+    lines.append('# TYPE orders_circuit_breaker_open gauge')
+    for service, values in sorted(stats.items()):
+        state = {'closed': 0, 'half_open': 0.5, 'open': 1}[values['state']]
+        lines.append(f'orders_circuit_breaker_open{_labels(service=service)} {state}')
+    lines.append('# HELP orders_downstream_rejected_total Calls rejected without reaching a downstream service.')
+    lines.append('# TYPE orders_downstream_rejected_total counter')
+    for service, values in sorted(stats.items()):
+        for reason, key in (('circuit_open', 'rejected'), ('bulkhead_full', 'bulkhead_rejected')):
+            lines.append(
+                f'orders_downstream_rejected_total{_labels(service=service, reason=reason)} '
+                f'{values[key]}'
+            )
+    lines.append('# HELP orders_downstream_in_flight Calls to a downstream service in progress.')
+    lines.append('# TYPE orders_downstream_in_flight gauge')
+    for service, values in sorted(stats.items()):
+        lines.append(
+            f'orders_downstream_in_flight{_labels(service=service)} {values["in_flight"]}'
+        )
+
+
+def _render_cache_stats(lines: List[str]):
+    '''注文のキャッシュのヒット・ミス・追い出しの回数'''
+    from orders.repository.cache import get_order_cache
+
+    cache = get_order_cache()
+    if cache is None:
+        return
+    lines.append('# HELP orders_cache_events_total Order cache hits, misses and evictions.')
+    lines.append('# TYPE orders_cache_events_total counter')
+    for event_, count in cache.stats.dict().items():
+        lines.append(f'orders_cache_events_total{_labels(event=event_)} {count}')
+
+
+registry = MetricsRegistry()
+_enabled = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        setattr(context, _QUERY_START_ATTR, time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    start = getattr(context, _QUERY_START_ATTR, None)
+    if timings is not None and start is not None:
+        elapsed = time.perf_counter() - start
+        timings.sql_count += 1
+        timings.sql_seconds += elapsed
+
+
+def enable():
+    '''計測を有効にする。すべてのエンジンで発行される SQL の時間を計測するようになる'''
+    global _enabled
+    if _enabled:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _enabled = True
+
+
+def start_request() -> Tuple[RequestTimings, object]:
+    '''リクエストの計測を開始し、RequestTimings と finish_request に渡すトークンを返す'''
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_downstream(service: str, outcome: str, seconds: float):
+    '''外部サービスの呼び出しにかかった時間を記録
+
+    リクエストの処理中であれば、そのリクエストの Server-Timing にも含める
+    '''
+    if not _enabled:
+        return
+    registry.observe_downstream(service, outcome, seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.downstream[service] = timings.downstream.get(service, 0.0) + seconds
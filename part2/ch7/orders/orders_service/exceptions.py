@@ -4,5 +4,15 @@ class OrderNotFoundError(Exception):
 class APIIntegrationError(Exception):
     pass
 
+class DownstreamUnavailableError(APIIntegrationError):
+    '''サーキットブレーカーが開いている、または同時実行数の上限に達しているため、
+    外部サービスを呼び出さずに失敗させたことを表すエラー
+
+    retry_after には、再試行までに待つべき秒数の目安を保持する
+    '''
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 class InvalidActionError(Exception):
-    pass
\ No newline at end of file
+    pass
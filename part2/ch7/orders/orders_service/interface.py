@@ -1,6 +1,6 @@
 
 from abc import ABC, abstractmethod
-from repository.interface import OrderRepositoryInterface
+from orders.repository.interface import OrderRepositoryInterface
 
 from orders.types import Item, OrderId
 from typing import List
@@ -20,6 +20,11 @@ class OrdersServiceInterface(ABC):
         '''注文を作成'''
         pass
 
+    @abstractmethod
+    def place_orders(self, orders: List[List[Item]]):
+        '''複数の注文をまとめて作成'''
+        pass
+
     @abstractmethod
     def get_order(self, order_id: OrderId):
         '''指定された order_id の注文の詳細を取得'''
@@ -35,11 +40,21 @@ class OrdersServiceInterface(ABC):
         '''注文をリストアップして出力'''
         pass
 
+    @abstractmethod
+    def stream_orders(self, **filters):
+        '''注文を1件ずつ取り出すイテレータを返す'''
+        pass
+
     @abstractmethod
     def pay_order(self, order_id: OrderId):
         '''指定された order_id の注文の支払いを実行'''
         pass
 
+    @abstractmethod
+    def delete_order(self, order_id: OrderId):
+        '''指定された order_id の注文を削除'''
+        pass
+
     @abstractmethod
     def cancel_order(self, order_id: OrderId):
         pass
@@ -1,18 +1,65 @@
-from repository.interface import OrderRepositoryInterface
-from exceptions import OrderNotFoundError
+from orders.repository.interface import (
+    AsyncOrderRepositoryInterface,
+    OrderRepositoryInterface
+)
+from orders.orders_service.exceptions import (
+    InvalidActionError,
+    OrderNotFoundError
+)
+from orders.repository.outbox_repository import (
+    AsyncOutboxRepository,
+    OutboxRepository
+)
 
-from typing import List
+from typing import AsyncIterator, Iterator, List, Optional
 from orders.types import Item, OrderId
 from orders.domain.order import Order
 
+# 支払いを処理するアウトボックスのメッセージの種類
+PAY_ORDER = 'pay_order'
+
+# failed のメッセージを登録し直せる、支払いかスケジューリングが済んでいない注文のステータス
+_RETRYABLE_STATUSES = frozenset({'created', 'paid'})
+
+def _check_payable(order: Order, message: Optional[dict] = None):
+    '''注文の支払いを受け付けられるかどうかを、登録済みのメッセージ (message) と合わせて確認
+
+    - メッセージがない: 作成されたばかりの注文のみ
+    - 再試行の上限に達した (failed): 支払いかスケジューリングが済んでいない注文のみ
+    - それ以外 (処理待ち・処理済み): キャンセルされていない注文のみ
+    '''
+    if message is None:
+        payable = order.status == 'created'
+    elif message['status'] == 'failed':
+        payable = order.status in _RETRYABLE_STATUSES
+    else:
+        payable = order.status != 'cancelled'
+    if not payable:
+        raise InvalidActionError(
+            f'Could not process payment for order with id {order.id}'
+        )
+
 class OrdersService:
-    def __init__(self, orders_repository: OrderRepositoryInterface):
+    def __init__(
+        self,
+        orders_repository: OrderRepositoryInterface,
+        outbox_repository: Optional[OutboxRepository] = None
+    ):
+        '''イニシャライザ
+        
+        pay_order を呼び出す場合は、注文リポジトリと同じセッションの outbox_repository を渡す
+        '''
         self.orders_repository = orders_repository
+        self.outbox_repository = outbox_repository
     
     def place_order(self, items: List[Item]) -> Order:
         '''データベースレコードを作成して注文を実行'''
         return self.orders_repository.add(items)
     
+    def place_orders(self, orders: List[List[Item]]) -> List[Order]:
+        '''複数の注文のデータベースレコードをまとめて作成'''
+        return self.orders_repository.add_many(orders)
+    
     def get_order(self, order_id: OrderId) -> Order:
         '''注文リポジトリにリクエストされたIDを渡して注文の詳細を取得'''
         order = self.orders_repository.get(order_id)
@@ -29,32 +76,49 @@ class OrdersService:
             raise OrderNotFoundError(
                 f'Order with id {order_id} not found.'
             )
-        return self.orders_repository.update(
-            order_id,
-            {'items': items}
-        )
+        return self.orders_repository.update(order_id, items=items)
     
     def list_orders(self, **filters) -> List[Order]:
         '''注文をリスト化して受け取り'''
         limit = filters.pop('limit', None)
         return self.orders_repository.list(limit, **filters)
+    
+    def stream_orders(self, **filters) -> Iterator[Order]:
+        '''注文を1件ずつ取り出すイテレータを受け取り'''
+        return self.orders_repository.stream(**filters)
         
     
     def pay_order(self, order_id: OrderId) -> Order:
-        '''指定されたIDの注文に対する支払い'''
+        '''指定されたIDの注文に対する支払いを受け付ける
+        
+        支払いサービス・厨房サービスの呼び出しはリクエストの中では行わず、
+        アウトボックスにメッセージを登録するだけにする。
+        実際の支払いとスケジューリングは OutboxDispatcher が後から行い、
+        注文のステータスを paid → progress と進める。
+        同じ注文に対して既に受け付けている場合は、注文がキャンセルされていなければ何もせずに注文を返す。
+        再試行の上限に達して failed になったメッセージは、処理待ちに戻して最初から再試行させる。
+        '''
         order = self.orders_repository.get(order_id)
         if order is None:
             raise OrderNotFoundError(
                 f'Order with id {order_id} not found'
             )
-        order.pay()
-        # 注文をスケジュールした後、 schedule_id を更新
-        schedule_id = order.schedule()
-        return self.orders_repository.update(
-            order_id,
-            status='progress',
-            schedule_id=schedule_id
-        )
+        message = self.outbox_repository.get_by_key(PAY_ORDER, order_id)
+        _check_payable(order, message)
+        if message is None:
+            self.outbox_repository.add(PAY_ORDER, order_id)
+        elif message['status'] == 'failed':
+            self.outbox_repository.requeue(message['id'])
+        return order
+
+    def delete_order(self, order_id: OrderId):
+        '''指定されたIDの注文を削除'''
+        order = self.orders_repository.get(order_id)
+        if order is None:
+            raise OrderNotFoundError(
+                f'Order with id {order_id} not found.'
+            )
+        self.orders_repository.delete(order_id)
 
     def cancel_order(self, order_id: OrderId) -> Order:
         order = self.orders_repository.get(order_id)
@@ -66,4 +130,74 @@ class OrdersService:
         return self.orders_repository.update(
             order_id,
             status="cancelled"
-        )
\ No newline at end of file
+        )
+
+
+class AsyncOrdersService:
+    '''OrdersService の非同期版
+    
+    リポジトリへの問い合わせは await し、厨房サービスや支払いサービスへの
+    非同期の HTTP クライアントを利用することで、イベントループをブロックしない。
+    '''
+    def __init__(
+        self,
+        orders_repository: AsyncOrderRepositoryInterface,
+        outbox_repository: Optional[AsyncOutboxRepository] = None
+    ):
+        self.orders_repository = orders_repository
+        self.outbox_repository = outbox_repository
+    
+    async def place_order(self, items: List[Item]) -> Order:
+        '''データベースレコードを作成して注文を実行'''
+        return await self.orders_repository.add(items)
+    
+    async def place_orders(self, orders: List[List[Item]]) -> List[Order]:
+        '''複数の注文のデータベースレコードをまとめて作成'''
+        return await self.orders_repository.add_many(orders)
+    
+    async def get_order(self, order_id: OrderId) -> Order:
+        '''注文リポジトリにリクエストされたIDを渡して注文の詳細を取得'''
+        order = await self.orders_repository.get(order_id)
+        if order is not None:
+            return order
+        raise OrderNotFoundError(
+            f'Order with id {order_id} not found'
+        )
+    
+    async def update_order(self, order_id: OrderId, items: List[Item]) -> Order:
+        '''指定されたIDの注文を更新'''
+        await self.get_order(order_id)
+        return await self.orders_repository.update(order_id, items=items)
+    
+    async def list_orders(self, **filters) -> List[Order]:
+        '''注文をリスト化して受け取り'''
+        limit = filters.pop('limit', None)
+        return await self.orders_repository.list(limit, **filters)
+    
+    def stream_orders(self, **filters) -> AsyncIterator[Order]:
+        '''注文を1件ずつ取り出す非同期イテレータを受け取り'''
+        return self.orders_repository.stream(**filters)
+    
+    async def pay_order(self, order_id: OrderId) -> Order:
+        '''OrdersService.pay_order の非同期版'''
+        order = await self.get_order(order_id)
+        message = await self.outbox_repository.get_by_key(PAY_ORDER, order_id)
+        _check_payable(order, message)
+        if message is None:
+            await self.outbox_repository.add(PAY_ORDER, order_id)
+        elif message['status'] == 'failed':
+            await self.outbox_repository.requeue(message['id'])
+        return order
+    
+    async def delete_order(self, order_id: OrderId):
+        '''指定されたIDの注文を削除'''
+        await self.get_order(order_id)
+        await self.orders_repository.delete(order_id)
+    
+    async def cancel_order(self, order_id: OrderId) -> Order:
+        order = await self.get_order(order_id)
+        await order.cancel_async()
+        return await self.orders_repository.update(
+            order_id,
+            status="cancelled"
+        )
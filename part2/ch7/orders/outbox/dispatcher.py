@@ -0,0 +1,221 @@
+'''アウトボックスに登録されたメッセージを処理するディスパッチャー
+
+POST /orders/{order_id}/pay はアウトボックスにメッセージを登録して 202 を返すだけなので、
+支払いサービス・厨房サービスの呼び出しはこのディスパッチャーが後から行う。
+
+pay_order のメッセージは、注文のステータスに応じて以下のように処理する。
+
+- created: 支払いサービスに支払いを依頼し、ステータスを paid にする
+- paid: 厨房サービスにスケジューリングを依頼し、ステータスを progress にする
+- それ以外 (キャンセルされた場合など): 何もせずに処理済みとする
+
+各ステップの後にステータスをコミットするため、途中で失敗しても再試行時には続きから処理される。
+外部サービスには冪等キーを送るため、応答を受け取る前に失敗して同じステップを再試行しても、
+二重に支払われたりスケジュールされたりしない。
+失敗した場合はジッター付きの指数バックオフで再試行し、上限に達したら failed とする。
+failed のメッセージは、同じ注文への支払いのリクエストを受け付けた際に処理待ちに戻される。
+サーキットブレーカーが開いていて呼び出せなかった場合は、試行回数に数えずに後で再試行する。
+
+外部サービスの呼び出し中はデータベースのセッションを開いたままにしないよう、
+読み込み・書き込みのたびに短い UnitOfWork を使う。
+
+API のプロセスの中で動かす場合は、web/app.py で run をバックグラウンドタスクとして起動する。
+別のワーカープロセスとして動かす場合は、ch7 のディレクトリで以下のように実行する。
+
+    python -m orders.outbox.dispatcher
+'''
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from config.env_config import EnvConfig
+from orders.clients.http import backoff_delay
+from orders.domain.order import Order
+from orders.orders_service.exceptions import DownstreamUnavailableError
+from orders.orders_service.orders_service import PAY_ORDER
+from orders.repository.cache import get_order_cache
+from orders.repository.orders_repository import OrdersRepository
+from orders.repository.outbox_repository import OutboxRepository
+from orders.repository.unit_of_work import UnitOfWork
+from orders.types import OrderId
+
+logger = logging.getLogger(__name__)
+
+# 処理中のメッセージを、他のディスパッチャーが取得しないようにしておく秒数
+LEASE_SECONDS = 60
+# 再試行までの待ち時間の上限の秒数
+MAX_BACKOFF_SECONDS = 300
+
+
+class OutboxDispatcher:
+
+    def __init__(
+        self,
+        session_maker: Optional[sessionmaker] = None,
+        batch_size: int = 100,
+        max_attempts: int = 10,
+        backoff_factor: float = 1.0
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[EnvConfig] = None) -> 'OutboxDispatcher':
+        config = config or EnvConfig()
+        return cls(
+            batch_size=config.outbox_batch_size,
+            max_attempts=config.outbox_max_attempts,
+            backoff_factor=config.outbox_backoff_factor
+        )
+
+    def dispatch_pending(self) -> int:
+        '''実行時刻を過ぎたメッセージを最大 batch_size 件処理し、処理した件数を返す'''
+        with UnitOfWork(self.session_maker) as unit_of_work:
+            message_ids = OutboxRepository(unit_of_work.session).due(
+                datetime.utcnow(), self.batch_size
+            )
+        return sum(self.dispatch(message_id) for message_id in message_ids)
+
+    def dispatch(self, message_id: str) -> bool:
+        '''メッセージを1件処理する。他のディスパッチャーが処理中の場合は False を返す'''
+        now = datetime.utcnow()
+        with UnitOfWork(self.session_maker) as unit_of_work:
+            outbox = OutboxRepository(unit_of_work.session)
+            if not outbox.claim(message_id, now, now + timedelta(seconds=LEASE_SECONDS)):
+                return False
+            message = outbox.get(message_id)
+            unit_of_work.commit()
+        try:
+            if message['kind'] == PAY_ORDER:
+                self._pay_order(message)
+            else:
+                raise ValueError(f"Unknown outbox message kind: {message['kind']}")
+        except Exception as error:
+            logger.warning('Outbox message %s failed: %r', message_id, error)
+            # サーキットブレーカーが開いている間は外部サービスを呼び出していないため、
+            # 試行回数に数えず、ブレーカーが半開になる頃に再試行する
+            unavailable = isinstance(error, DownstreamUnavailableError)
+            if unavailable:
+                delay = error.retry_after
+            else:
+                delay = backoff_delay(
+                    message['attempts'] + 1, self.backoff_factor, MAX_BACKOFF_SECONDS
+                )
+            with UnitOfWork(self.session_maker) as unit_of_work:
+                OutboxRepository(unit_of_work.session).retry_later(
+                    message_id,
+                    repr(error),
+                    datetime.utcnow() + timedelta(seconds=delay),
+                    self.max_attempts,
+                    count_attempt=not unavailable
+                )
+                unit_of_work.commit()
+            return True
+        with UnitOfWork(self.session_maker) as unit_of_work:
+            OutboxRepository(unit_of_work.session).mark_done(message_id)
+            unit_of_work.commit()
+        return True
+
+    def _pay_order(self, message: dict):
+        order_id = message['order_id']
+        key = message['idempotency_key']
+        order = self._get_order(order_id)
+        if order is None:
+            return
+        if order.status == 'created':
+            order.pay(idempotency_key=f'{key}:payment')
+            if not self._transition(order_id, 'created', status='paid'):
+                return
+            order = self._get_order(order_id)
+        if order.status == 'paid':
+            schedule_id = order.schedule(idempotency_key=f'{key}:schedule')
+            self._transition(
+                order_id, 'paid', status='progress', schedule_id=schedule_id
+            )
+
+    def _get_order(self, order_id: OrderId) -> Optional[Order]:
+        with UnitOfWork(self.session_maker) as unit_of_work:
+            return OrdersRepository(unit_of_work.session).get(order_id)
+
+    def _transition(self, order_id: OrderId, expected: str, **payload) -> bool:
+        '''注文のステータスが expected のままであれば payload の内容で更新
+
+        外部サービスを呼び出している間にキャンセルされた場合などは、更新せずに False を返す
+        '''
+        with UnitOfWork(self.session_maker) as unit_of_work:
+            repo = OrdersRepository(unit_of_work.session)
+            order = repo.get(order_id)
+            if order is None or order.status != expected:
+                return False
+            repo.update(order_id, **payload)
+            unit_of_work.commit()
+        cache = get_order_cache()
+        if cache is not None:
+            cache.delete(str(order_id))
+        return True
+
+    def notify(self):
+        '''新しいメッセージが登録されたことを知らせ、次の確認までの待ち時間を打ち切る
+
+        スレッドプールで動く同期のハンドラからも呼び出せるようにしている
+        '''
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self, interval: float = 1.0):
+        '''イベントループの中でメッセージを処理し続ける
+
+        データベースや外部サービスの呼び出しはブロッキングのため、スレッドで実行する
+        '''
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                processed = await asyncio.to_thread(self.dispatch_pending)
+            except Exception:
+                logger.exception('Failed to dispatch outbox messages')
+                processed = 0
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def run_forever(self, interval: float = 1.0, stop: Optional[threading.Event] = None):
+        '''別のワーカープロセスとして、メッセージを処理し続ける'''
+        while stop is None or not stop.is_set():
+            try:
+                processed = self.dispatch_pending()
+            except Exception:
+                logger.exception('Failed to dispatch outbox messages')
+                processed = 0
+            if not processed:
+                time.sleep(interval)
+
+
+_dispatcher: Optional[OutboxDispatcher] = None
+
+
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    '''プロセス内で共有する OutboxDispatcher を取得'''
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OutboxDispatcher.from_config()
+    return _dispatcher
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    get_outbox_dispatcher().run_forever(EnvConfig().outbox_poll_interval)
@@ -0,0 +1,269 @@
+'''注文データのキャッシュを定義するモジュール。
+
+注文は書き込みよりも読み込みの方がはるかに多いため、
+ID を指定した注文の取得結果 (OrderModel.dict() の内容) をキャッシュしておき、
+同じ注文の取得ではデータベースへの問い合わせを省略する。
+
+- LRUOrderCache: プロセス内で保持する、件数の上限と有効期限付きのキャッシュ
+- KeyValueOrderCache: Redis のようなキーバリューストアに保存するキャッシュ
+
+キーバリューストアには get, set (nx 付き), delete を持つクライアントを渡す。
+ローカルでの動作確認やベンチマーク向けに、同じ操作を持つ FakeKeyValueStore も用意している。
+Redis を利用する場合は、別途 redis パッケージをインストールしておく必要がある。
+
+キャッシュにない注文をデータベースから読み込んでいる間に、別のリクエストが注文を更新して
+キャッシュから取り除くと、読み込んだ古い内容でキャッシュを埋め直してしまう。
+これを防ぐため、delete ではキャッシュを消すだけでなく、tombstone_ttl 秒の間は tombstone を残し、
+set は値も tombstone もない場合にだけ格納する。
+tombstone_ttl は、データベースからの読み込みにかかる時間の最大値よりも長くする。
+'''
+
+import json
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+from config.env_config import EnvConfig
+
+
+class CacheStats:
+    '''キャッシュのヒット・ミス・追い出しの回数'''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class OrderCacheInterface(ABC):
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """
+        キャッシュされた注文データを取得する。
+
+        Args:
+            key (str): 注文の ID。
+
+        Returns:
+            Optional[dict]: 注文データ。キャッシュされていないか、有効期限が切れている場合は None。
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: dict):
+        """
+        注文データをキャッシュする。
+
+        有効な値か tombstone がすでにある場合は何もしない。
+
+        Args:
+            key (str): 注文の ID。
+            value (dict): 注文データ。
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        """
+        キャッシュから注文データを取り除き、tombstone を残す。
+
+        Args:
+            key (str): 注文の ID。
+        """
+        pass
+
+
+class LRUOrderCache(OrderCacheInterface):
+    '''プロセス内で保持するキャッシュ
+
+    maxsize 件を超えた場合は、最も長い間参照されていないものから追い出す。
+    ttl 秒を過ぎたものは、次に参照されたときに追い出す。
+    tombstone は注文データが None のエントリとして、同じように保持する。
+    '''
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, tombstone_ttl: float = 5):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.tombstone_ttl = tombstone_ttl
+        # キー → (有効期限, 注文データ)。末尾ほど最近参照されたものになる
+        self._entries: OrderedDict[str, Tuple[float, Optional[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def _put(self, key: str, expires: float, value: Optional[dict]):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def set(self, key: str, value: dict):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return
+            self._put(key, now + self.ttl, value)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._put(key, time.monotonic() + self.tombstone_ttl, None)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class KeyValueOrderCache(OrderCacheInterface):
+    '''Redis のようなキーバリューストアに保存するキャッシュ
+
+    複数のワーカープロセスで同じキャッシュを共有できる。
+    有効期限と追い出しはストア側に任せるため、evictions は数えない。
+    tombstone は空の値として保存し、set は SET NX で値も tombstone もない場合にだけ格納する。
+    '''
+
+    def __init__(
+        self,
+        client,
+        ttl: float = 60,
+        prefix: str = 'orders:',
+        tombstone_ttl: float = 5
+    ):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.tombstone_ttl = tombstone_ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        data = self.client.get(self.prefix + key)
+        if not data:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        value = json.loads(data)
+        value['created'] = datetime.fromisoformat(value['created'])
+        return value
+
+    def set(self, key: str, value: dict):
+        self.client.set(
+            self.prefix + key,
+            json.dumps(value, default=_default),
+            ex=max(1, int(self.ttl)),
+            nx=True
+        )
+
+    def delete(self, key: str):
+        self.client.set(self.prefix + key, b'', ex=max(1, math.ceil(self.tombstone_ttl)))
+
+
+class FakeKeyValueStore:
+    '''Redis クライアントの get, set (nx 付き), delete だけを真似た、プロセス内のストア'''
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name: str, value, ex: Optional[int] = None, nx: bool = False):
+        if isinstance(value, str):
+            value = value.encode()
+        now = time.monotonic()
+        expires = None if ex is None else now + ex
+        with self._lock:
+            if nx and name in self._data:
+                current_expires = self._data[name][0]
+                if current_expires is None or current_expires > now:
+                    return None
+            self._data[name] = (expires, value)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+
+@lru_cache
+def get_order_cache() -> Optional[OrderCacheInterface]:
+    '''EnvConfig の設定に応じたキャッシュを、プロセス内で一度だけ生成して返す
+
+    ORDERS_CACHE が未指定か none の場合はキャッシュを使わないため None を返す。
+    '''
+    config = EnvConfig()
+    backend = config.orders_cache
+    if backend == 'memory':
+        return LRUOrderCache(
+            maxsize=config.orders_cache_maxsize,
+            ttl=config.orders_cache_ttl,
+            tombstone_ttl=config.orders_cache_tombstone_ttl
+        )
+    if backend == 'fake':
+        return KeyValueOrderCache(
+            FakeKeyValueStore(),
+            ttl=config.orders_cache_ttl,
+            tombstone_ttl=config.orders_cache_tombstone_ttl
+        )
+    if backend == 'redis':
+        if redis is None:
+            raise RuntimeError('ORDERS_CACHE=redis requires the redis package')
+        return KeyValueOrderCache(
+            redis.Redis.from_url(config.redis_url),
+            ttl=config.orders_cache_ttl,
+            tombstone_ttl=config.orders_cache_tombstone_ttl
+        )
+    return None
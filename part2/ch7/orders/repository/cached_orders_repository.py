@@ -0,0 +1,196 @@
+'''キャッシュを挟んだ注文リポジトリ
+
+OrdersRepository をラップし、get の結果をキャッシュから返す (read-through)。
+update, delete の際はキャッシュから該当する注文を取り除く。
+pay や cancel も OrdersService の中で update を呼び出すため、同様に取り除かれる。
+
+書き込みをコミットするまでの間に、別のリクエストがコミット前の古いデータで
+キャッシュを埋め直す可能性があるため、コミットの直後にもう一度取り除く。
+取り除く際にはキャッシュに tombstone が残り、しばらくの間は格納が拒否されるため、
+取り除く前にデータベースから読み込まれた古いデータが、後から格納されることもない。
+また、同じセッションの中で書き込みを行った注文は、コミット前の内容をキャッシュしないよう、
+そのセッションではキャッシュを使わずに取得する。
+
+read_through=False の場合は get でもキャッシュを使わずにデータベースから読み込み、
+update, delete の際にキャッシュから取り除くことだけを行う。
+キャッシュは他のプロセスでの更新を反映していない可能性があるため、
+キャンセルや支払いのように、取得したステータスを元に書き込む処理ではこちらを使う。
+
+レプリカに接続したセッションで取得した注文は、書き込みが反映される前の古い内容の可能性があるため、
+キャッシュから返すことはあっても、キャッシュには格納しない。
+プライマリでの書き込みが取り除いたキャッシュを、レプリカの古い内容で埋め直さないようにするためである。
+'''
+
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from orders.domain.order import Order
+from orders.repository.cache import OrderCacheInterface
+from orders.repository.engine import REPLICA_INFO_KEY
+from orders.repository.interface import (
+    AsyncOrderRepositoryInterface,
+    OrderRepositoryInterface
+)
+from orders.repository.orders_repository import (
+    AsyncOrdersRepository,
+    OrdersRepository
+)
+from orders.types import Item, ItemsLoadStrategy, OrderId
+
+# 書き込みを行った注文の ID を、Session.info に保持する際のキー
+_PENDING_KEY = 'orders_cache_pending'
+
+
+def _pending(session: Session, cache: OrderCacheInterface) -> Set[str]:
+    '''セッションの中で書き込みを行い、コミット後にキャッシュから取り除く注文の ID'''
+    pending = session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_KEY] = set()
+
+        @event.listens_for(session, 'after_commit')
+        def invalidate(session):
+            for key in pending:
+                cache.delete(key)
+            pending.clear()
+
+        @event.listens_for(session, 'after_rollback')
+        def discard(session):
+            pending.clear()
+    return pending
+
+
+class CachedOrdersRepository(OrderRepositoryInterface):
+
+    def __init__(
+        self,
+        repository: OrdersRepository,
+        cache: OrderCacheInterface,
+        read_through: bool = True
+    ):
+        self.repository = repository
+        self.cache = cache
+        self.read_through = read_through
+        self.session = repository.session
+
+    def add(self, items: List[Item]) -> Order:
+        return self.repository.add(items)
+
+    def add_many(self, orders: List[List[Item]]) -> List[Order]:
+        return self.repository.add_many(orders)
+
+    def get(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> Optional[Order]:
+        key = str(id_)
+        if not self.read_through or key in _pending(self.session, self.cache):
+            return self.repository.get(id_, load_items)
+        record = self.cache.get(key)
+        if record is None:
+            order = self.repository.get_record(id_, load_items)
+            if order is None:
+                return None
+            record = order.dict()
+            if not self.session.info.get(REPLICA_INFO_KEY):
+                self.cache.set(key, record)
+        return Order(**record)
+
+    def list(
+        self,
+        limit: Optional[int],
+        load_items: ItemsLoadStrategy = 'selectin',
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters
+    ) -> List[Order]:
+        return self.repository.list(limit, load_items, after, **filters)
+
+    def stream(self, batch_size: int = 1000, **filters) -> Iterator[Order]:
+        return self.repository.stream(batch_size, **filters)
+
+    def _invalidate(self, id_: OrderId):
+        key = str(id_)
+        self.cache.delete(key)
+        _pending(self.session, self.cache).add(key)
+
+    def update(self, id_: OrderId, **payload) -> Order:
+        self._invalidate(id_)
+        return self.repository.update(id_, **payload)
+
+    def delete(self, id_: OrderId):
+        self._invalidate(id_)
+        self.repository.delete(id_)
+
+
+class AsyncCachedOrdersRepository(AsyncOrderRepositoryInterface):
+    '''CachedOrdersRepository の非同期版
+
+    コミット後の取り除きは、AsyncSession が内部に持つ同期の Session に登録する。
+    '''
+
+    def __init__(
+        self,
+        repository: AsyncOrdersRepository,
+        cache: OrderCacheInterface,
+        read_through: bool = True
+    ):
+        self.repository = repository
+        self.cache = cache
+        self.read_through = read_through
+        self.session = repository.session
+
+    async def add(self, items: List[Item]) -> Order:
+        return await self.repository.add(items)
+
+    async def add_many(self, orders: List[List[Item]]) -> List[Order]:
+        return await self.repository.add_many(orders)
+
+    async def get(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> Optional[Order]:
+        key = str(id_)
+        if not self.read_through or key in _pending(self.session.sync_session, self.cache):
+            return await self.repository.get(id_, load_items)
+        record = self.cache.get(key)
+        if record is None:
+            order = await self.repository.get_record(id_, load_items)
+            if order is None:
+                return None
+            record = order.dict()
+            if not self.session.info.get(REPLICA_INFO_KEY):
+                self.cache.set(key, record)
+        return Order(**record)
+
+    async def list(
+        self,
+        limit: Optional[int],
+        load_items: ItemsLoadStrategy = 'selectin',
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters
+    ) -> List[Order]:
+        return await self.repository.list(limit, load_items, after, **filters)
+
+    def stream(
+        self,
+        batch_size: int = 1000,
+        **filters
+    ) -> AsyncIterator[Order]:
+        return self.repository.stream(batch_size, **filters)
+
+    def _invalidate(self, id_: OrderId):
+        key = str(id_)
+        self.cache.delete(key)
+        _pending(self.session.sync_session, self.cache).add(key)
+
+    async def update(self, id_: OrderId, **payload) -> Order:
+        self._invalidate(id_)
+        return await self.repository.update(id_, **payload)
+
+    async def delete(self, id_: OrderId):
+        self._invalidate(id_)
+        await self.repository.delete(id_)
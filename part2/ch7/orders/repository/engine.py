@@ -0,0 +1,248 @@
+'''データベースエンジンと sessionmaker のレジストリを定義するモジュール。
+
+create_engine はダイアレクトの初期化やコネクションプールの構築を伴うため、
+リクエストのたびに呼び出すと、その度に接続の確立からやり直すことになる。
+そこで、接続先 URL ごとにエンジンと sessionmaker をプロセス内で一度だけ生成し、
+以降はそれを使い回すことで、プール済みの接続を再利用できるようにする。
+
+非同期のスタック (AsyncUnitOfWork) 向けには、SQLAlchemy の asyncio 拡張を使った
+AsyncEngine と async_sessionmaker を同様に管理する。
+
+接続先が SQLite の場合は、EnvConfig.sqlite_pragmas の PRAGMA を接続ごとに設定する
+(SQLITE_PROFILE を指定しない場合は何も設定しない)。
+
+読み込み専用のレプリカが設定されている場合は、レプリカに接続する sessionmaker も同様に管理し、
+複数のレプリカにはラウンドロビンで振り分ける。
+'''
+
+import itertools
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    async_sessionmaker,
+    create_async_engine
+)
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config.env_config import EnvConfig
+
+_engines: Dict[str, Engine] = {}
+_session_makers: Dict[str, sessionmaker] = {}
+_async_engines: Dict[str, AsyncEngine] = {}
+_async_session_makers: Dict[str, async_sessionmaker] = {}
+_replica_session_makers: Dict[str, sessionmaker] = {}
+_async_replica_session_makers: Dict[str, async_sessionmaker] = {}
+# CPython では itertools.count の next はスレッドセーフ
+_replica_counter = itertools.count()
+_lock = threading.Lock()
+_config: Optional[EnvConfig] = None
+
+
+def _get_config() -> EnvConfig:
+    '''EnvConfig を一度だけ生成して使い回す'''
+    global _config
+    if _config is None:
+        _config = EnvConfig()
+    return _config
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    url_ = make_url(url)
+    return (
+        url_.get_backend_name() == 'sqlite'
+        and url_.database in (None, '', ':memory:')
+    )
+
+
+def _engine_options(url: str) -> dict:
+    '''EnvConfig の値から create_engine に渡すプール設定を組み立てる'''
+    config = _get_config()
+    options = {
+        'pool_recycle': config.db_pool_recycle,
+        'pool_pre_ping': config.db_pool_pre_ping,
+    }
+    # インメモリの sqlite ではスレッドごとに単一の接続を保持するプールが使われるため、
+    # pool_size, max_overflow といったキュー型のプールの設定は渡さない
+    if not _is_sqlite_memory(url):
+        options['pool_size'] = config.db_pool_size
+        options['max_overflow'] = config.db_max_overflow
+    return options
+
+
+def _set_sqlite_pragmas(engine: Engine, url: str) -> None:
+    '''SQLite の接続が作られるたびに PRAGMA を設定するイベントを登録
+
+    PRAGMA は接続ごとの設定のため、プールが新しく接続を作るたびに設定する必要がある。
+    journal_mode=WAL のようにデータベースファイルに記録されるものも、同じ方法でまとめて設定する
+    '''
+    if make_url(url).get_backend_name() != 'sqlite':
+        return
+    pragmas = _get_config().sqlite_pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def get_engine(url: Optional[str] = None) -> Engine:
+    '''接続先 URL に対応するエンジンを取得
+
+    初回の呼び出し時にのみエンジンを生成し、以降は同じインスタンスを返す。
+    url を省略した場合は EnvConfig の database_url が使われる。
+    '''
+    url = url or _get_config().database_url
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _lock:
+        # ロックの取得待ちの間に、別スレッドで生成済みになっている可能性がある
+        engine = _engines.get(url)
+        if engine is None:
+            engine = create_engine(url, **_engine_options(url))
+            _set_sqlite_pragmas(engine, url)
+            _engines[url] = engine
+    return engine
+
+
+def get_session_maker(url: Optional[str] = None) -> sessionmaker:
+    '''接続先 URL に対応する sessionmaker を取得'''
+    url = url or _get_config().database_url
+    session_maker = _session_makers.get(url)
+    if session_maker is not None:
+        return session_maker
+    engine = get_engine(url)
+    with _lock:
+        session_maker = _session_makers.get(url)
+        if session_maker is None:
+            session_maker = sessionmaker(bind=engine)
+            _session_makers[url] = session_maker
+    return session_maker
+
+
+def get_async_engine(url: Optional[str] = None) -> AsyncEngine:
+    '''接続先 URL に対応する非同期エンジンを取得
+
+    url を省略した場合は EnvConfig の async_database_url が使われる。
+    '''
+    url = url or _get_config().async_database_url
+    engine = _async_engines.get(url)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _async_engines.get(url)
+        if engine is None:
+            options = _engine_options(url)
+            # aiosqlite のファイルデータベースでも接続を使い回せるよう、
+            # キュー型のプールを明示的に指定する
+            if 'pool_size' in options:
+                options['poolclass'] = AsyncAdaptedQueuePool
+            engine = create_async_engine(url, **options)
+            # 非同期エンジンのイベントは、内部の同期エンジンに登録する
+            _set_sqlite_pragmas(engine.sync_engine, url)
+            _async_engines[url] = engine
+    return engine
+
+
+def get_async_session_maker(url: Optional[str] = None) -> async_sessionmaker:
+    '''接続先 URL に対応する async_sessionmaker を取得
+
+    非同期のセッションでは属性の遅延読み込みができないため、
+    コミット後に属性を失効させない (expire_on_commit=False) ようにしている。
+    '''
+    url = url or _get_config().async_database_url
+    session_maker = _async_session_makers.get(url)
+    if session_maker is not None:
+        return session_maker
+    engine = get_async_engine(url)
+    with _lock:
+        session_maker = _async_session_makers.get(url)
+        if session_maker is None:
+            session_maker = async_sessionmaker(
+                bind=engine, expire_on_commit=False
+            )
+            _async_session_makers[url] = session_maker
+    return session_maker
+
+
+# レプリカに接続するセッションの Session.info に True で設定されるキー
+REPLICA_INFO_KEY = 'orders_replica'
+
+
+def _next_replica(urls: List[str]) -> str:
+    '''レプリカの URL をラウンドロビンで選ぶ'''
+    return urls[next(_replica_counter) % len(urls)]
+
+
+def get_replica_session_maker() -> sessionmaker:
+    '''読み込み専用のセッションを作る sessionmaker を取得
+
+    レプリカが設定されていない場合は、プライマリの sessionmaker を返す。
+    レプリカの URL がプライマリと同じ場合でも区別できるよう、レジストリは別に持つ。
+    '''
+    urls = _get_config().database_replica_urls
+    if not urls:
+        return get_session_maker()
+    url = _next_replica(urls)
+    session_maker = _replica_session_makers.get(url)
+    if session_maker is not None:
+        return session_maker
+    engine = get_engine(url)
+    with _lock:
+        session_maker = _replica_session_makers.get(url)
+        if session_maker is None:
+            session_maker = sessionmaker(bind=engine, info={REPLICA_INFO_KEY: True})
+            _replica_session_makers[url] = session_maker
+    return session_maker
+
+
+def get_async_replica_session_maker() -> async_sessionmaker:
+    '''get_replica_session_maker の非同期版'''
+    urls = _get_config().async_database_replica_urls
+    if not urls:
+        return get_async_session_maker()
+    url = _next_replica(urls)
+    session_maker = _async_replica_session_makers.get(url)
+    if session_maker is not None:
+        return session_maker
+    engine = get_async_engine(url)
+    with _lock:
+        session_maker = _async_replica_session_makers.get(url)
+        if session_maker is None:
+            session_maker = async_sessionmaker(
+                bind=engine, expire_on_commit=False, info={REPLICA_INFO_KEY: True}
+            )
+            _async_replica_session_makers[url] = session_maker
+    return session_maker
+
+
+def dispose_engines() -> None:
+    '''生成済みのエンジンを破棄し、レジストリを空にする
+
+    gunicorn などでワーカープロセスを fork した後や、
+    接続先を切り替えたい場合に呼び出す。
+    非同期エンジンはイベントループの外から await で破棄できないため、
+    接続を閉じずにプールだけを切り離す。
+    '''
+    global _config
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        for async_engine in _async_engines.values():
+            async_engine.sync_engine.dispose(close=False)
+        _engines.clear()
+        _session_makers.clear()
+        _async_engines.clear()
+        _async_session_makers.clear()
+        _replica_session_makers.clear()
+        _async_replica_session_makers.clear()
+        _config = None
@@ -0,0 +1,46 @@
+'''SQL の発行回数を計測するためのフック
+
+SQLAlchemy の before_cursor_execute イベントを利用し、
+エンジンを通じて実際にデータベースへ送られた SQL 文を記録する。
+N+1 問題のように、ループの中で想定外の SQL が発行されていないかを確認する用途を想定している。
+'''
+
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class QueryCounter:
+    '''計測期間中に発行された SQL 文を保持する'''
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine | AsyncEngine) -> Iterator[QueryCounter]:
+    '''with ブロックの中で engine から発行された SQL 文を数える
+
+    使い方:
+        with count_queries(get_engine()) as counter:
+            repo.list(limit=None)
+        print(counter.count)
+    '''
+    # AsyncEngine の場合、イベントは内部の同期エンジンに登録する
+    engine = getattr(engine, 'sync_engine', engine)
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
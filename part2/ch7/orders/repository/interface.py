@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
 from orders.domain.order import Order
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from orders.types import Item, OrderId
+from orders.types import Item, ItemsLoadStrategy, OrderId
 
 class OrderRepositoryInterface(ABC):
     """OrderRepositoryクラスのインターフェイス
@@ -37,11 +39,28 @@ class OrderRepositoryInterface(ABC):
         pass
 
     @abstractmethod
-    def get(self, id_: OrderId) -> Optional[Order]:
+    def add_many(self, orders: List[List[Item]]) -> List[Order]:
+        """複数の注文をまとめてデータベースに追加し、Order オブジェクトのリストを返します。
+
+        Args:
+            orders (List[List[Item]]): 注文ごとの注文アイテムのリスト。
+
+        Returns:
+            List[Order]: 追加された注文データ。orders と同じ順に並びます。
+        """
+        pass
+
+    @abstractmethod
+    def get(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> Optional[Order]:
         """指定されたIDの注文データを取得します。
 
         Args:
             id_ (OrderId): 注文のID。
+            load_items (ItemsLoadStrategy): 注文アイテムの読み込み方法。
 
         Returns:
             Optional[Order]: 注文データの Order オブジェクト。存在しない場合は None。
@@ -49,11 +68,23 @@ class OrderRepositoryInterface(ABC):
         pass
 
     @abstractmethod
-    def list(self, limit: Optional[int], **filters) -> List[Order]:
+    def list(
+        self,
+        limit: Optional[int],
+        load_items: ItemsLoadStrategy = 'selectin',
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters
+    ) -> List[Order]:
         """指定された条件で注文データのリストを取得します。
 
+        注文は (created, id) の昇順で並べて返します。
+
         Args:
             limit (int, optional): 取得する注文の最大数。
+            load_items (ItemsLoadStrategy): 注文アイテムの読み込み方法。
+                既定の selectin では、注文ごとにアイテムを取得する SQL は発行されない。
+            after (Tuple[datetime, str], optional): 前のページの最後の注文の (created, id)。
+                指定した場合、それより後ろの注文のみを返す。
             **filters: 注文データをフィルタリングするための追加キーワード引数。
 
         Returns:
@@ -61,6 +92,22 @@ class OrderRepositoryInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def stream(self, batch_size: int = 1000, **filters) -> Iterator[Order]:
+        """指定された条件の注文データを1件ずつ取り出すイテレータを返します。
+
+        list と異なり全件をメモリに載せず、batch_size 件ずつデータベースから取得します。
+        注文は (created, id) の昇順で返します。
+
+        Args:
+            batch_size (int): 1度にデータベースから取得する注文の数。
+            **filters: 注文データをフィルタリングするための追加キーワード引数。
+
+        Returns:
+            Iterator[Order]: 条件に一致する注文データのイテレータ。
+        """
+        pass
+
     @abstractmethod
     def update(self, id_: OrderId, **payload) -> Order:
         """指定されたIDの注文データを更新します。
@@ -82,3 +129,125 @@ class OrderRepositoryInterface(ABC):
             id_ (OrderId): 削除する注文のID。
         """
         pass
+
+
+class AsyncOrderRepositoryInterface(ABC):
+    """OrderRepositoryInterface の非同期版
+
+    AsyncUnitOfWork と組み合わせて利用するリポジトリの設計の基礎です。
+    各メソッドの役割は OrderRepositoryInterface と同じですが、
+    データベースへの問い合わせを伴うメソッドはコルーチンとして定義します。
+
+    Attributes:
+        session (AsyncSession): SQLAlchemy の AsyncSession インスタンス。
+    """
+
+    @abstractmethod
+    def __init__(self, session: AsyncSession):
+        """コンストラクタ
+
+        Args:
+            session (AsyncSession): SQLAlchemy の非同期セッション。
+        """
+        pass
+
+    @abstractmethod
+    async def add(self, items: List[Item]) -> Order:
+        """注文アイテムをデータベースに追加し、Order オブジェクトを返します。
+
+        Args:
+            items (List[Item]): 注文アイテムのリスト。
+
+        Returns:
+            Order: 追加された注文データ。
+        """
+        pass
+
+    @abstractmethod
+    async def add_many(self, orders: List[List[Item]]) -> List[Order]:
+        """複数の注文をまとめてデータベースに追加し、Order オブジェクトのリストを返します。
+
+        Args:
+            orders (List[List[Item]]): 注文ごとの注文アイテムのリスト。
+
+        Returns:
+            List[Order]: 追加された注文データ。orders と同じ順に並びます。
+        """
+        pass
+
+    @abstractmethod
+    async def get(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> Optional[Order]:
+        """指定されたIDの注文データを取得します。
+
+        Args:
+            id_ (OrderId): 注文のID。
+            load_items (ItemsLoadStrategy): 注文アイテムの読み込み方法。
+
+        Returns:
+            Optional[Order]: 注文データの Order オブジェクト。存在しない場合は None。
+        """
+        pass
+
+    @abstractmethod
+    async def list(
+        self,
+        limit: Optional[int],
+        load_items: ItemsLoadStrategy = 'selectin',
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters
+    ) -> List[Order]:
+        """指定された条件で注文データのリストを取得します。
+
+        注文は (created, id) の昇順で並べて返します。
+
+        Args:
+            limit (int, optional): 取得する注文の最大数。
+            load_items (ItemsLoadStrategy): 注文アイテムの読み込み方法。
+                既定の selectin では、注文ごとにアイテムを取得する SQL は発行されない。
+            after (Tuple[datetime, str], optional): 前のページの最後の注文の (created, id)。
+                指定した場合、それより後ろの注文のみを返す。
+            **filters: 注文データをフィルタリングするための追加キーワード引数。
+
+        Returns:
+            List[Order]: 条件に一致する注文データのリスト。
+        """
+        pass
+
+    @abstractmethod
+    def stream(self, batch_size: int = 1000, **filters) -> AsyncIterator[Order]:
+        """指定された条件の注文データを1件ずつ取り出す非同期イテレータを返します。
+
+        Args:
+            batch_size (int): 1度にデータベースから取得する注文の数。
+            **filters: 注文データをフィルタリングするための追加キーワード引数。
+
+        Returns:
+            AsyncIterator[Order]: 条件に一致する注文データの非同期イテレータ。
+        """
+        pass
+
+    @abstractmethod
+    async def update(self, id_: OrderId, **payload) -> Order:
+        """指定されたIDの注文データを更新します。
+
+        Args:
+            id_ (OrderId): 更新する注文のID。
+            **payload: 更新するデータのキーワード引数。
+
+        Returns:
+            Order: 更新された注文データ。
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, id_: OrderId):
+        """指定されたIDの注文データを削除します。
+
+        Args:
+            id_ (OrderId): 削除する注文のID。
+        """
+        pass
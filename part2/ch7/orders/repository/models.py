@@ -1,24 +1,28 @@
-import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
+from orders.repository.column_types import BinaryUUID
+from orders.repository.ids import get_id_generator
+
 # 宣言的なベースモデルを作成
 Base = declarative_base()
 
-# モデルのランダムなUUIDを作成するカスタム関数
+# モデルのUUIDを作成するカスタム関数
+# 生成方法 (ランダムな uuid4 か時刻順の uuid7 か) は ORDER_ID_GENERATOR で切り替える
 def generate_uuid():
-    return str(uuid.uuid4())
+    return get_id_generator()()
 
 class OrderModel(Base):
     # このモデルにマッピングするテーブルの名前
     __tablename__ = 'order'
     
     # 各クラスプロパティは Column クラスを使ってデータベースの列にマッピングされる
+    # ID は 16 バイトのバイナリとして保存し、アプリケーション側では文字列として扱う
     id = Column(
-        String,
+        BinaryUUID,
         primary_key=True,
         default=generate_uuid
     )
@@ -29,6 +33,13 @@ class OrderModel(Base):
     schedule_id = Column(String)
     delivery_id = Column(String)
     
+    # 注文一覧のキーセットページネーションで利用する (created, id) の複合インデックスと、
+    # ステータスで絞り込んだ上で同じ順に並べる際に利用する (status, created, id) の複合インデックス
+    __table_args__ = (
+        Index('ix_order_created_id', 'created', 'id'),
+        Index('ix_order_status_created_id', 'status', 'created', 'id'),
+    )
+    
     # オブジェクトを Python ディクショナリとしてレンダリングするカスタムメソッド
     def dict(self):
         return {
@@ -43,13 +54,15 @@ class OrderModel(Base):
 class OrderItemModel(Base):
     __tablename__ = 'order_item'
     id = Column(
-        String,
+        BinaryUUID,
         primary_key=True,
         default=generate_uuid
     )
+    # order.id と同じ型にし、注文ごとのアイテムの読み込みのためにインデックスを付ける
     order_id = Column(
-        Integer,
-        ForeignKey('order.id')
+        BinaryUUID,
+        ForeignKey('order.id'),
+        index=True
     )
     product = Column(String, nullable=False)
     size = Column(String, nullable=False)
@@ -61,4 +74,49 @@ class OrderItemModel(Base):
             'product': self.product,
             'size': self.size,
             'quantity': self.quantity
-        }
\ No newline at end of file
+        }
+
+
+class OutboxMessageModel(Base):
+    '''支払いサービスや厨房サービスへ送る処理を記録するアウトボックス
+
+    注文の更新と同じトランザクションで書き込むことで、
+    リクエストの中では外部サービスを呼び出さずに、処理を確実に後から実行できる。
+    '''
+    __tablename__ = 'outbox'
+    id = Column(
+        String,
+        primary_key=True,
+        default=generate_uuid
+    )
+    order_id = Column(String, nullable=False, index=True)
+    # 処理の種類 (現時点では pay_order のみ)
+    kind = Column(String, nullable=False)
+    # 同じ注文に対して同じ処理を二重に登録しないためのキー
+    # 外部サービスへの冪等キーもこの値から作る
+    idempotency_key = Column(String, nullable=False, unique=True)
+    # pending: 未処理, done: 処理済み, failed: 再試行の上限に達した
+    status = Column(String, nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # ディスパッチャーが処理中の間は、この時刻まで他のディスパッチャーが取得しない
+    locked_until = Column(DateTime)
+    last_error = Column(String)
+    created = Column(DateTime, default=datetime.utcnow)
+    
+    # 処理待ちのメッセージを、次の実行時刻の順に取り出す際に利用する
+    __table_args__ = (
+        Index('ix_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    def dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'kind': self.kind,
+            'idempotency_key': self.idempotency_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at,
+            'last_error': self.last_error,
+        }
@@ -1,14 +1,169 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, lazyload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, Iterator, Optional, Tuple
 
 from orders.domain.order import Order
-from orders.repository.models import OrderModel, OrderItemModel
-from orders.repository.interface import OrderRepositoryInterface
+from orders.repository.models import OrderModel, OrderItemModel, generate_uuid
+from orders.repository.interface import (
+    AsyncOrderRepositoryInterface,
+    OrderRepositoryInterface
+)
 
-from orders.types import Item, OrderId
+from orders.types import Item, ItemsLoadStrategy, OrderId
 from typing import List
 
+def _items_loader(load_items: ItemsLoadStrategy):
+    '''load_items に対応する、OrderModel.items の読み込みオプションを返す'''
+    if load_items == 'selectin':
+        return selectinload(OrderModel.items)
+    if load_items == 'joined':
+        return joinedload(OrderModel.items)
+    if load_items == 'lazy':
+        return lazyload(OrderModel.items)
+    raise ValueError(f'Unknown load_items strategy: {load_items}')
+
+def _bulk_rows(orders: List[List[Item]]):
+    '''add_many で INSERT する order, order_item の行を組み立てる
+
+    ID や created といったデフォルト値をデータベース側に任せると、行ごとに INSERT して
+    値を読み戻す必要があるため、Python 側で値を決めておく
+    '''
+    order_rows, item_rows = [], []
+    created = datetime.utcnow()
+    for items in orders:
+        order_id = generate_uuid()
+        order_rows.append({
+            'id': order_id,
+            'status': 'created',
+            'created': created,
+        })
+        item_rows.extend(
+            {**item, 'id': generate_uuid(), 'order_id': order_id}
+            for item in items
+        )
+    return order_rows, item_rows
+
+def _bulk_orders(order_rows, item_rows) -> List[Order]:
+    '''INSERT した行から Order オブジェクトを組み立てる'''
+    items_by_order = {row['id']: [] for row in order_rows}
+    for row in item_rows:
+        item = dict(row)
+        items_by_order[item.pop('order_id')].append(item)
+    return [
+        Order(**row, items=items_by_order[row['id']])
+        for row in order_rows
+    ]
+
+# stream で ORM オブジェクトを作らずに読み込む列
+# Order.from_record, OrderItem.from_record が参照する名前と一致させる
+_ORDER_COLUMNS = (
+    OrderModel.id,
+    OrderModel.status,
+    OrderModel.created,
+    OrderModel.schedule_id,
+    OrderModel.delivery_id,
+)
+_ITEM_COLUMNS = (
+    OrderItemModel.id,
+    OrderItemModel.order_id,
+    OrderItemModel.product,
+    OrderItemModel.size,
+    OrderItemModel.quantity,
+)
+
+def _stream_statement(batch_size: int, filters):
+    '''stream で注文の行を (created, id) の順に batch_size 件ずつ取り出す SELECT 文'''
+    statement = select(*_ORDER_COLUMNS)
+    if 'cancelled' in filters:
+        cancelled = filters.pop('cancelled')
+        if cancelled:
+            statement = statement.where(OrderModel.status == 'cancelled')
+        else:
+            statement = statement.where(OrderModel.status != 'cancelled')
+    return (
+        statement.filter_by(**filters)
+            .order_by(OrderModel.created, OrderModel.id)
+            .execution_options(yield_per=batch_size)
+    )
+
+def _items_statement(order_rows):
+    '''order_rows の注文に含まれるアイテムの行をまとめて取り出す SELECT 文'''
+    return select(*_ITEM_COLUMNS).where(
+        OrderItemModel.order_id.in_([row.id for row in order_rows])
+    )
+
+def _rows_to_orders(order_rows, item_rows) -> List[Order]:
+    '''注文とアイテムの行から Order オブジェクトを組み立てる'''
+    items_by_order = {row.id: [] for row in order_rows}
+    for row in item_rows:
+        items_by_order[row.order_id].append(row)
+    return [
+        Order.from_record(row, items_by_order[row.id])
+        for row in order_rows
+    ]
+
+# アイテムの更新で比較する列
+_ITEM_FIELDS = ('product', 'size', 'quantity')
+
+def _diff_items(session, record: OrderModel, items: List[Item]):
+    '''record のアイテムを items の内容に合わせ、不要になったアイテムを削除する DELETE 文を返す
+
+    items のうち id を持つものは同じ ID のアイテムに、持たないものは残りのアイテムに先頭から順に対応させる。
+    対応するアイテムは値が変わった列だけを更新し (UPDATE)、対応するものがなければ追加する (INSERT)。
+    余ったアイテムは ORM で1件ずつ削除せず、返した DELETE 文でまとめて削除する。
+    削除するアイテムがない場合は None を返す。
+    '''
+    remaining = {model.id: model for model in record.items}
+    matched = {
+        index: remaining.pop(item['id'])
+        for index, item in enumerate(items)
+        if item.get('id') in remaining
+    }
+    unmatched = iter(list(remaining.values()))
+    models = []
+    for index, item in enumerate(items):
+        model = matched.get(index) or next(unmatched, None)
+        if model is None:
+            model = OrderItemModel(
+                order_id=record.id,
+                **{field: item[field] for field in _ITEM_FIELDS}
+            )
+            session.add(model)
+        else:
+            for field in _ITEM_FIELDS:
+                if getattr(model, field) != item[field]:
+                    setattr(model, field, item[field])
+        models.append(model)
+    removed = list(unmatched)
+    # コレクションの変更として扱うと、削除したアイテムの order_id を NULL にする UPDATE が
+    # 1件ずつ発行されるため、読み込み済みの値として置き換える
+    set_committed_value(record, 'items', models)
+    if not removed:
+        return None
+    for model in removed:
+        session.expunge(model)
+    return (
+        delete(OrderItemModel)
+            .where(OrderItemModel.id.in_([model.id for model in removed]))
+            .execution_options(synchronize_session=False)
+    )
+
+def _after(after: Tuple[datetime, str]):
+    '''(created, id) の並びで after より後ろにある注文を絞り込む条件
+
+    OFFSET と異なり読み飛ばす行を数える必要がないため、
+    ix_order_created_id インデックスを使って何ページ目でも一定の時間で取得できる。
+    created > x OR (created = x AND id > y) の形ではインデックスを走査してしまうため、
+    行値の比較 (created, id) > (x, y) を使う
+    '''
+    created, id_ = after
+    # 右辺をタプルで渡すと、各値は対応する列の型 (id は BinaryUUID) でバインドされる
+    return tuple_(OrderModel.created, OrderModel.id) > (created, str(id_))
+
 class OrdersRepository(OrderRepositoryInterface):
     
     def __init__(self, session: Session):
@@ -23,35 +178,62 @@ class OrdersRepository(OrderRepositoryInterface):
         # セッションオブジェクトにレコードを追加
         self.session.add(record)
         # Order クラスのインスタンスを返す
-        return Order(**record.dict(), order_=record)
+        return Order.from_record(record, order_=record)
+    
+    def add_many(self, orders: List[List[Item]]) -> List[Order]:
+        '''複数の注文をまとめてデータベースに保存する
+        
+        ORM オブジェクトを1件ずつ add するのではなく、order と order_item それぞれに
+        1つの INSERT 文を複数行分まとめて実行する (insertmanyvalues / executemany)。
+        '''
+        order_rows, item_rows = _bulk_rows(orders)
+        if order_rows:
+            self.session.execute(insert(OrderModel), order_rows)
+        if item_rows:
+            self.session.execute(insert(OrderItemModel), item_rows)
+        return _bulk_orders(order_rows, item_rows)
     
-    def _get(self, id_: OrderId) -> OrderModel | None:
+    def get_record(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> OrderModel | None:
         '''特定の注文データを取得
         
-        SQLAlchemy の first メソッドを利用し、データオブジェクトとして出力
+        SQLAlchemy の first メソッドを利用し、データオブジェクト (OrderModel) として出力。
+        キャッシュのように、Order ではなくレコードの内容を使いたい場合にも利用する
         '''
         return (
             self.session
                 .query(OrderModel)
+                .options(_items_loader(load_items))
                 .filter(OrderModel.id == str(id_))
                 .first()
         )
         
-    def get(self, id_: OrderId) -> Order | None:
+    def get(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> Order | None:
         '''特定の注文データを Order オブジェクトの形で出力
         
         Order はビジネスロジックで用いるオブジェクト
         '''
-        order = self._get(id_)
+        order = self.get_record(id_, load_items)
         if order is not None:
-            return Order(**order.dict())
+            return Order.from_record(order)
         
     def list(
         self,
         limit: Optional[int],
+        load_items: ItemsLoadStrategy = 'selectin',
+        after: Optional[Tuple[datetime, str]] = None,
         **filters
     ):
-        query = self.session.query(OrderModel)
+        # Order.from_record でアイテムにアクセスする際に注文ごとの SELECT が発生しないよう、
+        # アイテムはあらかじめまとめて読み込んでおく
+        query = self.session.query(OrderModel).options(_items_loader(load_items))
         # SQLAlchemy の filter メソッドを使って、
         # 注文がキャンセルされているかどうかでフィルタリング
         if 'cancelled' in filters:
@@ -61,35 +243,162 @@ class OrdersRepository(OrderRepositoryInterface):
             else:
                 query = query.filter(OrderModel.status != 'cancelled')
         
+        # 前のページの続きから取得する場合
+        if after is not None:
+            query = query.filter(_after(after))
+        
         # 他にも filter が指定されている場合、その filter の条件に基づいてフィルタリング
-        # さらに、limit の数を上限とするようにデータ数を絞り込み
-        records = query.filter_by(**filters).limit(limit).all()
+        # さらに、(created, id) の順に並べた上で limit の数を上限とするようにデータ数を絞り込み
+        records = (
+            query.filter_by(**filters)
+                .order_by(OrderModel.created, OrderModel.id)
+                .limit(limit)
+                .all()
+        )
         
         # ビジネスロジックに利用する Order オブジェクト のリストを返却
-        return [Order(**record.dict()) for record in records]
+        return [Order.from_record(record) for record in records]
+    
+    def stream(self, batch_size: int = 1000, **filters) -> Iterator[Order]:
+        '''条件に一致する注文データを Order オブジェクトとして1件ずつ返す
+        
+        yield_per を使い、batch_size 件ずつデータベースから取り出す。
+        ORM オブジェクトは作らず、注文の行 (Row) を batch_size 件取り出すごとに
+        そのアイテムの行を IN 句でまとめて読み込み、行から直接 Order を組み立てる。
+        identity map にも載らないため、件数によらずメモリ使用量は一定に保たれる。
+        '''
+        result = self.session.execute(_stream_statement(batch_size, filters))
+        for order_rows in result.partitions():
+            item_rows = self.session.execute(_items_statement(order_rows))
+            yield from _rows_to_orders(order_rows, item_rows)
     
     def update(self, id_: OrderId, **payload):
         '''与えられた payload の情報を元に注文データを更新'''
-        record = self._get(id_)
+        record = self.get_record(id_)
 
         # 商品データについて
-        if 'item' in payload:
-            # まずは record のアイテムを全て削除
-            for item in record.items:
-                self.session.delete(item)
-            # 続いて、payload からアイテムを追加
-            record.items = [
-                OrderItemModel(**item) for item in payload.pop('items')
-            ]
+        # 全て削除してから追加し直すのではなく、変更があったアイテムだけを更新・追加・削除する
+        if 'items' in payload:
+            statement = _diff_items(self.session, record, payload.pop('items'))
+            if statement is not None:
+                self.session.execute(statement)
         
         # その他のデータを更新
         for key, value in payload.items():
             # setattr という組込み関数を利用することでシンプルにプロパティの値を変更できる
             # ただし、key が record に存在しない場合は勝手に追加されてしまう点に注意
             setattr(record, key, value)
-        return Order(**record.dict())
+        return Order.from_record(record)
             
     def delete(self, id_: OrderId):
         '''指定された注文データを削除'''
-        self.session.delete(self._get(id_))
-        
\ No newline at end of file
+        self.session.delete(self.get_record(id_))
+
+
+class AsyncOrdersRepository(AsyncOrderRepositoryInterface):
+    '''OrdersRepository の非同期版
+    
+    AsyncSession では関連の遅延読み込みができないため、
+    注文を取得する際は selectin か joined でアイテムをまとめて読み込んでおく。
+    '''
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def add(self, items: List[Item]) -> Order:
+        '''データベースに、複数のアイテムを保存する'''
+        record = OrderModel(
+            items=[OrderItemModel(**item) for item in items]
+        )
+        self.session.add(record)
+        return Order.from_record(record, order_=record)
+    
+    async def add_many(self, orders: List[List[Item]]) -> List[Order]:
+        '''OrdersRepository.add_many の非同期版'''
+        order_rows, item_rows = _bulk_rows(orders)
+        if order_rows:
+            await self.session.execute(insert(OrderModel), order_rows)
+        if item_rows:
+            await self.session.execute(insert(OrderItemModel), item_rows)
+        return _bulk_orders(order_rows, item_rows)
+    
+    def _items_loader(self, load_items: ItemsLoadStrategy):
+        if load_items == 'lazy':
+            raise ValueError('AsyncOrdersRepository does not support lazy loading')
+        return _items_loader(load_items)
+    
+    async def get_record(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> OrderModel | None:
+        '''特定の注文データを、アイテムを読み込んだ状態で取得'''
+        statement = (
+            select(OrderModel)
+                .options(self._items_loader(load_items))
+                .where(OrderModel.id == str(id_))
+        )
+        return (await self.session.scalars(statement)).unique().first()
+    
+    async def get(
+        self,
+        id_: OrderId,
+        load_items: ItemsLoadStrategy = 'selectin'
+    ) -> Order | None:
+        '''特定の注文データを Order オブジェクトの形で出力'''
+        order = await self.get_record(id_, load_items)
+        if order is not None:
+            return Order.from_record(order)
+    
+    async def list(
+        self,
+        limit: Optional[int],
+        load_items: ItemsLoadStrategy = 'selectin',
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters
+    ) -> List[Order]:
+        statement = select(OrderModel).options(self._items_loader(load_items))
+        if 'cancelled' in filters:
+            cancelled = filters.pop('cancelled')
+            if cancelled:
+                statement = statement.where(OrderModel.status == 'cancelled')
+            else:
+                statement = statement.where(OrderModel.status != 'cancelled')
+        if after is not None:
+            statement = statement.where(_after(after))
+        statement = (
+            statement.filter_by(**filters)
+                .order_by(OrderModel.created, OrderModel.id)
+                .limit(limit)
+        )
+        records = (await self.session.scalars(statement)).unique().all()
+        return [Order.from_record(record) for record in records]
+    
+    async def stream(
+        self,
+        batch_size: int = 1000,
+        **filters
+    ) -> AsyncIterator[Order]:
+        '''OrdersRepository.stream の非同期版'''
+        result = await self.session.stream(_stream_statement(batch_size, filters))
+        async for order_rows in result.partitions():
+            item_rows = await self.session.execute(_items_statement(order_rows))
+            for order in _rows_to_orders(order_rows, item_rows):
+                yield order
+    
+    async def update(self, id_: OrderId, **payload) -> Order:
+        '''与えられた payload の情報を元に注文データを更新'''
+        record = await self.get_record(id_)
+        
+        if 'items' in payload:
+            statement = _diff_items(self.session, record, payload.pop('items'))
+            if statement is not None:
+                await self.session.execute(statement)
+        
+        for key, value in payload.items():
+            setattr(record, key, value)
+        return Order.from_record(record)
+    
+    async def delete(self, id_: OrderId):
+        '''指定された注文データを削除'''
+        await self.session.delete(await self.get_record(id_))
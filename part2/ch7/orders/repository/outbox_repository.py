@@ -0,0 +1,171 @@
+'''アウトボックスのメッセージを読み書きするリポジトリ
+
+メッセージの登録は注文の操作と同じセッション (トランザクション) で行う。
+ディスパッチャーは処理待ちのメッセージを取り出し、処理中であることを示すために
+locked_until を条件付きの UPDATE で書き込んでから処理する。
+これにより、複数のディスパッチャーが動いていても同じメッセージを同時に処理しない。
+'''
+
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from orders.repository.models import OutboxMessageModel, generate_uuid
+from orders.types import OrderId
+
+
+def outbox_key(kind: str, order_id: OrderId) -> str:
+    '''注文と処理の種類から、メッセージの冪等キーを作る'''
+    return f'{kind}:{order_id}'
+
+
+def _unlocked(now: datetime):
+    return or_(
+        OutboxMessageModel.locked_until.is_(None),
+        OutboxMessageModel.locked_until < now
+    )
+
+
+def _requeue_statement(message_id: str):
+    return (
+        update(OutboxMessageModel)
+            .where(
+                OutboxMessageModel.id == message_id,
+                OutboxMessageModel.status == 'failed'
+            )
+            .values(
+                status='pending',
+                attempts=0,
+                next_attempt_at=datetime.utcnow(),
+                locked_until=None
+            )
+    )
+
+
+class OutboxRepository:
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add(self, kind: str, order_id: OrderId) -> dict:
+        '''処理待ちのメッセージを登録'''
+        record = OutboxMessageModel(
+            id=generate_uuid(),
+            order_id=str(order_id),
+            kind=kind,
+            idempotency_key=outbox_key(kind, order_id),
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        self.session.add(record)
+        return record.dict()
+
+    def get(self, message_id: str) -> Optional[dict]:
+        record = self.session.get(OutboxMessageModel, message_id)
+        if record is not None:
+            return record.dict()
+
+    def get_by_key(self, kind: str, order_id: OrderId) -> Optional[dict]:
+        '''注文に対して登録済みのメッセージを取得'''
+        record = self.session.scalars(
+            select(OutboxMessageModel)
+                .where(OutboxMessageModel.idempotency_key == outbox_key(kind, order_id))
+        ).first()
+        if record is not None:
+            return record.dict()
+
+    def due(self, now: datetime, limit: int) -> List[str]:
+        '''実行時刻を過ぎた処理待ちのメッセージの ID を、実行時刻の順に取得'''
+        return list(self.session.scalars(
+            select(OutboxMessageModel.id)
+                .where(
+                    OutboxMessageModel.status == 'pending',
+                    OutboxMessageModel.next_attempt_at <= now,
+                    _unlocked(now)
+                )
+                .order_by(OutboxMessageModel.next_attempt_at)
+                .limit(limit)
+        ))
+
+    def claim(self, message_id: str, now: datetime, until: datetime) -> bool:
+        '''メッセージを until まで処理中にする。他のディスパッチャーが処理中の場合は False を返す'''
+        result = self.session.execute(
+            update(OutboxMessageModel)
+                .where(
+                    OutboxMessageModel.id == message_id,
+                    OutboxMessageModel.status == 'pending',
+                    _unlocked(now)
+                )
+                .values(locked_until=until)
+        )
+        return result.rowcount == 1
+
+    def requeue(self, message_id: str):
+        '''再試行の上限に達した (failed) メッセージを、試行回数を戻して処理待ちにする'''
+        self.session.execute(_requeue_statement(message_id))
+
+    def mark_done(self, message_id: str):
+        self.session.execute(
+            update(OutboxMessageModel)
+                .where(OutboxMessageModel.id == message_id)
+                .values(status='done', locked_until=None)
+        )
+
+    def retry_later(
+        self,
+        message_id: str,
+        error: str,
+        next_attempt_at: datetime,
+        max_attempts: int,
+        count_attempt: bool = True
+    ):
+        '''失敗を記録し、next_attempt_at に再試行する
+
+        試行回数が max_attempts に達した場合は、再試行せずに failed とする。
+        外部サービスを呼び出す前に失敗した場合など、count_attempt が False の場合は試行回数に数えない
+        '''
+        record = self.session.get(OutboxMessageModel, message_id)
+        if count_attempt:
+            record.attempts += 1
+        record.last_error = error
+        record.locked_until = None
+        if record.attempts >= max_attempts:
+            record.status = 'failed'
+        else:
+            record.next_attempt_at = next_attempt_at
+
+
+class AsyncOutboxRepository:
+    '''OutboxRepository のうち、リクエストの処理で使う操作の非同期版'''
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add(self, kind: str, order_id: OrderId) -> dict:
+        record = OutboxMessageModel(
+            id=generate_uuid(),
+            order_id=str(order_id),
+            kind=kind,
+            idempotency_key=outbox_key(kind, order_id),
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        self.session.add(record)
+        return record.dict()
+
+    async def get_by_key(self, kind: str, order_id: OrderId) -> Optional[dict]:
+        record = (await self.session.scalars(
+            select(OutboxMessageModel)
+                .where(OutboxMessageModel.idempotency_key == outbox_key(kind, order_id))
+        )).first()
+        if record is not None:
+            return record.dict()
+
+    async def requeue(self, message_id: str):
+        '''OutboxRepository.requeue の非同期版'''
+        await self.session.execute(_requeue_statement(message_id))
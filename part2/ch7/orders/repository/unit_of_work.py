@@ -7,20 +7,46 @@ SQLAlchemy の詳細を理解せずとも、ビジネスロジックが
 - ロールバック
 
 を実施することのできるコンテキストマネージャーを定義することが目的。
+
+非同期のハンドラから利用するための AsyncUnitOfWork も合わせて定義する。
+
+read_only=True を指定すると、読み込み専用のレプリカに接続する。
+レプリカは書き込みを非同期に反映するため、直前の書き込みが見えない可能性がある。
 '''
 
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
-from typing import Optional, Type, TracebackType
+from types import TracebackType
+from typing import Optional, Type
+
+from orders.repository.engine import (
+    get_async_replica_session_maker,
+    get_async_session_maker,
+    get_replica_session_maker,
+    get_session_maker
+)
 
 class UnitOfWork:
     
-    def __init__(self):
-        # 一旦ローカルの sqlite を参照するようにハードコーディング
-        self.session_maker = sessionmaker(
-            bind=create_engine('sqlite:///orders.db')
-        )
+    def __init__(
+        self,
+        session_maker: Optional[sessionmaker] = None,
+        read_only: bool = False
+    ):
+        '''イニシャライザ
+        
+        エンジンの生成はコストが高いため、リクエストごとには行わず、
+        プロセス内で共有される sessionmaker を利用する。
+        テストなどで接続先を差し替えたい場合は session_maker を渡す。
+        read_only の場合はレプリカ (設定されていなければプライマリ) に接続し、コミットはできない。
+        '''
+        self.read_only = read_only
+        if session_maker is None:
+            session_maker = (
+                get_replica_session_maker() if read_only else get_session_maker()
+            )
+        self.session_maker = session_maker
     
     def __enter__(self):
         '''コンテキストマネージャー開始時の処理
@@ -60,9 +86,57 @@ class UnitOfWork:
         SQLAlchemy を使い続ける限りは、これは無駄なコードに思えるかもしれないが、
         もし別のフレームワークを使いたくなった時のために、ラッパーを作成。
         '''
+        if self.read_only:
+            raise RuntimeError('Cannot commit a read-only UnitOfWork')
         self.session.commit()
         
     def rollback(self):
         self.session.rollback()
+
+
+class AsyncUnitOfWork:
+    '''UnitOfWork の非同期版
+
+    async with 文で利用し、SQLAlchemy の AsyncSession を通じて
+    イベントループをブロックせずにデータベースとやり取りする。
+    '''
+    
+    def __init__(
+        self,
+        session_maker: Optional[async_sessionmaker] = None,
+        read_only: bool = False
+    ):
+        self.read_only = read_only
+        if session_maker is None:
+            session_maker = (
+                get_async_replica_session_maker()
+                if read_only else get_async_session_maker()
+            )
+        self.session_maker = session_maker
+    
+    async def __aenter__(self):
+        '''非同期コンテキストマネージャー開始時の処理'''
+        self.session = self.session_maker()
+        return self
+    
+    async def __aexit__(
+        self, 
+        exc_type: Optional[Type[BaseException]], 
+        exc_val: Optional[BaseException], 
+        traceback: Optional[TracebackType]
+    ) -> None:
+        '''非同期コンテキストマネージャーが終了するときに呼び出されるメソッド
+        
+        例外が発生した場合はロールバックした上で、いずれの場合もセッションを閉じる
+        '''
+        if exc_type is not None:
+            await self.rollback()
+        await self.session.close()
+    
+    async def commit(self):
+        if self.read_only:
+            raise RuntimeError('Cannot commit a read-only AsyncUnitOfWork')
+        await self.session.commit()
     
-    
\ No newline at end of file
+    async def rollback(self):
+        await self.session.rollback()
@@ -1,4 +1,4 @@
-from typing import TypedDict, Optional, List
+from typing import TypedDict, Optional, List, Literal
 from uuid import UUID
 from datetime import datetime
 
@@ -21,4 +21,10 @@ class OrderRecord(TypedDict):
     status: str
     created: datetime
     schedule_id: str
-    delivery_id: str
\ No newline at end of file
+    delivery_id: str
+
+# 注文アイテムの読み込み方法
+# selectin: 注文を取得した後、IN 句を使った 1 回の SELECT でアイテムをまとめて取得
+# joined: 注文とアイテムを LEFT OUTER JOIN して 1 回の SELECT で取得
+# lazy: アイテムに初めてアクセスした時点で、注文ごとに SELECT を発行 (N+1 が発生する)
+ItemsLoadStrategy = Literal['selectin', 'joined', 'lazy']
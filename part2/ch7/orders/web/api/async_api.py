@@ -0,0 +1,276 @@
+'''注文 API の非同期版のハンドラ
+
+api.py と同じエンドポイントを async def で定義する。
+データベースへの問い合わせは AsyncUnitOfWork を通じて await するため、
+1つのワーカーでスレッドプールを使い切ることなく、多数のリクエストを同時に捌ける。
+環境変数 ORDERS_ASYNC=true の場合に、api.py の代わりに読み込まれる。
+'''
+
+import math
+from typing import Optional
+from fastapi import HTTPException, Request
+from starlette import status
+from starlette.responses import Response, StreamingResponse
+
+from orders.orders_service.exceptions import (
+    APIIntegrationError,
+    DownstreamUnavailableError,
+    InvalidActionError,
+    OrderNotFoundError
+)
+from orders.orders_service.orders_service import AsyncOrdersService
+from orders.outbox.dispatcher import get_outbox_dispatcher
+from orders.repository.cache import get_order_cache
+from orders.repository.cached_orders_repository import AsyncCachedOrdersRepository
+from orders.repository.orders_repository import AsyncOrdersRepository
+from orders.repository.outbox_repository import AsyncOutboxRepository
+from orders.repository.unit_of_work import AsyncUnitOfWork
+from orders.types import OrderId
+from orders.web.app import app
+from orders.web.api.batch import split_batch
+from orders.web.api.etag import compute_etag, etag_matches
+from orders.web.api.fast_json import respond
+from orders.web.api.ndjson import MEDIA_TYPE as NDJSON_MEDIA_TYPE, aiter_ndjson
+from orders.web.api.pagination import decode_cursor, encode_cursor
+from orders.web.read_routing import use_replica
+from orders.web.api.schemas import (
+    GetOrderSchema,
+    CreateOrderSchema,
+    CreateOrdersBatchResultSchema,
+    CreateOrdersBatchSchema,
+    GetOrdersSchema
+)
+
+def orders_repository(session, read_through: bool = True):
+    '''注文リポジトリを作成
+
+    キャッシュが有効な場合は、ID を指定した取得の結果をキャッシュするリポジトリを返す。
+    取得した注文を元に書き込むハンドラでは read_through=False を指定し、
+    キャッシュは使わずにデータベースから読み込んだ上で、コミット後にキャッシュから取り除く
+    '''
+    repo = AsyncOrdersRepository(session)
+    cache = get_order_cache()
+    if cache is None:
+        return repo
+    return AsyncCachedOrdersRepository(repo, cache, read_through=read_through)
+
+@app.get('/orders', response_model=GetOrdersSchema)
+async def get_orders(
+    request: Request,
+    cancelled: Optional[bool] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    '''注文情報をリスト化して取得
+    
+    注文は (created, id) の順に並べて返す。
+    limit を指定した場合、続きがあればレスポンスの next_cursor を
+    cursor に渡すことで次のページを取得できる。
+    直前に書き込みを行ったクライアントでなければ、レプリカから読み込む。
+    '''
+    try:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Invalid cursor {cursor}'
+        )
+    async with AsyncUnitOfWork(read_only=use_replica(request)) as unit_of_work:
+        repo = orders_repository(unit_of_work.session)
+        orders_service = AsyncOrdersService(repo)
+        # 次のページがあるかどうかを判定するため、1件多く取得する
+        results = await orders_service.list_orders(
+            limit=None if limit is None else limit + 1,
+            cancelled=cancelled,
+            after=after
+        )
+    next_cursor = None
+    if limit is not None and len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1]) if results else None
+    return respond({
+        'orders': [result.dict() for result in results],
+        'next_cursor': next_cursor
+    })
+
+@app.post(
+    '/orders',
+    status_code=status.HTTP_201_CREATED,
+    response_model=GetOrderSchema
+)
+async def create_order(payload: CreateOrderSchema):
+    '''注文をデータベースに追加'''
+    async with AsyncUnitOfWork() as unit_of_work:
+        repo = orders_repository(unit_of_work.session)
+        orders_service = AsyncOrdersService(repo)
+        items = payload.model_dump()['items']
+        for item in items:
+            item['size'] = item['size'].value
+        order = await orders_service.place_order(items)
+        await unit_of_work.commit()
+        order_dict = order.dict()
+    return respond(order_dict, status.HTTP_201_CREATED)
+
+# POST /orders/{order_id} (キャンセル) に batch がマッチしないよう、先に登録する
+@app.post(
+    '/orders/batch',
+    status_code=status.HTTP_201_CREATED,
+    response_model=CreateOrdersBatchResultSchema
+)
+async def create_orders(payload: CreateOrdersBatchSchema, response: Response):
+    '''複数の注文をまとめてデータベースに追加
+    
+    正しい注文は1つのトランザクションでまとめて INSERT し、
+    不正な注文はリクエストの中での位置とともに errors に含めて返す。
+    不正な注文が含まれていた場合、ステータスコードは 207 とする。
+    '''
+    indexes, items_list, errors = split_batch(payload.orders)
+    orders = []
+    if items_list:
+        async with AsyncUnitOfWork() as unit_of_work:
+            repo = orders_repository(unit_of_work.session)
+            orders_service = AsyncOrdersService(repo)
+            orders = await orders_service.place_orders(items_list)
+            await unit_of_work.commit()
+    if errors:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return respond({
+        'orders': [
+            {'index': index, 'order': order.dict()}
+            for index, order in zip(indexes, orders)
+        ],
+        'errors': errors
+    }, status.HTTP_201_CREATED, response)
+
+# /orders/{order_id} に export がマッチしないよう、先に登録する
+@app.get('/orders/export', response_class=StreamingResponse)
+async def export_orders(request: Request, cancelled: Optional[bool] = None):
+    '''注文を NDJSON 形式でストリーミングして出力'''
+    read_only = use_replica(request)
+    async def orders():
+        async with AsyncUnitOfWork(read_only=read_only) as unit_of_work:
+            repo = orders_repository(unit_of_work.session)
+            orders_service = AsyncOrdersService(repo)
+            async for order in orders_service.stream_orders(cancelled=cancelled):
+                yield order
+    return StreamingResponse(
+        aiter_ndjson(orders()), media_type=NDJSON_MEDIA_TYPE
+    )
+
+@app.get('/orders/{order_id}', response_model=GetOrderSchema)
+async def get_order(order_id: OrderId, request: Request, response: Response):
+    '''特定の注文情報を取得
+    
+    ETag ヘッダーを付与し、If-None-Match の値と一致する場合は本文なしの 304 を返す
+    '''
+    try:
+        async with AsyncUnitOfWork(read_only=use_replica(request)) as unit_of_work:
+            repo = orders_repository(unit_of_work.session)
+            orders_service = AsyncOrdersService(repo)
+            order = await orders_service.get_order(order_id=order_id)
+    except OrderNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Order with ID {order_id} not found'
+        )
+    order_dict = order.dict()
+    etag = compute_etag(order_dict)
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={'ETag': etag}
+        )
+    response.headers['ETag'] = etag
+    return respond(order_dict, response=response)
+
+@app.put('/order/{order_id}', response_model=GetOrderSchema)
+async def update_order(order_id: OrderId, order_details: CreateOrderSchema):
+    '''指定された注文のデータを更新'''
+    try:
+        async with AsyncUnitOfWork() as unit_of_work:
+            repo = orders_repository(unit_of_work.session, read_through=False)
+            orders_service = AsyncOrdersService(repo)
+            items = order_details.model_dump()['items']
+            for item in items:
+                item['size'] = item['size'].value
+            order = await orders_service.update_order(
+                order_id=order_id, items=items
+            )
+            await unit_of_work.commit()
+        return respond(order.dict())
+    except OrderNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Order with ID {order_id} not found.'
+        )
+
+@app.delete(
+    '/order/{order_id}',
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response
+)
+async def delete_order(order_id: OrderId):
+    try:
+        async with AsyncUnitOfWork() as unit_of_work:
+            repo = orders_repository(unit_of_work.session, read_through=False)
+            orders_service = AsyncOrdersService(repo)
+            await orders_service.delete_order(order_id=order_id)
+            await unit_of_work.commit()
+        return
+    except OrderNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Order with ID {order_id} not found'
+        )
+
+@app.post('/orders/{order_id}', response_model=GetOrderSchema)
+async def cancel_order(order_id: OrderId):
+    '''注文をキャンセルする処理を実施'''
+    try:
+        async with AsyncUnitOfWork() as unit_of_work:
+            repo = orders_repository(unit_of_work.session, read_through=False)
+            orders_service = AsyncOrdersService(repo)
+            order = await orders_service.cancel_order(order_id=order_id)
+            await unit_of_work.commit()
+        return respond(order.dict())
+    except OrderNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Order with ID {order_id} not found.'
+        )
+    except DownstreamUnavailableError as error:
+        # 厨房サービスを呼び出せない場合は待たずに 503 を返し、再試行までの目安を伝える
+        raise HTTPException(
+            status_code=503,
+            detail=str(error),
+            headers={'Retry-After': str(math.ceil(error.retry_after))}
+        )
+    except APIIntegrationError as error:
+        raise HTTPException(status_code=502, detail=str(error))
+
+@app.post(
+    '/orders/{order_id}/pay',
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=GetOrderSchema
+)
+async def pay_order(order_id: OrderId):
+    '''注文の支払いを受け付ける
+    
+    支払いとスケジューリングはアウトボックスを通じてバックグラウンドで行うため、
+    外部サービスの応答を待たずに 202 を返す。
+    '''
+    try:
+        async with AsyncUnitOfWork() as unit_of_work:
+            repo = orders_repository(unit_of_work.session, read_through=False)
+            orders_service = AsyncOrdersService(repo, AsyncOutboxRepository(unit_of_work.session))
+            order = await orders_service.pay_order(order_id=order_id)
+            await unit_of_work.commit()
+    except OrderNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Order with ID {order_id} not found.'
+        )
+    except InvalidActionError as error:
+        raise HTTPException(status_code=409, detail=str(error))
+    get_outbox_dispatcher().notify()
+    return respond(order.dict(), status.HTTP_202_ACCEPTED)
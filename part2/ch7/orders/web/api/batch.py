@@ -0,0 +1,37 @@
+'''POST /orders/batch で受け取った注文の検証処理
+
+リクエスト全体を1つのスキーマで検証すると、1件でも不正な注文があれば全体が 422 になる。
+ここでは注文を1件ずつ CreateOrderSchema で検証し、正しい注文だけを作成して、
+不正な注文はリクエストの中での位置とともにエラーとして返せるようにする。
+'''
+
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from orders.types import Item
+from orders.web.api.schemas import CreateOrderSchema
+
+
+def split_batch(
+    orders: List[Dict[str, Any]]
+) -> Tuple[List[int], List[List[Item]], List[dict]]:
+    '''注文を検証し、正しい注文の位置とアイテム、不正な注文のエラーに分ける'''
+    indexes, items_list, errors = [], [], []
+    for index, order in enumerate(orders):
+        try:
+            items = CreateOrderSchema.model_validate(order).model_dump()['items']
+        except ValidationError as error:
+            errors.append({
+                'index': index,
+                'errors': [
+                    {'loc': detail['loc'], 'msg': detail['msg'], 'type': detail['type']}
+                    for detail in error.errors()
+                ],
+            })
+            continue
+        for item in items:
+            item['size'] = item['size'].value
+        indexes.append(index)
+        items_list.append(items)
+    return indexes, items_list, errors
@@ -0,0 +1,32 @@
+'''注文のレスポンスに付与する ETag の計算と、If-None-Match との照合処理
+
+ETag はレスポンスとして返す注文データの内容から計算するため、
+注文が更新されない限り同じ値になる。
+クライアントが前回受け取った ETag を If-None-Match で送ってきた場合、
+内容が変わっていなければ本文を省略して 304 を返せる。
+'''
+
+import hashlib
+import json
+from typing import Optional
+
+
+def compute_etag(order: dict) -> str:
+    '''注文データから ETag を計算'''
+    payload = json.dumps(order, sort_keys=True, default=str)
+    return '"' + hashlib.sha1(payload.encode()).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    '''If-None-Match ヘッダーの値のいずれかが etag と一致するかどうか
+
+    If-None-Match の比較は弱い比較で行うため、W/ の接頭辞は無視する
+    '''
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        candidate.strip().removeprefix('W/') == etag
+        for candidate in if_none_match.split(',')
+    )
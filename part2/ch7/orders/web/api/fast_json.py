@@ -0,0 +1,70 @@
+'''注文のレスポンスを JSON のバイト列に直接変換する経路
+
+ハンドラが辞書を返すと、FastAPI は response_model (GetOrderSchema など) で検証した上で
+JSON に変換する。注文のデータはデータベースから読み込んだドメインオブジェクトであり、
+書き込み時に検証済みのため、一覧のように件数が多いレスポンスではこの検証が無駄になる。
+
+環境変数 ORDERS_FAST_JSON=true の場合、respond は検証を行わずに JSON のバイト列を持つ
+レスポンスを返す。orjson がインストールされていればそれを使い、なければ標準の json を使う。
+'''
+
+import json
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Optional
+from uuid import UUID
+
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from config.env_config import EnvConfig
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(content: Any) -> bytes:
+    '''content を JSON のバイト列に変換'''
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def fast_json_enabled() -> bool:
+    return EnvConfig().orders_fast_json
+
+
+def respond(content: Any, status_code: int = 200, response: Optional[Response] = None):
+    '''ハンドラの戻り値を作る
+
+    ORDERS_FAST_JSON が無効な場合は content をそのまま返し、response_model による検証を行う。
+    有効な場合は FastJSONResponse を返す。Response を返すと FastAPI は引数で受け取った
+    response を使わないため、そこに設定したステータスコードとヘッダーを引き継ぐ。
+    '''
+    if not fast_json_enabled():
+        return content
+    headers = None
+    if response is not None:
+        headers = dict(response.headers)
+        status_code = response.status_code or status_code
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
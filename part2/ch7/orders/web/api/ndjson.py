@@ -0,0 +1,50 @@
+'''注文を NDJSON (改行区切りの JSON) に変換するジェネレーター
+
+注文を1件ずつ JSON の1行に変換し、chunk_size 行ごとにまとめて返す。
+全件分のリストやレスポンスボディを組み立てないため、件数によらずメモリ使用量は一定になる。
+'''
+
+import json
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from orders.domain.order import Order
+
+MEDIA_TYPE = 'application/x-ndjson'
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def to_ndjson_line(order: Order) -> str:
+    return json.dumps(order.dict(), default=_default) + '\n'
+
+
+def iter_ndjson(orders: Iterable[Order], chunk_size: int = 1000) -> Iterator[str]:
+    '''注文のイテレータを NDJSON のチャンクのイテレータに変換'''
+    lines = []
+    for order in orders:
+        lines.append(to_ndjson_line(order))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+async def aiter_ndjson(
+    orders: AsyncIterable[Order],
+    chunk_size: int = 1000
+) -> AsyncIterator[str]:
+    '''iter_ndjson の非同期版'''
+    lines = []
+    async for order in orders:
+        lines.append(to_ndjson_line(order))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
@@ -0,0 +1,33 @@
+'''注文一覧のキーセットページネーションで使うカーソルの変換処理
+
+カーソルはページの最後の注文の (created, id) を JSON にして base64 でエンコードしたもの。
+クライアントからは中身を意識しない不透明な文字列として扱ってもらう。
+'''
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+from orders.domain.order import Order
+
+
+def encode_cursor(order: Order) -> str:
+    '''注文から、その次のページを指すカーソルを作成'''
+    payload = json.dumps([order.created.isoformat(), str(order.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    '''カーソルを (created, id) に戻す
+
+    不正なカーソルが渡された場合は ValueError を送出する
+    '''
+    try:
+        created, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # ID は UUID としてデータベースに渡すため、ここで形式を検証しておく
+        return datetime.fromisoformat(created), str(UUID(str(id_)))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as error:
+        raise ValueError(f'Invalid cursor: {cursor}') from error
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
 from pydantic import BaseModel, conint, conlist, validator
@@ -42,7 +42,7 @@ class OrderItemSchema(BaseModel):
 
 
 class CreateOrderSchema(BaseModel):
-    items: conlist(OrderItemSchema, min_items=1)
+    items: conlist(OrderItemSchema, min_length=1)
 
     class Config:
         extra = 'forbid'
@@ -56,6 +56,42 @@ class GetOrderSchema(CreateOrderSchema):
 
 class GetOrdersSchema(BaseModel):
     orders: List[GetOrderSchema]
+    # 次のページを取得するためのカーソル。次のページがない場合は None
+    next_cursor: Optional[str] = None
 
     class Config:
-        extra = 'forbid'
\ No newline at end of file
+        extra = 'forbid'
+
+
+# POST /orders/batch で一度に受け付ける注文の最大数
+MAX_BATCH_SIZE = 1000
+
+
+class CreateOrdersBatchSchema(BaseModel):
+    # 注文ごとにエラーを返せるよう、各注文の検証はハンドラの中で1件ずつ行う
+    orders: conlist(Dict[str, Any], min_length=1, max_length=MAX_BATCH_SIZE)
+
+    class Config:
+        extra = 'forbid'
+
+
+class BatchOrderSchema(BaseModel):
+    # リクエストの orders の中での位置
+    index: int
+    order: GetOrderSchema
+
+
+class ValidationErrorSchema(BaseModel):
+    loc: List[Union[int, str]]
+    msg: str
+    type: str
+
+
+class BatchOrderErrorSchema(BaseModel):
+    index: int
+    errors: List[ValidationErrorSchema]
+
+
+class CreateOrdersBatchResultSchema(BaseModel):
+    orders: List[BatchOrderSchema]
+    errors: List[BatchOrderErrorSchema]
@@ -1,15 +1,59 @@
+import asyncio
+import contextlib
 from pathlib import Path
-import yaml
 from fastapi import FastAPI
 
+from config.env_config import EnvConfig
+from orders.web.openapi import install_openapi
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''OUTBOX_DISPATCHER が inline の場合、アウトボックスのディスパッチャーをバックグラウンドで動かす'''
+    config = EnvConfig()
+    if config.outbox_dispatcher != 'inline':
+        yield
+        return
+    from orders.outbox.dispatcher import get_outbox_dispatcher
+    task = asyncio.create_task(
+        get_outbox_dispatcher().run(config.outbox_poll_interval)
+    )
+    try:
+        yield
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+# API 仕様書とドキュメントのエンドポイントは install_openapi で登録する
 app = FastAPI(
     debug=True,
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+    lifespan=lifespan
+)
+
+oas_doc_path = Path(__file__).parent / "../../api_docs/orders.yaml"
+install_openapi(
+    app,
+    oas_doc_path,
     openapi_url="/openapi/orders.json",
     docs_url="/docs/orders"
 )
 
-oas_doc_path = Path(__file__).parent / "../../api_docs/orders.yaml"
-oas_doc = yaml.safe_load(oas_doc_path.read_text())
-app.openapi = lambda: oas_doc
+# 処理時間の計測は、有効な場合にだけミドルウェアを登録する
+config = EnvConfig()
+if config.orders_metrics or config.server_timing:
+    from orders.web.metrics import install_metrics
+    install_metrics(app, expose=config.orders_metrics, timing_header=config.server_timing)
+
+# レプリカが設定されている場合にだけ、read-your-writes のためのミドルウェアを登録する
+if config.database_replica_urls or config.async_database_replica_urls:
+    from orders.web.read_routing import install_read_routing
+    install_read_routing(app)
 
-from orders.web.api import api
\ No newline at end of file
+# 設定に応じて、同期版か非同期版のどちらかのハンドラを登録する
+if config.orders_async:
+    from orders.web.api import async_api
+else:
+    from orders.web.api import api
\ No newline at end of file
@@ -0,0 +1,92 @@
+'''リクエストの処理時間を計測するミドルウェアと /metrics エンドポイント
+
+環境変数 ORDERS_METRICS=true の場合に /metrics を公開し、
+SERVER_TIMING=true の場合にレスポンスへ Server-Timing ヘッダーを付与する。
+どちらも無効な場合はミドルウェア自体を登録しない。
+
+BaseHTTPMiddleware はレスポンスの本文をストリームとして中継するため、
+NDJSON のエクスポートのような大きなレスポンスではオーバーヘッドが大きい。
+ここでは ASGI のミドルウェアとして実装し、レスポンスヘッダーの送信時にだけ手を加える。
+'''
+
+import time
+
+from fastapi import FastAPI
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from orders import metrics
+
+# charset は Response が付与する
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4'
+
+
+def server_timing(seconds: float, timings: metrics.RequestTimings) -> str:
+    '''Server-Timing ヘッダーの値を組み立てる
+
+    app はレスポンスヘッダーを送るまでの処理全体、db は SQL の実行、
+    それ以外は外部サービスの呼び出しにかかった時間 (ミリ秒)
+    '''
+    entries = [
+        f'app;dur={seconds * 1000:.1f}',
+        f'db;dur={timings.sql_seconds * 1000:.1f};desc="{timings.sql_count} queries"',
+    ]
+    entries.extend(
+        f'{service};dur={elapsed * 1000:.1f}'
+        for service, elapsed in timings.downstream.items()
+    )
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app: ASGIApp, record: bool = True, timing_header: bool = True):
+        self.app = app
+        self.record = record
+        self.timing_header = timing_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if self.timing_header:
+                    value = server_timing(time.perf_counter() - start, timings)
+                    message['headers'] = [
+                        *message.get('headers', []),
+                        (b'server-timing', value.encode('latin-1')),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.finish_request(token)
+            if self.record:
+                # ルートのテンプレート (/orders/{order_id}) で集計し、ラベルの数が増え続けないようにする
+                route = scope.get('route')
+                metrics.registry.observe_request(
+                    scope['method'],
+                    route.path if route is not None else 'unmatched',
+                    status_code,
+                    time.perf_counter() - start,
+                    timings
+                )
+
+
+def install_metrics(app: FastAPI, expose: bool, timing_header: bool):
+    '''計測を有効にし、ミドルウェアと /metrics エンドポイントを登録'''
+    metrics.enable()
+    app.add_middleware(MetricsMiddleware, record=expose, timing_header=timing_header)
+    if expose:
+        @app.get('/metrics', include_in_schema=False)
+        def prometheus_metrics():
+            return Response(metrics.registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,108 @@
+'''API 仕様書 (OAS) の読み込みと配信
+
+YAML の仕様書を import のたびに yaml.safe_load で解析すると、純粋な Python 実装の
+ローダーが使われるため、起動に時間がかかる。また FastAPI は /openapi/*.json への
+リクエストのたびに辞書を JSON に変換し直す。
+
+ここでは、解析結果を JSON に変換したバイト列を __pycache__ にキャッシュし、
+YAML ファイルの更新時刻とサイズが変わらない限りはそれを読み込む。
+キャッシュがない場合は、利用できれば libyaml による C 実装のローダーで解析する。
+/openapi/*.json には、このバイト列をそのまま返す。
+'''
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import yaml
+from fastapi import FastAPI
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+# キャッシュの形式を変えた場合に、古いキャッシュを使わないようにするための番号
+CACHE_VERSION = 1
+
+
+def _cache_path(path: Path) -> Path:
+    '''仕様書の更新時刻とサイズから、キャッシュファイルのパスを決める'''
+    stat = path.stat()
+    key = hashlib.sha1(
+        f'{CACHE_VERSION}:{path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}'.encode()
+    ).hexdigest()[:16]
+    return path.parent / '__pycache__' / f'{path.stem}.{key}.json'
+
+
+def load_spec(path: Path) -> Tuple[dict, bytes]:
+    '''仕様書を読み込み、辞書と JSON にエンコードしたバイト列を返す
+
+    キャッシュの読み書きに失敗した場合 (読み取り専用のファイルシステムなど) は、
+    キャッシュを使わずに YAML を解析する
+    '''
+    path = Path(path)
+    cache_path = _cache_path(path)
+    try:
+        content = cache_path.read_bytes()
+        return json.loads(content), content
+    except (OSError, ValueError):
+        pass
+
+    spec = yaml.load(path.read_text(), Loader=SafeLoader)
+    content = json.dumps(spec, separators=(',', ':'), default=str).encode()
+    try:
+        cache_path.parent.mkdir(exist_ok=True)
+        # 書き込み途中のファイルを他のプロセスが読まないよう、一時ファイルから置き換える
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, cache_path)
+        # 仕様書を更新する前のキャッシュは不要になるため削除する
+        for stale in cache_path.parent.glob(f'{path.stem}.*.json'):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        pass
+    return spec, content
+
+
+def install_openapi(
+    app: FastAPI,
+    path: Path,
+    openapi_url: str,
+    docs_url: str,
+    redoc_url: Optional[str] = '/redoc'
+):
+    '''仕様書を app の OpenAPI として登録し、エンコード済みのバイト列を配信する
+
+    app は openapi_url=None, docs_url=None, redoc_url=None で作成しておく。
+    FastAPI が生成する /openapi/*.json と Swagger UI, ReDoc の代わりに、同じパスで登録する。
+    '''
+    spec, content = load_spec(path)
+    app.openapi = lambda: spec
+
+    @app.get(openapi_url, include_in_schema=False)
+    def openapi_json():
+        return Response(content, media_type='application/json')
+
+    @app.get(docs_url, include_in_schema=False)
+    def swagger_ui_html(request: Request) -> HTMLResponse:
+        root_path = request.scope.get('root_path', '').rstrip('/')
+        return get_swagger_ui_html(
+            openapi_url=root_path + openapi_url,
+            title=f"{spec['info']['title']} - Swagger UI"
+        )
+
+    if redoc_url is not None:
+        @app.get(redoc_url, include_in_schema=False)
+        def redoc_html(request: Request) -> HTMLResponse:
+            root_path = request.scope.get('root_path', '').rstrip('/')
+            return get_redoc_html(
+                openapi_url=root_path + openapi_url,
+                title=f"{spec['info']['title']} - ReDoc"
+            )
@@ -0,0 +1,75 @@
+'''読み込み専用のエンドポイントをレプリカに振り分けるための仕組み
+
+レプリカには書き込みが遅れて反映されるため、注文を作成した直後に取得すると 404 になったり、
+更新前の内容が返ったりする可能性がある。そこで、書き込みを行ったクライアントには
+書き込みの時刻を Cookie で渡し、READ_YOUR_WRITES_WINDOW 秒の間はプライマリから読み込む (read-your-writes)。
+
+Cookie の付与は ASGI のミドルウェアで行い、GET, HEAD, OPTIONS 以外のメソッドで
+成功 (4xx, 5xx 以外) したレスポンスに付与する。
+レプリカが設定されていない場合は、ミドルウェア自体を登録しない。
+'''
+
+import math
+import time
+from functools import lru_cache
+
+from fastapi import FastAPI, Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.env_config import EnvConfig
+
+COOKIE_NAME = 'orders_last_write'
+
+_READ_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+@lru_cache(maxsize=None)
+def read_your_writes_window() -> float:
+    return EnvConfig().read_your_writes_window
+
+
+def use_replica(request: Request) -> bool:
+    '''リクエストの読み込みをレプリカに向けてよいかどうか
+
+    直近の書き込みの時刻は、サーバー側で付与した Cookie の値で判定する。
+    Cookie の有効期限を守らないクライアントもあるため、時刻そのものも比較する
+    '''
+    value = request.cookies.get(COOKIE_NAME)
+    if value is None:
+        return True
+    try:
+        written = float(value)
+    except ValueError:
+        return True
+    return time.time() - written >= read_your_writes_window()
+
+
+class ReadYourWritesMiddleware:
+
+    def __init__(self, app: ASGIApp, window: float):
+        self.app = app
+        self.max_age = math.ceil(window)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] in _READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                cookie = (
+                    f'{COOKIE_NAME}={time.time():.3f}; Max-Age={self.max_age}; '
+                    'Path=/; HttpOnly; SameSite=Lax'
+                )
+                message['headers'] = [
+                    *message.get('headers', []),
+                    (b'set-cookie', cookie.encode('latin-1')),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def install_read_routing(app: FastAPI):
+    '''書き込みを行ったクライアントに Cookie を付与するミドルウェアを登録'''
+    app.add_middleware(ReadYourWritesMiddleware, window=read_your_writes_window())
@@ -0,0 +1,42 @@
+'''ch7 のテストの共通設定
+
+benchmarks と同様に ch7 のディレクトリを基準にインポートするため、sys.path の先頭に追加する。
+'''
+
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from orders.repository.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    '''テストごとに作成する SQLite のファイルのデータベース'''
+    engine = create_engine(f'sqlite:///{tmp_path / "orders.db"}')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_maker(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def async_engine(engine):
+    '''engine と同じデータベースファイルに aiosqlite で接続するエンジン'''
+    url = engine.url.set(drivername='sqlite+aiosqlite')
+    return create_async_engine(url)
+
+
+@pytest.fixture
+def async_session_maker(async_engine):
+    return async_sessionmaker(bind=async_engine, expire_on_commit=False)
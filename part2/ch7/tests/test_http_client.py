@@ -0,0 +1,133 @@
+'''HTTPClient, AsyncHTTPClient の再試行の扱いのテスト
+
+冪等キーのない POST は、リクエストが相手に届いていないことが確かな場合にだけ再試行する。
+'''
+
+import asyncio
+
+import httpx
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from orders.clients.http import AsyncHTTPClient, HTTPClient, idempotency_headers
+from orders.orders_service.exceptions import APIIntegrationError
+
+URL = 'http://downstream.test/pay'
+MAX_RETRIES = 2
+
+
+def response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def connect_error() -> requests.ConnectionError:
+    reason = NewConnectionError(None, 'Connection refused')
+    return requests.ConnectionError(MaxRetryError(None, URL, reason))
+
+
+def sync_client(outcomes):
+    '''outcomes を順に返す (例外の場合は送出する) HTTPClient と、呼び出し回数のリストを返す'''
+    client = HTTPClient(timeout=1, max_retries=MAX_RETRIES, backoff_factor=0, pool_maxsize=1)
+    calls = []
+
+    def post(url, **kwargs):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(kwargs)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    client.session.post = post
+    return client, calls
+
+
+@pytest.mark.parametrize('error', [
+    requests.ReadTimeout('Read timed out'),
+    requests.ConnectionError(ProtocolError('Connection aborted.')),
+])
+def test_post_without_key_does_not_retry_after_request_was_sent(error):
+    client, calls = sync_client([error])
+    with pytest.raises(APIIntegrationError):
+        client.post(URL, json={})
+    assert len(calls) == 1
+
+
+def test_post_without_key_does_not_retry_5xx():
+    client, calls = sync_client([response(503)])
+    assert client.post(URL, json={}).status_code == 503
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize('error', [
+    connect_error(),
+    requests.ConnectTimeout('Connect timed out'),
+])
+def test_post_retries_connect_errors(error):
+    client, calls = sync_client([error, response(201)])
+    assert client.post(URL, json={}).status_code == 201
+    assert len(calls) == 2
+
+
+def test_post_gives_up_after_max_retries():
+    client, calls = sync_client([connect_error()])
+    with pytest.raises(APIIntegrationError):
+        client.post(URL, json={})
+    assert len(calls) == MAX_RETRIES + 1
+
+
+@pytest.mark.parametrize('outcome', [requests.ReadTimeout('Read timed out'), response(503)])
+def test_post_with_key_retries_read_timeouts_and_5xx(outcome):
+    client, calls = sync_client([outcome, response(201)])
+    headers = idempotency_headers('pay:1')
+    assert client.post(URL, json={}, headers=headers).status_code == 201
+    assert len(calls) == 2
+
+
+def async_post(outcomes, calls, headers=None):
+    '''outcomes を順に返す httpx のトランスポートで AsyncHTTPClient.post を呼び出す
+
+    送信したリクエストは calls に追加する
+    '''
+    def handler(request):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+
+    async def run():
+        client = AsyncHTTPClient(timeout=1, max_retries=MAX_RETRIES, backoff_factor=0, pool_maxsize=1)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await client.post(URL, json={}, headers=headers)
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_async_post_without_key_does_not_retry_after_request_was_sent():
+    calls = []
+    with pytest.raises(APIIntegrationError):
+        async_post([httpx.ReadTimeout('Read timed out')], calls)
+    assert len(calls) == 1
+    calls = []
+    assert async_post([503], calls).status_code == 503
+    assert len(calls) == 1
+
+
+def test_async_post_retries_connect_errors():
+    calls = []
+    assert async_post([httpx.ConnectError('Connection refused'), 201], calls).status_code == 201
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('outcome', [httpx.ReadTimeout('Read timed out'), 503])
+def test_async_post_with_key_retries_read_timeouts_and_5xx(outcome):
+    calls = []
+    headers = idempotency_headers('pay:1')
+    assert async_post([outcome, 201], calls, headers).status_code == 201
+    assert len(calls) == 2
@@ -0,0 +1,55 @@
+'''UUID をバイナリで保存するマイグレーション (e2b9c6f4a8d1) のテスト
+
+文字列の UUID で保存された既存の行が、upgrade で読み込める形に変換され、
+downgrade で元の文字列に戻ること、head の状態がモデルと一致することを確認する。
+'''
+
+import sqlite3
+import uuid
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_query_plans import ALEMBIC_INI
+from orders.repository.orders_repository import OrdersRepository
+
+BEFORE_BINARY = 'c4a7d2e9f1b3'
+
+
+def test_uuid_columns_round_trip(tmp_path):
+    path = tmp_path / 'orders.db'
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option('script_location', str(ALEMBIC_INI.parent / 'migrations'))
+    config.set_main_option('sqlalchemy.url', f'sqlite:///{path}')
+    command.upgrade(config, BEFORE_BINARY)
+
+    order_id, item_id = str(uuid.uuid4()), str(uuid.uuid4())
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'INSERT INTO "order" (id, status, created) VALUES (?, ?, ?)',
+            (order_id, 'created', '2026-01-01 00:00:00')
+        )
+        connection.execute(
+            'INSERT INTO order_item (id, order_id, product, size, quantity) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (item_id, order_id, 'latte', 'small', 1)
+        )
+    connection.close()
+
+    command.upgrade(config, 'head')
+    command.check(config)
+    engine = create_engine(f'sqlite:///{path}')
+    with sessionmaker(bind=engine)() as session:
+        order = OrdersRepository(session).get(order_id)
+        assert [item.id for item in order.items] == [item_id]
+    engine.dispose()
+
+    command.downgrade(config, BEFORE_BINARY)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT id FROM "order"').fetchall() == [(order_id,)]
+        assert connection.execute(
+            'SELECT id, order_id FROM order_item'
+        ).fetchall() == [(item_id, order_id)]
+    connection.close()
@@ -0,0 +1,157 @@
+'''注文のキャッシュ (LRUOrderCache, KeyValueOrderCache) と CachedOrdersRepository のテスト
+
+キャッシュにない注文を読み込んでいる間に更新された場合に、古い内容がキャッシュに残らないことを確認する。
+また、別のプロセス (別のキャッシュ) で注文が更新されても、キャンセルや支払いは
+キャッシュの古いステータスではなく、データベースの最新のステータスを元に行われることを確認する。
+'''
+
+from datetime import datetime
+
+import pytest
+
+from orders.domain import order as order_module
+from orders.orders_service.exceptions import InvalidActionError
+from orders.orders_service.orders_service import OrdersService
+from orders.repository import cache as cache_module
+from orders.repository.cache import FakeKeyValueStore, KeyValueOrderCache, LRUOrderCache
+from orders.repository.cached_orders_repository import CachedOrdersRepository
+from orders.repository.orders_repository import OrdersRepository
+from orders.repository.outbox_repository import OutboxRepository
+
+OLD_ITEMS = [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}]
+NEW_ITEMS = [{'product': 'latte', 'size': 'big', 'quantity': 3}]
+
+
+def record(status: str) -> dict:
+    return {'id': '1', 'status': status, 'created': datetime(2024, 1, 1), 'items': []}
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'key_value'])
+def cache(request, clock):
+    if request.param == 'memory':
+        return LRUOrderCache(ttl=30, tombstone_ttl=5)
+    return KeyValueOrderCache(FakeKeyValueStore(), ttl=30, tombstone_ttl=5)
+
+
+def test_set_after_delete_is_ignored_until_tombstone_expires(cache, clock):
+    cache.delete('1')
+    cache.set('1', record('stale'))
+    assert cache.get('1') is None
+    clock.now += 5
+    cache.set('1', record('fresh'))
+    assert cache.get('1') == record('fresh')
+
+
+def test_set_does_not_overwrite_live_entry(cache, clock):
+    cache.set('1', record('first'))
+    cache.set('1', record('second'))
+    assert cache.get('1') == record('first')
+    clock.now += 30
+    assert cache.get('1') is None
+    cache.set('1', record('second'))
+    assert cache.get('1') == record('second')
+
+
+def test_update_during_read_through_does_not_cache_stale_order(session_maker, cache):
+    with session_maker() as session:
+        order = OrdersRepository(session).add(OLD_ITEMS)
+        # ID はコミット後に確定する
+        session.commit()
+        order_id = order.id
+
+    def update_and_commit():
+        with session_maker() as session:
+            writer = CachedOrdersRepository(OrdersRepository(session), cache)
+            writer.update(order_id, items=NEW_ITEMS)
+            session.commit()
+
+    with session_maker() as session:
+        repository = OrdersRepository(session)
+        get_record = repository.get_record
+
+        def get_record_then_update(*args, **kwargs):
+            # キャッシュにない注文を読み込んだ直後に、別のセッションで更新してコミットする
+            record = get_record(*args, **kwargs)
+            update_and_commit()
+            return record
+
+        repository.get_record = get_record_then_update
+        stale = CachedOrdersRepository(repository, cache).get(order_id)
+    assert stale.items[0].product == 'cappuccino'
+
+    with session_maker() as session:
+        order = CachedOrdersRepository(OrdersRepository(session), cache).get(order_id)
+    assert order.items[0].product == 'latte'
+    cached = cache.get(str(order_id))
+    assert cached is None or cached['items'][0]['product'] == 'latte'
+
+
+class FakeKitchenClient:
+
+    def __init__(self):
+        self.cancelled = []
+
+    def cancel(self, schedule_id, items):
+        self.cancelled.append(schedule_id)
+        return type('Response', (), {'status_code': 200})()
+
+
+@pytest.fixture
+def kitchen(monkeypatch):
+    kitchen = FakeKitchenClient()
+    monkeypatch.setattr(order_module, 'get_kitchen_client', lambda: kitchen)
+    return kitchen
+
+
+def start_in_other_process(session_maker, cache) -> str:
+    '''cache に created の注文を載せた後、別のキャッシュを使うプロセスで progress に進める'''
+    with session_maker() as session:
+        order = OrdersRepository(session).add(OLD_ITEMS)
+        session.commit()
+        order_id = order.id
+    with session_maker() as session:
+        assert CachedOrdersRepository(OrdersRepository(session), cache).get(order_id).status == 'created'
+    with session_maker() as session:
+        other = CachedOrdersRepository(OrdersRepository(session), LRUOrderCache())
+        other.update(order_id, status='progress', schedule_id='schedule-1')
+        session.commit()
+    # このプロセスのキャッシュには、created のままの注文が残っている
+    assert cache.get(str(order_id))['status'] == 'created'
+    return order_id
+
+
+def test_cancel_uses_status_from_database(session_maker, cache, kitchen):
+    order_id = start_in_other_process(session_maker, cache)
+    with session_maker() as session:
+        repository = CachedOrdersRepository(OrdersRepository(session), cache, read_through=False)
+        order = OrdersService(repository).cancel_order(order_id)
+        session.commit()
+    # progress の注文として、厨房サービスのスケジュールもキャンセルする
+    assert kitchen.cancelled == ['schedule-1']
+    assert order.status == 'cancelled'
+    assert cache.get(str(order_id)) is None
+
+
+def test_pay_uses_status_from_database(session_maker, cache):
+    order_id = start_in_other_process(session_maker, cache)
+    with session_maker() as session:
+        repository = CachedOrdersRepository(OrdersRepository(session), cache, read_through=False)
+        service = OrdersService(repository, OutboxRepository(session))
+        with pytest.raises(InvalidActionError):
+            service.pay_order(order_id)
@@ -0,0 +1,131 @@
+'''OrdersRepository.update でアイテムを差分として反映するテスト
+
+更新後にデータベースから読み直したアイテムが指定した内容と一致すること、
+既存のアイテムは ID を保ったまま更新され、変更のない行には SQL が発行されないことを確認する。
+'''
+
+import asyncio
+
+import pytest
+
+from orders.repository.instrumentation import count_queries
+from orders.repository.orders_repository import AsyncOrdersRepository, OrdersRepository
+
+ITEM = {'product': 'cappuccino', 'size': 'small', 'quantity': 1}
+LATTE = {'product': 'latte', 'size': 'big', 'quantity': 1}
+COUNT = 6
+
+
+def changes():
+    items = [dict(ITEM) for _ in range(COUNT)]
+    change_one = [dict(item) for item in items]
+    change_one[COUNT // 2]['quantity'] = 2
+    return {
+        'unchanged': (items, []),
+        'change_one': (change_one, ['UPDATE']),
+        'append_one': (items + [LATTE], ['INSERT']),
+        'shrink_half': (items[:COUNT // 2], ['DELETE']),
+    }
+
+
+def contents(items):
+    return sorted((item['product'], item['size'], item['quantity']) for item in items)
+
+
+def writes(counter):
+    '''発行された SQL 文のうち、SELECT 以外の文の種類'''
+    return [
+        statement.split()[0].upper()
+        for statement in counter.statements
+        if not statement.lstrip().upper().startswith('SELECT')
+    ]
+
+
+def add_order(session_maker, items):
+    with session_maker() as session:
+        order = OrdersRepository(session).add(items)
+        session.commit()
+        order_id = order.id
+    # アイテムの ID は、コミット後に読み直さないと分からない
+    return order_id, [item.id for item in saved_items(session_maker, order_id)]
+
+
+def saved_items(session_maker, order_id):
+    with session_maker() as session:
+        return OrdersRepository(session).get(order_id).items
+
+
+@pytest.mark.parametrize('change', list(changes()))
+def test_update_writes_only_changed_items(engine, session_maker, change):
+    items, expected = changes()[change]
+    order_id, item_ids = add_order(session_maker, [ITEM] * COUNT)
+    with session_maker() as session:
+        with count_queries(engine) as counter:
+            OrdersRepository(session).update(order_id, items=items)
+            session.commit()
+    assert writes(counter) == expected
+
+    saved = saved_items(session_maker, order_id)
+    assert contents(item.dict() for item in saved) == contents(items)
+    # 残ったアイテムは作り直されず、元の ID のまま
+    kept = {item.id for item in saved} & set(item_ids)
+    assert len(kept) == min(len(items), COUNT)
+
+
+def test_update_matches_items_by_id(session_maker):
+    order_id, item_ids = add_order(session_maker, [ITEM, LATTE])
+    with session_maker() as session:
+        # 並びを入れ替えても、id を指定したアイテムは同じ ID のアイテムを更新する
+        OrdersRepository(session).update(order_id, items=[
+            {**LATTE, 'id': item_ids[1], 'quantity': 3},
+            {**ITEM, 'id': item_ids[0]},
+        ])
+        session.commit()
+    saved = {item.id: item.dict() for item in saved_items(session_maker, order_id)}
+    assert saved == {
+        item_ids[0]: ITEM,
+        item_ids[1]: {**LATTE, 'quantity': 3},
+    }
+
+
+def test_update_matches_items_without_id_by_position(session_maker):
+    order_id, item_ids = add_order(session_maker, [ITEM, ITEM, ITEM])
+    with session_maker() as session:
+        # id を指定したものを除いた残りは、既存のアイテムに先頭から順に対応させる
+        OrdersRepository(session).update(order_id, items=[
+            LATTE,
+            {**ITEM, 'id': item_ids[0]},
+        ])
+        session.commit()
+    saved = {item.id: item.dict() for item in saved_items(session_maker, order_id)}
+    assert saved == {item_ids[0]: ITEM, item_ids[1]: LATTE}
+
+
+def test_update_can_remove_all_items(session_maker):
+    order_id, _ = add_order(session_maker, [ITEM, LATTE])
+    with session_maker() as session:
+        order = OrdersRepository(session).update(order_id, items=[])
+        session.commit()
+    assert order.items == []
+    assert saved_items(session_maker, order_id) == []
+
+
+@pytest.mark.parametrize('change', list(changes()))
+def test_async_update_writes_only_changed_items(
+    engine, session_maker, async_engine, async_session_maker, change
+):
+    items, expected = changes()[change]
+    order_id, _ = add_order(session_maker, [ITEM] * COUNT)
+
+    async def update():
+        async with async_session_maker() as session:
+            with count_queries(async_engine) as counter:
+                await AsyncOrdersRepository(session).update(order_id, items=items)
+                await session.commit()
+        await async_engine.dispose()
+        return counter
+
+    counter = asyncio.run(update())
+    assert writes(counter) == expected
+    saved = saved_items(session_maker, order_id)
+    assert contents(item.dict() for item in saved) == contents(items)
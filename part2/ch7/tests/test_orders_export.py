@@ -0,0 +1,57 @@
+'''注文のエクスポート (GET /orders/export) のメモリ使用量のテスト
+
+エクスポートのハンドラと同じく、OrdersService.stream_orders を iter_ndjson で NDJSON に変換し、
+出力を捨てながら RSS の最大値を記録する。件数を 10 倍にしても RSS の増加量が変わらないことを確認する。
+全件をまとめて読み込む実装では、同じ条件で数十 MB 単位で増える。
+
+100 万件の場合は時間がかかるため、RUN_SLOW_TESTS=1 の場合にだけ実行する。
+'''
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_orders_export import rss_mb, seed
+from orders.orders_service.orders_service import OrdersService
+from orders.repository.models import Base
+from orders.repository.orders_repository import OrdersRepository
+from orders.web.api.ndjson import iter_ndjson
+
+# 件数によらずかかる分 (バッファなど) を見込んだ、許容する RSS の増加量
+MAX_GROWTH_MB = 16
+
+
+def export_rss_growth(tmp_path, rows: int) -> float:
+    '''rows 件の注文をエクスポートした際の RSS の増加量 (MB) を返す'''
+    engine = create_engine(f'sqlite:///{tmp_path / f"export_{rows}.db"}')
+    Base.metadata.create_all(engine)
+    seed(engine, rows)
+    exported = 0
+    before = peak = rss_mb()
+    with sessionmaker(bind=engine)() as session:
+        orders = OrdersService(OrdersRepository(session)).stream_orders()
+        for index, chunk in enumerate(iter_ndjson(orders)):
+            exported += chunk.count('\n')
+            if index % 10 == 0:
+                peak = max(peak, rss_mb())
+    engine.dispose()
+    assert exported == rows
+    return peak - before
+
+
+def assert_flat(tmp_path, small: int, large: int):
+    small_growth = export_rss_growth(tmp_path, small)
+    large_growth = export_rss_growth(tmp_path, large)
+    assert large_growth < MAX_GROWTH_MB
+    assert large_growth <= small_growth + MAX_GROWTH_MB / 2
+
+
+def test_export_rss_stays_flat(tmp_path):
+    assert_flat(tmp_path, 5000, 50000)
+
+
+@pytest.mark.skipif(os.getenv('RUN_SLOW_TESTS') != '1', reason='set RUN_SLOW_TESTS=1')
+def test_export_rss_stays_flat_for_one_million_orders(tmp_path):
+    assert_flat(tmp_path, 100000, 1000000)
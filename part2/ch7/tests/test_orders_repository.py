@@ -0,0 +1,72 @@
+'''OrdersRepository が発行する SQL の回数のテスト
+
+注文の件数によらず SQL の回数が一定であること (N+1 になっていないこと) を確認する。
+'''
+
+import asyncio
+
+import pytest
+
+from orders.repository.instrumentation import count_queries
+from orders.repository.orders_repository import AsyncOrdersRepository, OrdersRepository
+
+ITEMS = [
+    {'product': 'cappuccino', 'size': 'small', 'quantity': 1},
+    {'product': 'latte', 'size': 'medium', 'quantity': 2},
+]
+
+
+def seed(session_maker, orders: int):
+    with session_maker() as session:
+        created = OrdersRepository(session).add_many([ITEMS] * orders)
+        session.commit()
+        return [order.id for order in created]
+
+
+def list_queries(engine, session_maker, load_items: str) -> int:
+    with session_maker() as session:
+        repo = OrdersRepository(session)
+        with count_queries(engine) as counter:
+            orders = repo.list(limit=None, load_items=load_items)
+            # アイテムの参照で遅延読み込みが起きないことも含めて数える
+            assert all(len(order.items) == len(ITEMS) for order in orders)
+    return counter.count
+
+
+@pytest.mark.parametrize('load_items', ['selectin', 'joined'])
+def test_list_issues_constant_number_of_statements(engine, session_maker, load_items):
+    seed(session_maker, 1)
+    single = list_queries(engine, session_maker, load_items)
+    seed(session_maker, 49)
+    assert list_queries(engine, session_maker, load_items) == single
+
+
+def test_get_issues_constant_number_of_statements(engine, session_maker):
+    order_id = seed(session_maker, 1)[0]
+    with session_maker() as session:
+        with count_queries(engine) as counter:
+            order = OrdersRepository(session).get(order_id)
+            assert len(order.items) == len(ITEMS)
+    assert counter.count <= 2
+
+
+def test_async_list_issues_constant_number_of_statements(
+    engine, session_maker, async_engine, async_session_maker
+):
+    async def list_queries_async() -> int:
+        async with async_session_maker() as session:
+            with count_queries(async_engine) as counter:
+                orders = await AsyncOrdersRepository(session).list(limit=None)
+                assert all(len(order.items) == len(ITEMS) for order in orders)
+        return counter.count
+
+    async def run():
+        seed(session_maker, 1)
+        single = await list_queries_async()
+        seed(session_maker, 49)
+        many = await list_queries_async()
+        await async_engine.dispose()
+        return single, many
+
+    single, many = asyncio.run(run())
+    assert single == many
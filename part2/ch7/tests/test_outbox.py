@@ -0,0 +1,307 @@
+'''アウトボックス (OutboxRepository, OutboxDispatcher) と支払いの受け付けのテスト
+
+支払いサービス・厨房サービスのクライアントは、呼び出しを記録する偽物に差し替える。
+'''
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from orders.domain import order as order_module
+from orders.orders_service.exceptions import DownstreamUnavailableError, InvalidActionError
+from orders.orders_service.orders_service import PAY_ORDER, AsyncOrdersService, OrdersService
+from orders.outbox import dispatcher as dispatcher_module
+from orders.outbox.dispatcher import LEASE_SECONDS, OutboxDispatcher
+from orders.repository.models import OutboxMessageModel
+from orders.repository.orders_repository import AsyncOrdersRepository, OrdersRepository
+from orders.repository.outbox_repository import AsyncOutboxRepository, OutboxRepository
+
+ITEMS = [{'product': 'cappuccino', 'size': 'small', 'quantity': 1}]
+MAX_ATTEMPTS = 3
+
+
+class Response:
+
+    def __init__(self, status_code: int, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakePaymentsClient:
+
+    def __init__(self):
+        self.keys = []
+        self.status_code = 201
+        self.error = None
+        self.before_response = None
+
+    def pay(self, order_id, idempotency_key=None):
+        self.keys.append(idempotency_key)
+        if self.error is not None:
+            raise self.error
+        if self.before_response is not None:
+            self.before_response(order_id)
+        return Response(self.status_code)
+
+
+class FakeKitchenClient:
+
+    def __init__(self):
+        self.keys = []
+
+    def schedule(self, items, idempotency_key=None):
+        self.keys.append(idempotency_key)
+        return Response(201, {'id': 'schedule-1'})
+
+
+@pytest.fixture
+def payments(monkeypatch):
+    payments = FakePaymentsClient()
+    monkeypatch.setattr(order_module, 'get_payments_client', lambda: payments)
+    return payments
+
+
+@pytest.fixture
+def kitchen(monkeypatch):
+    kitchen = FakeKitchenClient()
+    monkeypatch.setattr(order_module, 'get_kitchen_client', lambda: kitchen)
+    return kitchen
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    '''バックオフの計算に渡された試行回数を記録し、待ち時間は試行回数 × 10 秒にする'''
+    attempts = []
+
+    def backoff_delay(attempt, backoff_factor, max_delay):
+        attempts.append(attempt)
+        return attempt * 10
+
+    monkeypatch.setattr(dispatcher_module, 'backoff_delay', backoff_delay)
+    return attempts
+
+
+@pytest.fixture
+def dispatcher(session_maker):
+    return OutboxDispatcher(session_maker, max_attempts=MAX_ATTEMPTS)
+
+
+def add_order(session_maker) -> str:
+    with session_maker() as session:
+        order = OrdersRepository(session).add(ITEMS)
+        session.commit()
+        return order.id
+
+
+def set_status(session_maker, order_id, status: str):
+    with session_maker() as session:
+        OrdersRepository(session).update(order_id, status=status)
+        session.commit()
+
+
+def pay(session_maker, order_id):
+    with session_maker() as session:
+        service = OrdersService(OrdersRepository(session), OutboxRepository(session))
+        service.pay_order(order_id)
+        session.commit()
+
+
+def get_order(session_maker, order_id):
+    with session_maker() as session:
+        return OrdersRepository(session).get(order_id)
+
+
+def set_message_status(session_maker, order_id, status: str):
+    with session_maker() as session:
+        session.execute(
+            update(OutboxMessageModel)
+                .where(OutboxMessageModel.order_id == str(order_id))
+                .values(status=status)
+        )
+        session.commit()
+
+
+def get_message(session_maker, order_id) -> dict:
+    with session_maker() as session:
+        return OutboxRepository(session).get_by_key(PAY_ORDER, order_id)
+
+
+def test_dispatch_pays_then_schedules(session_maker, dispatcher, payments, kitchen):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+
+    assert dispatcher.dispatch_pending() == 1
+    order = get_order(session_maker, order_id)
+    assert (order.status, order.schedule_id) == ('progress', 'schedule-1')
+    key = get_message(session_maker, order_id)['idempotency_key']
+    assert payments.keys == [f'{key}:payment']
+    assert kitchen.keys == [f'{key}:schedule']
+    assert get_message(session_maker, order_id)['status'] == 'done'
+
+
+def test_dispatch_resumes_paid_order_from_scheduling(session_maker, dispatcher, payments, kitchen):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    # 支払い後、スケジューリングの前に失敗して再試行された場合
+    set_status(session_maker, order_id, 'paid')
+
+    assert dispatcher.dispatch_pending() == 1
+    assert payments.keys == []
+    assert len(kitchen.keys) == 1
+    assert get_order(session_maker, order_id).status == 'progress'
+
+
+def test_transition_does_not_overwrite_concurrent_cancel(
+    session_maker, dispatcher, payments, kitchen
+):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    # 支払いサービスの応答を待っている間に、注文がキャンセルされる
+    payments.before_response = lambda _: set_status(session_maker, order_id, 'cancelled')
+
+    assert dispatcher.dispatch_pending() == 1
+    assert get_order(session_maker, order_id).status == 'cancelled'
+    assert kitchen.keys == []
+    assert get_message(session_maker, order_id)['status'] == 'done'
+
+
+def test_failures_back_off_until_max_attempts(session_maker, dispatcher, payments, delays):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    payments.status_code = 500
+    message_id = get_message(session_maker, order_id)['id']
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        before = datetime.utcnow()
+        assert dispatcher.dispatch(message_id)
+        message = get_message(session_maker, order_id)
+        assert message['attempts'] == attempt
+        assert message['last_error'] is not None
+        if attempt < MAX_ATTEMPTS:
+            assert message['status'] == 'pending'
+            delay = message['next_attempt_at'] - before
+            assert timedelta(seconds=attempt * 10) <= delay < timedelta(seconds=attempt * 10 + 5)
+            # 次の実行時刻までは処理待ちとして取り出されない
+            with session_maker() as session:
+                assert OutboxRepository(session).due(datetime.utcnow(), 10) == []
+
+    assert delays == list(range(1, MAX_ATTEMPTS + 1))
+    assert get_message(session_maker, order_id)['status'] == 'failed'
+    assert not dispatcher.dispatch(message_id)
+    assert len(payments.keys) == MAX_ATTEMPTS
+    assert get_order(session_maker, order_id).status == 'created'
+
+
+def test_unavailable_downstream_is_not_counted_as_attempt(
+    session_maker, dispatcher, payments, delays
+):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    payments.error = DownstreamUnavailableError('open', retry_after=7)
+
+    before = datetime.utcnow()
+    assert dispatcher.dispatch_pending() == 1
+    message = get_message(session_maker, order_id)
+    assert (message['status'], message['attempts']) == ('pending', 0)
+    assert timedelta(seconds=7) <= message['next_attempt_at'] - before < timedelta(seconds=12)
+    assert delays == []
+
+
+def test_claimed_message_is_not_dispatched_twice(session_maker, dispatcher, payments, kitchen):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    message_id = get_message(session_maker, order_id)['id']
+
+    # 別のディスパッチャーが処理中の間は、取得も処理もできない
+    now = datetime.utcnow()
+    with session_maker() as session:
+        outbox = OutboxRepository(session)
+        assert outbox.claim(message_id, now, now + timedelta(seconds=LEASE_SECONDS))
+        assert not outbox.claim(message_id, now, now + timedelta(seconds=LEASE_SECONDS))
+        session.commit()
+    assert not dispatcher.dispatch(message_id)
+    assert dispatcher.dispatch_pending() == 0
+    assert payments.keys == []
+
+    # 処理中のディスパッチャーが停止しても、期限が切れれば他のディスパッチャーが処理できる
+    with session_maker() as session:
+        session.execute(
+            update(OutboxMessageModel)
+                .where(OutboxMessageModel.id == message_id)
+                .values(locked_until=now - timedelta(seconds=1))
+        )
+        session.commit()
+    assert dispatcher.dispatch_pending() == 1
+    # 処理済みのメッセージは、もう一度処理されない
+    assert not dispatcher.dispatch(message_id)
+    assert dispatcher.dispatch_pending() == 0
+    assert len(payments.keys) == 1
+    assert len(kitchen.keys) == 1
+
+
+def test_pay_order_is_idempotent_while_accepted(session_maker, payments, kitchen, dispatcher):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    message = get_message(session_maker, order_id)
+    pay(session_maker, order_id)
+    assert get_message(session_maker, order_id) == message
+
+    # 処理済みで progress になった注文への同じリクエストも、受け付け済みとして扱う
+    dispatcher.dispatch_pending()
+    pay(session_maker, order_id)
+    assert get_message(session_maker, order_id)['status'] == 'done'
+
+
+@pytest.mark.parametrize('message_status', ['pending', 'done', 'failed'])
+def test_pay_order_rejects_cancelled_order_with_message(session_maker, message_status):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    set_message_status(session_maker, order_id, message_status)
+    set_status(session_maker, order_id, 'cancelled')
+
+    with pytest.raises(InvalidActionError):
+        pay(session_maker, order_id)
+    assert get_message(session_maker, order_id)['status'] == message_status
+
+
+def test_pay_order_requeues_failed_message(session_maker, dispatcher, payments, kitchen):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    payments.status_code = 500
+    message_id = get_message(session_maker, order_id)['id']
+    for _ in range(MAX_ATTEMPTS):
+        dispatcher.dispatch(message_id)
+    assert get_message(session_maker, order_id)['status'] == 'failed'
+
+    pay(session_maker, order_id)
+    message = get_message(session_maker, order_id)
+    assert (message['id'], message['status'], message['attempts']) == (message_id, 'pending', 0)
+
+    payments.status_code = 201
+    assert dispatcher.dispatch_pending() == 1
+    assert get_order(session_maker, order_id).status == 'progress'
+
+
+def test_async_pay_order_requeues_failed_message(session_maker, async_engine, async_session_maker):
+    order_id = add_order(session_maker)
+    pay(session_maker, order_id)
+    set_message_status(session_maker, order_id, 'failed')
+    set_status(session_maker, order_id, 'paid')
+
+    async def pay_async():
+        async with async_session_maker() as session:
+            service = AsyncOrdersService(
+                AsyncOrdersRepository(session), AsyncOutboxRepository(session)
+            )
+            await service.pay_order(order_id)
+            await session.commit()
+        await async_engine.dispose()
+
+    asyncio.run(pay_async())
+    message = get_message(session_maker, order_id)
+    assert (message['status'], message['attempts']) == ('pending', 0)
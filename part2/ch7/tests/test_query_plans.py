@@ -0,0 +1,62 @@
+'''注文の取得・一覧の SQL がインデックスを使うことのテスト
+
+Alembic で head まで作成したデータベースに対して、各処理で発行された SQL を EXPLAIN QUERY PLAN にかけ、
+インデックスを使わないテーブル全体の走査 (SCAN ... に USING がない行) が発生しないこと、
+処理ごとに想定したインデックスが使われていることを確認する。
+'''
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_query_plans import (
+    ALEMBIC_INI,
+    EXPECTED_INDEXES,
+    ITEMS,
+    capture,
+    explain,
+    paths
+)
+from orders.repository.models import OrderModel
+from orders.repository.orders_repository import OrdersRepository
+
+ORDERS = 200
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    '''Alembic で head まで作成し、1 割をキャンセル済みにした注文を投入したデータベース'''
+    url = f'sqlite:///{tmp_path / "orders.db"}'
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option('script_location', str(ALEMBIC_INI.parent / 'migrations'))
+    config.set_main_option('sqlalchemy.url', url)
+    command.upgrade(config, 'head')
+
+    engine = create_engine(url)
+    session_maker = sessionmaker(bind=engine)
+    with session_maker() as session:
+        order_ids = [
+            order.id
+            for order in OrdersRepository(session).add_many([ITEMS] * ORDERS)
+        ]
+        session.execute(
+            update(OrderModel)
+                .where(OrderModel.id.in_(order_ids[::10]))
+                .values(status='cancelled')
+        )
+        session.commit()
+    yield engine, session_maker, order_ids
+    engine.dispose()
+
+
+@pytest.mark.parametrize('name', list(EXPECTED_INDEXES))
+def test_query_uses_expected_indexes(migrated, name):
+    engine, session_maker, order_ids = migrated
+    details = explain(engine, capture(engine, session_maker, paths(order_ids)[name]))
+
+    full_scans = [detail for detail in details if detail.startswith('SCAN') and 'USING' not in detail]
+    assert not full_scans, details
+    used = {index for index in EXPECTED_INDEXES[name] if any(index in detail for detail in details)}
+    assert used == EXPECTED_INDEXES[name], details
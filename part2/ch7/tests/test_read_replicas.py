@@ -0,0 +1,165 @@
+'''読み込み専用のエンドポイントをレプリカに振り分ける仕組みのテスト
+
+SQLite のファイルをプライマリとレプリカとして使い、レプリケーションの代わりに
+sqlite3 のバックアップ API でプライマリの内容をレプリカに書き写す。
+'''
+
+import asyncio
+import shutil
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from orders.repository.cache import LRUOrderCache, get_order_cache
+from orders.repository.cached_orders_repository import CachedOrdersRepository
+from orders.repository.engine import dispose_engines
+from orders.repository.models import Base
+from orders.repository.orders_repository import OrdersRepository
+from orders.repository.unit_of_work import AsyncUnitOfWork, UnitOfWork
+from orders.web.read_routing import (
+    COOKIE_NAME,
+    ReadYourWritesMiddleware,
+    read_your_writes_window
+)
+
+ORDER = {'items': [{'product': 'latte', 'size': 'small', 'quantity': 1}]}
+
+
+def reset():
+    '''環境変数から読み込んでプロセス内に保持している設定とエンジンを破棄する'''
+    dispose_engines()
+    read_your_writes_window.cache_clear()
+    get_order_cache.cache_clear()
+
+
+class Databases:
+
+    def __init__(self, directory):
+        self.primary = directory / 'primary.db'
+        self.replicas = [directory / f'replica{index}.db' for index in range(2)]
+
+    def replicate(self):
+        source = sqlite3.connect(self.primary)
+        for replica in self.replicas:
+            target = sqlite3.connect(replica)
+            source.backup(target)
+            target.close()
+        source.close()
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    databases = Databases(tmp_path)
+    engine = create_engine(f'sqlite:///{databases.primary}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    for replica in databases.replicas:
+        shutil.copy(databases.primary, replica)
+
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{databases.primary}')
+    monkeypatch.setenv(
+        'DATABASE_REPLICA_URLS',
+        ','.join(f'sqlite:///{replica}' for replica in databases.replicas)
+    )
+    monkeypatch.delenv('ASYNC_DATABASE_URL', raising=False)
+    monkeypatch.delenv('ASYNC_DATABASE_REPLICA_URLS', raising=False)
+    monkeypatch.setenv('ORDERS_CACHE', 'none')
+    monkeypatch.setenv('OUTBOX_DISPATCHER', 'off')
+    monkeypatch.setenv('READ_YOUR_WRITES_WINDOW', '60')
+    reset()
+    yield databases
+    reset()
+
+
+def bound_database(unit_of_work) -> str:
+    return unit_of_work.session.get_bind().url.database
+
+
+def test_read_only_unit_of_work_round_robins_replicas(databases):
+    replicas = {str(replica) for replica in databases.replicas}
+    used = set()
+    for _ in range(len(replicas)):
+        with UnitOfWork(read_only=True) as unit_of_work:
+            used.add(bound_database(unit_of_work))
+    assert used == replicas
+
+    with UnitOfWork() as unit_of_work:
+        assert bound_database(unit_of_work) == str(databases.primary)
+
+
+def test_read_only_unit_of_work_cannot_commit(databases):
+    with UnitOfWork(read_only=True) as unit_of_work:
+        with pytest.raises(RuntimeError):
+            unit_of_work.commit()
+
+    async def commit_async():
+        async with AsyncUnitOfWork(read_only=True) as unit_of_work:
+            # ASYNC_DATABASE_REPLICA_URLS の指定がなければ、同じファイルに aiosqlite で接続する
+            assert bound_database(unit_of_work) in {
+                str(replica) for replica in databases.replicas
+            }
+            with pytest.raises(RuntimeError):
+                await unit_of_work.commit()
+
+    asyncio.run(commit_async())
+
+
+def test_replica_reads_do_not_fill_cache(databases):
+    cache = LRUOrderCache()
+    with UnitOfWork() as unit_of_work:
+        order = OrdersRepository(unit_of_work.session).add(ORDER['items'])
+        unit_of_work.commit()
+        order_id = order.id
+    databases.replicate()
+
+    with UnitOfWork(read_only=True) as unit_of_work:
+        repo = CachedOrdersRepository(OrdersRepository(unit_of_work.session), cache)
+        assert repo.get(order_id).id == order_id
+    assert cache.get(order_id) is None
+
+    with UnitOfWork() as unit_of_work:
+        CachedOrdersRepository(OrdersRepository(unit_of_work.session), cache).get(order_id)
+    assert cache.get(order_id) is not None
+
+
+@pytest.fixture
+def asgi_app(databases):
+    '''注文 API に read-your-writes のミドルウェアを付けた ASGI アプリケーション
+
+    orders.web.app はプロセス内で一度だけインポートされ、ミドルウェアは
+    インポート時にレプリカが設定されている場合にだけ登録されるため、なければここで付ける
+    '''
+    from orders.web.app import app
+    if any(middleware.cls is ReadYourWritesMiddleware for middleware in app.user_middleware):
+        return app
+    return ReadYourWritesMiddleware(app, window=read_your_writes_window())
+
+
+def test_writer_reads_own_writes_from_primary(databases, asgi_app):
+    with TestClient(asgi_app) as writer, TestClient(asgi_app) as other:
+        response = writer.post('/orders', json=ORDER)
+        assert response.status_code == 201, response.text
+        assert COOKIE_NAME in response.headers['set-cookie']
+        order_id = response.json()['id']
+
+        # 書き込んだクライアントはプライマリから、それ以外はレプリカから読み込む
+        assert writer.get(f'/orders/{order_id}').status_code == 200
+        assert len(writer.get('/orders').json()['orders']) == 1
+        assert other.get(f'/orders/{order_id}').status_code == 404
+        assert other.get('/orders').json()['orders'] == []
+        assert 'set-cookie' not in other.get('/orders').headers
+
+        databases.replicate()
+        assert other.get(f'/orders/{order_id}').status_code == 200
+        assert len(other.get('/orders').json()['orders']) == 1
+
+
+def test_failed_write_does_not_route_to_primary(databases, asgi_app):
+    with TestClient(asgi_app) as client:
+        response = client.put(
+            '/order/00000000-0000-0000-0000-000000000000', json=ORDER
+        )
+        assert response.status_code == 404
+        assert 'set-cookie' not in response.headers
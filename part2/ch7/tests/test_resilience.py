@@ -0,0 +1,186 @@
+'''サーキットブレーカー (CircuitBreaker) と DownstreamGuard のテスト'''
+
+import asyncio
+import threading
+
+import pytest
+
+from orders.clients.resilience import (
+    AsyncBulkhead,
+    Bulkhead,
+    CircuitBreaker,
+    DownstreamGuard
+)
+from orders.orders_service.exceptions import (
+    APIIntegrationError,
+    DownstreamUnavailableError
+)
+
+RECOVERY_TIMEOUT = 30
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Response:
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+def ok():
+    return Response(200)
+
+
+def server_error():
+    return Response(503)
+
+
+def unreachable():
+    raise APIIntegrationError('Could not reach kitchen')
+
+
+def make_guard(clock, failure_threshold=1, max_concurrent=10, max_wait=0.5):
+    return DownstreamGuard(
+        'kitchen',
+        CircuitBreaker(
+            'kitchen',
+            failure_threshold=failure_threshold,
+            recovery_timeout=RECOVERY_TIMEOUT,
+            clock=clock
+        ),
+        Bulkhead('kitchen', max_concurrent, max_wait),
+        AsyncBulkhead('kitchen', max_concurrent, max_wait)
+    )
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def open_breaker(guard):
+    with pytest.raises(APIIntegrationError):
+        guard.call(unreachable)
+    assert guard.breaker.state == 'open'
+
+
+def test_opens_after_consecutive_failures_and_rejects_while_open(clock):
+    guard = make_guard(clock, failure_threshold=3)
+    guard.call(server_error)
+    guard.call(ok)
+    for _ in range(2):
+        guard.call(server_error)
+    assert guard.breaker.state == 'closed'
+    with pytest.raises(APIIntegrationError):
+        guard.call(unreachable)
+    assert guard.breaker.state == 'open'
+
+    with pytest.raises(DownstreamUnavailableError) as error:
+        guard.call(ok)
+    assert error.value.retry_after == RECOVERY_TIMEOUT
+    assert guard.stats()['rejected'] == 1
+
+
+def test_half_open_trial_success_closes(clock):
+    guard = make_guard(clock)
+    open_breaker(guard)
+    clock.now += RECOVERY_TIMEOUT
+    assert guard.breaker.state == 'half_open'
+    assert guard.call(ok).status_code == 200
+    assert guard.breaker.state == 'closed'
+
+
+def test_half_open_trial_failure_reopens(clock):
+    guard = make_guard(clock)
+    open_breaker(guard)
+    clock.now += RECOVERY_TIMEOUT
+    guard.call(server_error)
+    assert guard.breaker.state == 'open'
+    assert guard.breaker.stats()['opened'] == 2
+
+
+def test_half_open_allows_only_max_calls_trials(clock):
+    breaker = CircuitBreaker('kitchen', failure_threshold=1, recovery_timeout=RECOVERY_TIMEOUT, clock=clock)
+    breaker.record_failure()
+    clock.now += RECOVERY_TIMEOUT
+    assert breaker.before_call() is True
+    with pytest.raises(DownstreamUnavailableError):
+        breaker.before_call()
+
+
+def test_unexpected_exception_in_trial_does_not_leave_breaker_stuck(clock):
+    guard = make_guard(clock)
+    open_breaker(guard)
+    clock.now += RECOVERY_TIMEOUT
+
+    def invalid():
+        raise ValueError('Invalid URL')
+
+    with pytest.raises(ValueError):
+        guard.call(invalid)
+    # 失敗として数えられ、もう一度開く
+    assert guard.breaker.state == 'open'
+    clock.now += RECOVERY_TIMEOUT
+    assert guard.call(ok).status_code == 200
+    assert guard.breaker.state == 'closed'
+
+
+def test_bulkhead_rejection_does_not_use_half_open_trial(clock):
+    guard = make_guard(clock, max_concurrent=1, max_wait=0)
+    open_breaker(guard)
+    clock.now += RECOVERY_TIMEOUT
+    with guard.bulkhead.slot():
+        with pytest.raises(DownstreamUnavailableError, match='Too many concurrent'):
+            guard.call(ok)
+    assert guard.call(ok).status_code == 200
+    assert guard.breaker.state == 'closed'
+
+
+def test_cancelled_trial_is_returned(clock):
+    guard = make_guard(clock)
+    open_breaker(guard)
+    clock.now += RECOVERY_TIMEOUT
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def ok_async():
+        return Response(200)
+
+    async def run():
+        with pytest.raises(asyncio.CancelledError):
+            await guard.call_async(cancelled)
+        # キャンセルは失敗として数えず、試行の枠を返す
+        assert guard.breaker.state == 'half_open'
+        return await guard.call_async(ok_async)
+
+    assert asyncio.run(run()).status_code == 200
+    assert guard.breaker.state == 'closed'
+    assert guard.stats()['in_flight'] == 0
+
+
+def test_counters_are_consistent_under_concurrent_calls(clock):
+    guard = make_guard(clock, failure_threshold=10 ** 9, max_concurrent=8, max_wait=10)
+    threads_count, calls_per_thread = 8, 500
+
+    def worker():
+        for index in range(calls_per_thread):
+            guard.call(server_error if index % 2 else ok)
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = guard.stats()
+    assert stats['calls'] == threads_count * calls_per_thread
+    assert stats['failures'] == threads_count * calls_per_thread // 2
+    assert stats['in_flight'] == 0
@@ -0,0 +1,42 @@
+'''SQLITE_PROFILE による PRAGMA の設定のテスト
+
+未指定の場合は SQLite の既定値のまま (耐久性や外部キーの挙動を変えない) で、
+performance は明示的に指定した場合にだけ使われることを確認する。
+'''
+
+from sqlalchemy import text
+
+from config.env_config import EnvConfig
+from orders.repository.engine import dispose_engines, get_engine
+
+
+def pragmas(url: str):
+    with get_engine(url).connect() as connection:
+        return {
+            name: connection.execute(text(f'PRAGMA {name}')).scalar()
+            for name in ('journal_mode', 'synchronous', 'foreign_keys')
+        }
+
+
+def test_default_profile_keeps_sqlite_defaults(monkeypatch, tmp_path):
+    monkeypatch.delenv('SQLITE_PROFILE', raising=False)
+    assert EnvConfig().sqlite_pragmas() == {}
+    try:
+        # synchronous は FULL (2)、外部キー制約は無効のまま
+        assert pragmas(f'sqlite:///{tmp_path / "orders.db"}') == {
+            'journal_mode': 'delete', 'synchronous': 2, 'foreign_keys': 0,
+        }
+    finally:
+        dispose_engines()
+
+
+def test_performance_profile_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.setenv('SQLITE_PROFILE', 'performance')
+    monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'FULL')
+    try:
+        # プロファイルの値は SQLITE_ + PRAGMA の名前で個別に上書きできる
+        assert pragmas(f'sqlite:///{tmp_path / "orders.db"}') == {
+            'journal_mode': 'wal', 'synchronous': 2, 'foreign_keys': 1,
+        }
+    finally:
+        dispose_engines()